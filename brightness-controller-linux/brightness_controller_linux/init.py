@@ -28,19 +28,42 @@ from brightness_controller_linux.ui.mainwindow import Ui_MainWindow
 from brightness_controller_linux.ui.license import Ui_Form as License_Ui_Form
 from brightness_controller_linux.ui.about import Ui_Form as About_Ui_Form
 from brightness_controller_linux.ui.help import Ui_Form as Help_Ui_Form
-from brightness_controller_linux.util import executor as Executor
+from brightness_controller_linux.util import xrandr_gamma as XRandRGamma
+from brightness_controller_linux.util import gamma_ramps as GammaRamps
+from brightness_controller_linux.util import color_temperature as ColorTemperature
+from brightness_controller_linux.util import night_light as NightLight
 from brightness_controller_linux.util import check_displays as CDisplay
 from brightness_controller_linux.util import write_config as WriteConfig
 from brightness_controller_linux.util import read_config as ReadConfig
+from brightness_controller_linux.util import settings as SavedSettings
 from brightness_controller_linux.util import resource_provider as rp
+from brightness_controller_linux.util import ddc_worker as DDC
+from brightness_controller_linux.util import ddc_i2c as DDCI2C
+from brightness_controller_linux.util import display_cache as DisplayCache
+from brightness_controller_linux.util import capabilities as Capabilities
+from brightness_controller_linux.util import ddc_tuning as DDCTuning
+from brightness_controller_linux.util import hotplug as Hotplug
+from brightness_controller_linux.util.autosave import Autosave
+from brightness_controller_linux.util.write_queue import CoalescingWriteQueue
+from brightness_controller_linux.util.fader import Fader
 
 import brightness_controller_linux.util.log as log
 # import util.filepath_handler as Filepath_handler
+import configparser
 import subprocess
 import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 
 
 verbosity = 1
+ddcBackend = "ddcutil"
+# seconds a brightness change fades over, 0 jumps straight to the value
+fadeDuration = 0.25
+# most software gamma updates applied per output and second
+gammaRate = 60
+HARDWARE_GAINS = (DDC.RED_GAIN, DDC.GREEN_GAIN, DDC.BLUE_GAIN)
 
 class MyApplication(QtWidgets.QMainWindow):
     ddcutil_Installed = False
@@ -48,26 +71,41 @@ class MyApplication(QtWidgets.QMainWindow):
 
     displayMaxes = []
     displayValues = []
-    # ["connection", "name"] ordered the same as ddcutil lists
+    # {feature: (current, max)} of every VCP feature read at startup
+    displayFeatures = []
+    # ["connection", "name", i2c bus] ordered the same as ddcutil lists
+    # EDID cache key of every display
+    displayKeys = []
+    # whether the secondary sliders are connected to their handlers
+    secondaryConnected = False
+
+    # emitted from the cache revalidation thread with the new display list
+    topologyChanged = QtCore.Signal(list)
+    # emitted from the hotplug thread with the new display list and keys
+    displaysHotplugged = QtCore.Signal(list, list)
 
     global parser
 
-    def verbose(self, verbosityLevel : int, message : str) -> None:
+    def verbose(self, verbosityLevel : int, message : str, *args) -> None:
+        """ Prints message at -v, formatted with args % only then """
         if verbosity>= verbosityLevel:
-            print(message)
+            print(message % args if args else message)
 
-    def __assign_displays(self):
+    def __assign_displays(self, displays=None):
         """assigns display name """
-        self.displays = CDisplay.extract_display_names() # returns ['connection', 'display name']
+        if displays is None:
+            displays = CDisplay.extract_display_names() # returns ['connection', 'display name']
+        self.displays = displays
         self.no_of_displays = len(self.displays)
         self.no_of_connected_dev = self.no_of_displays
 
-        log.info(f"{self.no_of_displays} detected displays:")
-        log.info(str(self.displays))
+        log.info("%d detected displays:", self.no_of_displays)
+        log.info("%s", self.displays)
         log.info("")
 
-        self.verbose(2, str(self.displays) + "   " + str(self.no_of_displays))
+        self.verbose(2, "%s   %d", self.displays, self.no_of_displays)
 
+        self.display2 = None
         if self.no_of_displays == 1:
             self.display1 = self.displays[0][0]
         elif self.no_of_displays >= 2:
@@ -75,20 +113,142 @@ class MyApplication(QtWidgets.QMainWindow):
             self.display2 = self.displays[1][0]
 
     def directlySetBrightness(self, displayNum, value):
-        self.verbose(2, f"Updating brightness for display {self.displays[displayNum][1]} with value {value}")
-        log.info(f"Updating brightness for display {displayNum} {self.displays[displayNum][1]} with value {value}")
+        self.verbose(2, "Updating brightness for display %s with value %d",
+                     self.displays[displayNum][1], value)
+        log.debug("Updating brightness for display %d %s with value %d",
+                  displayNum, self.displays[displayNum][1], value)
 
         if self.displays[displayNum][0].startswith("eDP"):
             print("ATTEMPTED TO SET LAPTOP DISPLAY: ABORTING")
             return
 
+        bus = self.displays[displayNum][2]
+        if fadeDuration > 0 and bus is not None:
+            self.brightness_fader.fade(displayNum, self.displayValues[displayNum], value,
+                                       fadeDuration, self.ddc.latency(bus))
+        else:
+            self.brightness_fader.cancel(displayNum)
+            self.displayValues[displayNum] = value
+            self.brightness_writes.submit(displayNum, value)
+
+    def _fade_brightness_step(self, displayNum, value):
+        """
+        Queues one step of a brightness fade, runs on the fade's thread.
+        A step the display has not taken yet is replaced by the next one.
+        """
+        self.displayValues[displayNum] = value
+        self.brightness_writes.submit(displayNum, value)
+
+    def fade_gamma(self, output, brightness, red, green, blue, dragged=False):
+        """
+        Fades the software brightness of output, colours are applied as they are
+        dragged - the slider is held down, its every step is set at once as
+        it follows the handle
+        """
+        if fadeDuration <= 0 or dragged or self.gammaTransaction is not None:
+            self.set_gamma_levels(output, brightness, red, green, blue)
+            return
+        start = self.gammaLevels.get(output, [brightness])[0]
+        self.gammaLevels[output] = [start, red, green, blue]
+        self.gamma_fader.fade(output, start, brightness, fadeDuration)
+
+    def _fade_gamma_step(self, output, brightness):
+        """ Queues one step of a gamma fade, runs on the fade's thread """
+        levels = self.gammaLevels[output]
+        levels[0] = brightness
+        self.gamma_writes.submit("gamma", {output: tuple(levels)})
+
+    def set_gamma_levels(self, output, brightness, red, green, blue):
+        """ Queues new gamma levels for output, written at most once per frame """
+        self.gamma_fader.cancel(output)
+        self.gammaLevels[output] = [brightness, red, green, blue]
+        if self.gammaTransaction is not None:
+            self.gammaTransaction[output] = (brightness, red, green, blue)
+        else:
+            self.gamma_writes.submit("gamma", {output: (brightness, red, green, blue)})
+
+    @contextmanager
+    def gamma_transaction(self):
+        """
+        Collects the gamma changes every slider set inside the block makes,
+        for all outputs, and applies them together in one batch at its end
+        """
+        if self.gammaTransaction is not None:
+            yield
+            return
+        self.gammaTransaction = {}
+        try:
+            yield
+        finally:
+            changes = self.gammaTransaction
+            self.gammaTransaction = None
+            if changes:
+                self.gamma_writes.submit("gamma", changes)
+
+    def _write_gamma_levels(self, key, changes):
+        """ Writes queued gamma levels, runs on the gamma queue's thread """
+        self.apply_gammas(changes)
+
+    def apply_gammas(self, changes):
+        """
+        Sets the software brightness and colour of several outputs at once
+        changes - {output: (brightness, red, green, blue)} as indexes into self.values
+        """
+        changes = {output: tuple(self.values[level] for level in levels)
+                   for output, levels in changes.items() if output is not None}
+        if not changes:
+            return
         try:
-            subprocess.run(["ddcutil", "setvcp", "10", str(int(value)), "-d", str(displayNum + 1)])
-        except:
+            self.gamma.set_gammas(changes)
+        except XRandRGamma.GammaError as e:
+            log.error(f"Could not set the gamma of {', '.join(changes)}: {e}")
+
+    def _write_brightness(self, displayNum, value):
+        """ Writes the newest brightness of a display, runs off the GUI thread """
+        bus = self.displays[displayNum][2]
+        if bus is None:
+            log.error(f"No I2C bus known for display {displayNum} {self.displays[displayNum][1]}")
+            return
+        try:
+            self.ddc.setvcp(bus, value).result()
+        except Exception as e:
             print(f"Error while setting display {self.displays[displayNum][1]} with value {value}")
-            log.error(f"Error while setting display {displayNum} {self.displays[displayNum][1]} with value {value}")
+            log.error(f"Error while setting display {displayNum} {self.displays[displayNum][1]} with value {value}: {e}")
 
 
+    def _probe_display(self, displayNum):
+        """
+        Reads every supported monitor feature of a display in one batch,
+        called from the probing threads
+        """
+        bus = self.displays[displayNum][2]
+        if bus is None:
+            raise DDC.DDCError(f"no I2C bus known for {self.displays[displayNum][0]}")
+        try:
+            supported = self.capabilities.get(
+                self.displayKeys[displayNum],
+                lambda: self.ddc.capabilities(bus).result())["vcp"]
+        except DDC.DDCError as e:
+            log.warning(f"No capabilities for display {self.displays[displayNum]}: {e}")
+            supported = {}
+        features = [feature for feature in DDC.MONITOR_FEATURES
+                    if feature == DDC.BRIGHTNESS or feature in supported]
+        results = self.ddc.getvcp_many(bus, features).result()
+        if isinstance(results[DDC.BRIGHTNESS], Exception):
+            raise results[DDC.BRIGHTNESS]
+        return results
+
+    def _display_probed(self, displayNum, result):
+        """ Stores a display's startup features, called from the probing threads """
+        if isinstance(result, Exception):
+            return
+        current, maximum = result[DDC.BRIGHTNESS]
+        self.displayMaxes[displayNum] = maximum
+        self.displayValues[displayNum] = current
+        self.displayFeatures[displayNum] = {
+            feature: value for feature, value in result.items()
+            if not isinstance(value, Exception)}
+
     def __init__(self, parent=None):
         """Initializes"""
         QtWidgets.QMainWindow.__init__(self, parent)
@@ -102,29 +262,35 @@ class MyApplication(QtWidgets.QMainWindow):
             log.warning("Wayland session detected!")
             QtWidgets.QMessageBox.warning(self, "Wayland Environment", "Wayland is in EXPERIMENTAL support. Software brightness is currently broken.")
 
-        # check if ddcutil is installed
-        try:
-            if "ddcutil" in str(
-                    subprocess.check_output(["ddcutil", "--version"]), 'utf-8'):
-                if "sudo modprobe" in str(
-                        subprocess.check_output(["ddcutil", "environment"]),
-                        'utf-8'):
-                    self.ui.ddcutilsNotInstalled.setText("add i2c-dev to etc/modules-load.d")
-
-                envCheck = str(subprocess.check_output(["ddcutil", "environment"]), 'utf-8')
-
-                if "not a member of group i2c" in envCheck:
-
-                    log.fatal(f"[DDCUtil] User is not part of i2c group! Run 'sudo usermod -G i2c -a {getpass.getuser()}'")
-                    errorBox = QtWidgets.QMessageBox.critical(None, 
-                                                    "DDCUtil User config error!",
-                                                    f"User is not part of i2c group! Run 'sudo usermod -G i2c -a {getpass.getuser()}'",
-                                                    QtWidgets.QMessageBox.StandardButton.Close)
-                    exit()
-                else:
-                    self.ddcutil_Installed = True
-        except Exception:
-            self.ddcutil_Installed = False 
+        # the native backend talks to /dev/i2c-N itself and needs no ddcutil
+        if ddcBackend == "native":
+            self.ddcutil_Installed = bool(DDCI2C.accessible_buses())
+            if not self.ddcutil_Installed:
+                log.warning(f"[ddc-i2c] no accessible /dev/i2c-N, run 'sudo usermod -G i2c -a {getpass.getuser()}'")
+        else:
+            # check if ddcutil is installed
+            try:
+                if "ddcutil" in str(
+                        subprocess.check_output(["ddcutil", "--version"]), 'utf-8'):
+                    if "sudo modprobe" in str(
+                            subprocess.check_output(["ddcutil", "environment"]),
+                            'utf-8'):
+                        self.ui.ddcutilsNotInstalled.setText("add i2c-dev to etc/modules-load.d")
+
+                    envCheck = str(subprocess.check_output(["ddcutil", "environment"]), 'utf-8')
+
+                    if "not a member of group i2c" in envCheck:
+
+                        log.fatal(f"[DDCUtil] User is not part of i2c group! Run 'sudo usermod -G i2c -a {getpass.getuser()}'")
+                        errorBox = QtWidgets.QMessageBox.critical(None, 
+                                                        "DDCUtil User config error!",
+                                                        f"User is not part of i2c group! Run 'sudo usermod -G i2c -a {getpass.getuser()}'",
+                                                        QtWidgets.QMessageBox.StandardButton.Close)
+                        exit()
+                    else:
+                        self.ddcutil_Installed = True
+            except Exception:
+                self.ddcutil_Installed = False 
 
         log.info(f"DDCUtils installed: {self.ddcutil_Installed}")
 
@@ -141,6 +307,25 @@ class MyApplication(QtWidgets.QMainWindow):
         
         self.updatingMode = False
 
+        self.ddc = None
+        self.brightness_writes = CoalescingWriteQueue(self._write_brightness,
+                                                      "brightness")
+        self.brightness_fader = Fader(self._fade_brightness_step, "brightness-fade")
+        # {output: [brightness, red, green, blue]} last written as gamma
+        self.gammaLevels = {}
+        self.gamma_fader = Fader(self._fade_gamma_step, "gamma-fade")
+        # one batch of gamma updates per frame, however fast the sliders move
+        self.gamma_writes = CoalescingWriteQueue(
+            self._write_gamma_levels, "gamma", 1 / gammaRate,
+            lambda pending, changes: {**pending, **changes})
+        self.gammaTransaction = None
+        self.gamma = XRandRGamma.open_backend()
+        if self.ddcutil_Installed:
+            transport = DDCI2C.I2CTransport() if ddcBackend == "native" else None
+            log.info(f"DDC backend: {ddcBackend}")
+            self.ddc = DDC.DDCWorker(transport)
+            self.ddc.start()
+
         self.tray_menu = None
         self.tray_icon = None
         self.display1 = None
@@ -160,55 +345,39 @@ class MyApplication(QtWidgets.QMainWindow):
         # icon.addFile("../../../../../../usr/share/icons/hicolor/scalable/apps/brightness-controller.svg", QSize(), QIcon.Normal, QIcon.Off)
         self.setWindowIcon(self.ui_icon)
         self.temperature = 'Default'
+        # the settings last loaded, they keep the values of displays not connected now
+        self.settings = SavedSettings.Settings()
         self.no_of_connected_dev = 0
-        self.__assign_displays()
-
-        #moved to directly after __assign_displays to prevent comboboxes having items added in the original order from xrandr
-        if self.ddcutil_Installed:
-            self.displays = CDisplay.match_ddc_order(self.displays)
-
-            self.verbose(2, str(self.displays) + " : reordered displays")
-
-            self.ui.ddcutilsNotInstalled.setVisible(False)
-        
-            log.info("Getting display brightness ranges.")
-
-            for i in range(len(self.displays)):
-                self.ui.directControlBox.setEnabled(True)
-
-                brightnessValue = ""
-
-                brightnessValue = subprocess.getoutput(f"ddcutil getvcp 10 -d {i + 1}") # Ignores the return value
-                log.info(brightnessValue)
-                if "Display not found" in brightnessValue:
-                    log.error(f"Display wasn't found for command `ddcutil getvcp 10 -d {i + 1}`")
-                    self.ui.ddcutilsNotInstalled.setVisible(True)
-                    self.ui.ddcutilsNotInstalled.setText("Laptop Displays Not Supported")
-                    self.displayMaxes.append(1)
-                    self.displayValues.append(1)
-                    continue
+        self.setup_default_directory()
+        self.capabilities = Capabilities.CapabilitiesCache()
 
-                self.displayMaxes.append(int(
-                    brightnessValue.split(",")[1].split("=")[1].strip()))
+        detectionStart = time.perf_counter()
+        self.display_cache = DisplayCache.load(ddc=self.ddcutil_Installed)
+        if self.display_cache:
+            self.__assign_displays(DisplayCache.displays(self.display_cache))
+        else:
+            self.__assign_displays()
 
-                self.displayValues.append(int(
-                    brightnessValue.split(',')[0].split('=')[1].strip()))
+            #moved to directly after __assign_displays to prevent comboboxes having items added in the original order from xrandr
+            if self.ddcutil_Installed:
+                self.displays = match_ddc_buses(self.displays, self.ddc.transport)
+                self.verbose(2, "%s : reordered displays", self.displays)
 
-            log.info(f"current display values {self.displayValues}") 
-            log.info(f"display maxes: {self.displayMaxes}")
+        log.info(f"Display detection took {time.perf_counter() - detectionStart:.3f}s "
+                 f"(topology cache {'hit' if self.display_cache else 'miss'})")
 
-                    
+        if self.ddcutil_Installed:
+            self.ui.ddcutilsNotInstalled.setVisible(False)
+            self.probe_display_brightness()
 
-        self.setup_default_directory()
+        self.update_display_cache()
         self.generate_dynamic_items()
         self.default_config = '/home/{}/.config/' \
                               'brightness_controller/settings' \
             .format(getpass.getuser())
-        self.values = []
-        self.array_value = 0.01
-        for i in range(0, 100):
-            self.values.append(self.array_value)
-            self.array_value += 0.01
+        self.values = GammaRamps.LEVELS
+        # loading a settings file in the old format saves it, which starts this
+        self.autosave = None
         self.connect_handlers()
         self.setup_widgets()
 
@@ -226,6 +395,10 @@ class MyApplication(QtWidgets.QMainWindow):
             else:
             """
 
+        self.setup_schedule()
+        self.setup_hotplug()
+        if path.exists(self.default_config):
+            self.start_autosave()
 
         self.canCloseToTray = False
 
@@ -235,6 +408,250 @@ class MyApplication(QtWidgets.QMainWindow):
 
         log.info("Init finished!")
 
+    def setup_schedule(self):
+        """
+        Starts the day and night schedule of the settings file, if it has one.
+        A single timer sleeps until the next transition and steps through it.
+        """
+        self.schedule = None
+        self.scheduleApplied = None
+        self.scheduleTimer = QtCore.QTimer(self)
+        self.scheduleTimer.setSingleShot(True)
+        self.scheduleTimer.timeout.connect(self._schedule_tick)
+        options = ReadConfig.read_schedule(self.default_config) \
+            if path.exists(self.default_config) else None
+        if options is None:
+            return
+        try:
+            self.schedule = NightLight.Schedule.from_settings(
+                options,
+                ColorTemperature.parse(self.temperature) or ColorTemperature.NEUTRAL_KELVIN,
+                int(round(self.ui.primary_brightness.value() /
+                          max(1, self.ui.primary_brightness.maximum()) * 100)))
+        except ValueError as e:
+            log.error(f"Invalid [schedule] in {self.default_config}: {e}")
+            return
+        log.info(f"Day and night schedule: {options}")
+        self._schedule_tick()
+
+    def _schedule_tick(self):
+        """ Applies the scheduled state and sets the timer for the next change """
+        now = datetime.now().astimezone()
+        kelvin, brightness, transitioning = self.schedule.state(now)
+        if (kelvin, brightness) != self.scheduleApplied:
+            self.scheduleApplied = (kelvin, brightness)
+            log.info(f"Schedule: {kelvin}K at {brightness}% brightness")
+            with self.gamma_transaction():
+                self.temperature = f"{kelvin}K"
+                self.ui.comboBox.setEditText(self.temperature)
+                self.apply_temperature(kelvin)
+                for slider in (self.ui.primary_brightness, self.ui.secondary_brightness):
+                    if slider.isEnabled():
+                        slider.setValue(int(round(brightness / 100 * slider.maximum())))
+        if transitioning:
+            delay = self.schedule.step_interval(self.write_cost())
+        else:
+            delay = (self.schedule.next_transition(now) - now).total_seconds()
+        self.scheduleTimer.start(int(max(delay, NightLight.MIN_STEP_INTERVAL) * 1000))
+
+    def write_cost(self):
+        """ Returns the seconds one brightness and colour update currently takes """
+        cost = self.gamma_writes.write_cost()
+        if self.ddc is not None and self.ui.directControlBox.isChecked():
+            buses = [display[2] for display in self.displays if display[2] is not None]
+            cost = max([cost] + [self.ddc.latency(bus) for bus in buses])
+        return cost
+
+    def probe_display_brightness(self):
+        """ Reads the brightness range of every display over DDC """
+        log.info("Getting display brightness ranges.")
+
+        if self.displays:
+            self.ui.directControlBox.setEnabled(True)
+
+        # every display starts at its cached max and is filled in as its probe answers
+        self.displayMaxes = DisplayCache.maxes(self.display_cache) \
+            if self.display_cache else [1] * len(self.displays)
+        self.displayValues = [1] * len(self.displays)
+        self.displayFeatures = [{} for display in self.displays]
+        self.displayKeys = self.display_keys()
+        buses = {i: display[2] for i, display in enumerate(self.displays)}
+        # monitors tuned with --calibrate-ddc get their learned timing
+        DDCTuning.TimingCache().apply(self.ddc.transport,
+                                      dict(zip(self.displayKeys, buses.values())))
+        probed = DDC.probe_displays(self._probe_display, buses,
+                                    self._display_probed)
+
+        for displayNum, result in probed.items():
+            if isinstance(result, Exception):
+                log.error(f"Display {self.displays[displayNum]} could not be read: {result}")
+                self.displayMaxes[displayNum] = 1
+                self.ui.ddcutilsNotInstalled.setVisible(True)
+                self.ui.ddcutilsNotInstalled.setText("Laptop Displays Not Supported")
+
+        log.info("current display values %s", self.displayValues)
+        log.info("display maxes: %s", self.displayMaxes)
+        log.debug("display features: %s", self.displayFeatures)
+
+        try:
+            self.capabilities.save()
+        except OSError as e:
+            log.error(f"Could not write the capabilities cache: {e}")
+
+    def display_keys(self):
+        """ Returns the EDID cache key of every display, in display order """
+        if self.display_cache:
+            return DisplayCache.keys(self.display_cache)
+        return DisplayCache.display_keys(self.displays, CDisplay.display_edids)
+
+    def update_display_cache(self):
+        """
+        Writes the detected topology to the cache, or checks a cached
+        topology against a full detection in the background
+        """
+        if self.display_cache:
+            self.topologyChanged.connect(self._topology_changed)
+            threading.Thread(target=self._revalidate_display_cache,
+                             name="display-cache", daemon=True).start()
+            return
+        try:
+            self.display_cache = DisplayCache.build(
+                self.displays, CDisplay.display_edids,
+                self.displayMaxes if self.ddcutil_Installed else None,
+                self.ddcutil_Installed)
+            DisplayCache.save(self.display_cache)
+        except OSError as e:
+            log.error(f"Could not write the display cache: {e}")
+
+    def _revalidate_display_cache(self):
+        """ Runs the full display detection off the GUI thread """
+        try:
+            start = time.perf_counter()
+            displays = CDisplay.extract_display_names()
+            if self.ddcutil_Installed:
+                displays = match_ddc_buses(displays, self.ddc.transport)
+            cache = DisplayCache.build(displays, CDisplay.display_edids,
+                                       ddc=self.ddcutil_Installed)
+            DisplayCache.merge_maxes(cache, self.display_cache)
+            log.info(f"Uncached display detection took {time.perf_counter() - start:.3f}s")
+
+            if DisplayCache.topology(cache) == DisplayCache.topology(self.display_cache):
+                log.info("Display cache is up to date")
+                return
+
+            log.warning(f"Display topology changed from {DisplayCache.keys(self.display_cache)} "
+                        f"to {DisplayCache.keys(cache)}, rebuilding the display cache")
+            DisplayCache.save(cache)
+            self.display_cache = cache
+            self.topologyChanged.emit(DisplayCache.displays(cache))
+        except Exception:
+            log.error(f"Display cache revalidation failed: {traceback.format_exc()}")
+
+    def _topology_changed(self, displays):
+        """ Replaces the cached display list once the real one is known """
+        self.__assign_displays(displays)
+        if self.ddcutil_Installed:
+            self.probe_display_brightness()
+        self.refresh_display_widgets()
+
+    def setup_hotplug(self):
+        """ Watches for monitors being plugged in or out """
+        self.displaysHotplugged.connect(self.update_displays)
+        self.hotplug = Hotplug.HotplugWatcher(self._hotplugged)
+        if self.hotplug.start():
+            log.info("Watching for display hotplug")
+
+    def _hotplugged(self, added, removed):
+        """
+        Updates the display list, runs on the hotplug thread. Only the
+        connectors that changed are read again, the other displays keep
+        their entries.
+        """
+        rename = (lambda connector: connector) if self.waylandEnvironment \
+            else CDisplay.randr_connector
+        displays = CDisplay.update_display_names(self.displays, added, removed, rename)
+        if displays is None:
+            displays = CDisplay.extract_display_names()
+            buses = {display[0]: display[2] for display in self.displays
+                     if len(display) > 2}
+            displays = [display[:2] + [buses.get(display[0])] for display in displays]
+        addedConnectors = {rename(connector) for connector in added}
+        if self.ddcutil_Installed and any(display[0] in addedConnectors and display[2] is None
+                                          for display in displays):
+            # the driver links no bus to a new connector, ask DDC for all of them
+            buses = {display[0]: display[2]
+                     for display in match_ddc_buses(displays, self.ddc.transport)}
+            displays = [display[:2] + [buses.get(display[0]) if display[0] in addedConnectors
+                                       else display[2]] for display in displays]
+        keys = DisplayCache.display_keys(displays, CDisplay.display_edids)
+        self.displaysHotplugged.emit(displays, keys)
+
+    def update_displays(self, displays, keys):
+        """
+        Swaps in a re-detected display list. Displays that were already
+        known keep their brightness range and values, only new ones are probed.
+        """
+        self.brightness_fader.cancel_all()
+        self.brightness_writes.flush(5)
+        known = {key: i for i, key in enumerate(self.displayKeys)}
+
+        def carried(values, default):
+            return [values[known[key]] if key in known and known[key] < len(values)
+                    else default() for key in keys]
+
+        self.displayMaxes = carried(self.displayMaxes, lambda: 1)
+        self.displayValues = carried(self.displayValues, lambda: 1)
+        self.displayFeatures = carried(self.displayFeatures, dict)
+        self.displayKeys = keys
+        self.__assign_displays(displays)
+
+        added = {i: display[2] for i, display in enumerate(displays)
+                 if keys[i] not in known}
+        if self.ddcutil_Installed and added:
+            DDCTuning.TimingCache().apply(self.ddc.transport,
+                                          {keys[i]: bus for i, bus in added.items()})
+            probed = DDC.probe_displays(self._probe_display, added,
+                                        self._display_probed)
+            for displayNum, result in probed.items():
+                if isinstance(result, Exception):
+                    log.error(f"Display {self.displays[displayNum]} could not be read: {result}")
+                    self.displayMaxes[displayNum] = 1
+        log.info(f"Displays after hotplug: {self.displays}, probed {sorted(added)}")
+
+        # the widgets look the displays' keys up in the cache
+        self.display_cache = DisplayCache.build(
+            self.displays, CDisplay.display_edids,
+            self.displayMaxes if self.ddcutil_Installed else None,
+            self.ddcutil_Installed)
+        try:
+            DisplayCache.save(self.display_cache)
+        except OSError as e:
+            log.error(f"Could not write the display cache: {e}")
+        # CRTCs may have been handed to other outputs
+        try:
+            self.gamma.refresh()
+        except XRandRGamma.GammaError as e:
+            log.error(f"[gamma] could not re-read the outputs: {e}")
+        self.refresh_display_widgets()
+
+    def refresh_display_widgets(self):
+        """ Refills the display combo boxes after the display list changed """
+        self.ui.primary_combobox.clear()
+        self.ui.secondary_combo.clear()
+        self.ui.primary_combobox.setEnabled(True)
+        self.ui.secondary_combo.setEnabled(True)
+        self.generate_brightness_sources()
+        secondary = self.no_of_connected_dev >= 2
+        self.enable_secondary_widgets(secondary)
+        if secondary:
+            self.connect_secondary_widgets()
+            self.ui.secondary_combo.setCurrentIndex(1)
+        else:
+            self.disconnect_secondary_widgets()
+
+        if self.ui.directControlBox.isChecked():
+            self.directControlUpdate(0)
+
     def setup_default_directory(self):
         """ Create default settings directory if it doesnt exist """
         directory = '/home/{}/.config/' \
@@ -256,6 +673,10 @@ class MyApplication(QtWidgets.QMainWindow):
                                                    QtWidgets.QMessageBox.No)
             if reply == QtWidgets.QMessageBox.Yes:
                 event.accept()
+                self.hotplug.stop()
+                self.stop_autosave()
+                self.stop_ddc()
+                self.stop_gamma()
                 log.info("Application Exiting!")
                 sys.exit(self.APP.exec_())
             else:
@@ -274,9 +695,29 @@ class MyApplication(QtWidgets.QMainWindow):
                                                QtWidgets.QMessageBox.No,
                                                QtWidgets.QMessageBox.No)
         if reply == QtWidgets.QMessageBox.Yes:
+            self.hotplug.stop()
+            self.stop_autosave()
+            self.stop_ddc()
+            self.stop_gamma()
             log.info("Application Exiting!")
             sys.exit(self.APP.exec_())
 
+    def stop_gamma(self):
+        """ Writes the last queued gamma levels and disconnects from the X server """
+        self.gamma_writes.flush(5)
+        log.info(f"[gamma] updates: {self.gamma_writes.counters()}")
+        self.gamma.close()
+
+    def stop_ddc(self):
+        """ Drains the DDC worker and logs its latency report """
+        if self.ddc is not None:
+            for displayNum in range(len(self.displays)):
+                self.brightness_fader.wait(displayNum, fadeDuration + 5)
+            self.brightness_writes.flush(5)
+            log.info(f"[ddc] brightness writes: {self.brightness_writes.counters()}")
+            self.ddc.stop()
+            self.ddc = None
+
     def setup_tray(self, parent):
         # Setup system tray
         self.tray_menu = QtWidgets.QMenu(parent)
@@ -382,6 +823,10 @@ class MyApplication(QtWidgets.QMainWindow):
             lambda: self.save_settings(True))
 
         self.ui.comboBox.activated[str].connect(self.combo_activated)
+        # any temperature can be typed in, the presets stay as shortcuts
+        self.ui.comboBox.setEditable(True)
+        self.ui.comboBox.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        self.ui.comboBox.lineEdit().returnPressed.connect(self._temperature_entered)
         self.ui.primary_combobox.activated[
             str].connect(self.primary_source_combo_activated)
         self.ui.secondary_combo.activated[
@@ -393,6 +838,33 @@ class MyApplication(QtWidgets.QMainWindow):
         self.ui.actionSave.triggered.connect(self.save_settings)
         self.ui.actionLoad.triggered.connect(self.load_settings)
 
+        for widget in (self.ui.primary_brightness, self.ui.primary_red,
+                       self.ui.primary_green, self.ui.primary_blue,
+                       self.ui.secondary_brightness, self.ui.secondary_red,
+                       self.ui.secondary_green, self.ui.secondary_blue):
+            widget.valueChanged.connect(self.settings_changed)
+        for combo in (self.ui.comboBox, self.ui.primary_combobox, self.ui.secondary_combo):
+            combo.activated.connect(self.settings_changed)
+        self.ui.comboBox.lineEdit().returnPressed.connect(self.settings_changed)
+
+    def start_autosave(self):
+        """ Keeps the default settings file up to date with every change """
+        if args.no_autosave or self.autosave is not None:
+            return
+        self.autosave = Autosave(self.default_config)
+        log.info(f"Autosaving settings to {self.default_config}")
+
+    def settings_changed(self, *unused):
+        """ Hands the current settings to the autosave, written once changes stop """
+        if self.autosave is not None and self.displays:
+            self.autosave.changed(self.current_settings())
+
+    def stop_autosave(self):
+        """ Writes settings still waiting for the quiet period """
+        if self.autosave is not None:
+            self.autosave.flush(5)
+            log.info(f"[autosave] {self.autosave.counters()}")
+
     def directControlUpdate(self, value):
 
         if self.ddcutil_Installed and self.waylandEnvironment and not self.ui.directControlBox.isChecked():
@@ -445,8 +917,9 @@ class MyApplication(QtWidgets.QMainWindow):
             self.ui.secondary_brightness.setEnabled(True)
             self.ui.primary_brightness.setMaximum(99)
             self.ui.secondary_brightness.setMaximum(99)
-            self.ui.primary_brightness.setValue(99)
-            self.ui.secondary_brightness.setValue(99)
+            with self.gamma_transaction():
+                self.ui.primary_brightness.setValue(99)
+                self.ui.secondary_brightness.setValue(99)
             self.ui.primary_brightness.setFocusPolicy(Qt.StrongFocus)
             self.ui.primary_brightness.setTracking(True)
             self.ui.secondary_brightness.setFocusPolicy(Qt.StrongFocus)
@@ -464,19 +937,32 @@ class MyApplication(QtWidgets.QMainWindow):
         self.ui.secondary_red.setEnabled(boolean)
         self.ui.secondary_green.setEnabled(boolean)
 
+    def secondary_handlers(self):
+        return ((self.ui.secondary_brightness, self.change_value_sbr),
+                (self.ui.secondary_red, self.change_value_sr),
+                (self.ui.secondary_blue, self.change_value_sb),
+                (self.ui.secondary_green, self.change_value_sg))
+
     def connect_secondary_widgets(self):
         """
-        connects the secondary widgets with functions
+        connects the secondary widgets with functions, once
         """
+        if self.secondaryConnected:
+            return
         self.ui.secondary_brightness.setTracking(False)
-        self.ui.secondary_brightness.valueChanged[int]. \
-            connect(self.change_value_sbr)
-        self.ui.secondary_red.valueChanged[int]. \
-            connect(self.change_value_sr)
-        self.ui.secondary_blue.valueChanged[int]. \
-            connect(self.change_value_sb)
-        self.ui.secondary_green.valueChanged[int]. \
-            connect(self.change_value_sg)
+        for widget, handler in self.secondary_handlers():
+            widget.valueChanged[int].connect(handler)
+        self.secondaryConnected = True
+
+    def disconnect_secondary_widgets(self):
+        """
+        disconnects the secondary widgets when only one display is left
+        """
+        if not self.secondaryConnected:
+            return
+        for widget, handler in self.secondary_handlers():
+            widget.valueChanged[int].disconnect(handler)
+        self.secondaryConnected = False
 
     def change_value_pbr(self):
         """Changes Primary Display Brightness"""
@@ -487,63 +973,37 @@ class MyApplication(QtWidgets.QMainWindow):
             self.directlySetBrightness(self.ui.primary_combobox.currentIndex(),
                                             self.ui.primary_brightness.value())
 
-            self.displayValues[self.ui.primary_combobox.currentIndex()] = int(
-                round(self.ui.primary_brightness.value() / 100 *
-                      self.displayMaxes[
-                          self.ui.primary_combobox.currentIndex()]))
-
         else:
-            value = self.ui.primary_brightness.value()
-            cmd_value = "xrandr\
-			--output %s \
-			--brightness %s\
-			--gamma %s:%s:%s" % \
-                        (self.display1,
-                         self.values[value],
-                         self.values[self.ui.primary_red.value()],
-                         self.values[self.ui.primary_green.value()],
-                         self.values[self.ui.primary_blue.value()])
-            Executor.execute_command(cmd_value)
+            self.fade_gamma(self.display1,
+                            self.ui.primary_brightness.value(),
+                            self.ui.primary_red.value(),
+                            self.ui.primary_green.value(),
+                            self.ui.primary_blue.value(),
+                            self.ui.primary_brightness.isSliderDown())
 
     def change_value_pr(self, value):
         """Changes Primary Display Red ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display1,
-                     self.values[self.ui.primary_brightness.value() - 1],
-                     self.values[value],
-                     self.values[self.ui.primary_green.value()],
-                     self.values[self.ui.primary_blue.value()])
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display1,
+                              self.ui.primary_brightness.value() - 1,
+                              value,
+                              self.ui.primary_green.value(),
+                              self.ui.primary_blue.value())
 
     def change_value_pg(self, value):
         """Changes Primary Display Green ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display1,
-                     self.values[self.ui.primary_brightness.value() - 1],
-                     self.values[self.ui.primary_red.value()],
-                     self.values[value],
-                     self.values[self.ui.primary_blue.value()])
-
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display1,
+                              self.ui.primary_brightness.value() - 1,
+                              self.ui.primary_red.value(),
+                              value,
+                              self.ui.primary_blue.value())
 
     def change_value_pb(self, value):
         """Changes Primary Display Blue ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display1,
-                     self.values[self.ui.primary_brightness.value() - 1],
-                     self.values[self.ui.primary_red.value()],
-                     self.values[self.ui.primary_green.value()],
-                     self.values[value])
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display1,
+                              self.ui.primary_brightness.value() - 1,
+                              self.ui.primary_red.value(),
+                              self.ui.primary_green.value(),
+                              value)
 
     def change_value_sbr(self):
         """
@@ -556,64 +1016,37 @@ class MyApplication(QtWidgets.QMainWindow):
             self.directlySetBrightness(self.ui.secondary_combo.currentIndex(),
                                             self.ui.secondary_brightness.value())
 
-            self.displayValues[self.ui.secondary_combo.currentIndex()] = int(
-                round((self.ui.secondary_brightness.value() / 100 *
-                       self.displayMaxes[
-                           self.ui.secondary_combo.currentIndex()])))
-
-
         else:
-            value = self.ui.secondary_brightness.value()
-            cmd_value = "xrandr\
-			--output %s \
-			--brightness %s\
-			--gamma %s:%s:%s" % \
-                        (self.display2,
-                         self.values[value - 1],
-                         self.values[self.ui.secondary_red.value()],
-                         self.values[self.ui.secondary_green.value()],
-                         self.values[self.ui.secondary_blue.value()])
-            Executor.execute_command(cmd_value)
+            self.fade_gamma(self.display2,
+                            self.ui.secondary_brightness.value() - 1,
+                            self.ui.secondary_red.value(),
+                            self.ui.secondary_green.value(),
+                            self.ui.secondary_blue.value(),
+                            self.ui.secondary_brightness.isSliderDown())
 
     def change_value_sr(self, value):
         """Changes Secondary Display Red ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display2,
-                     self.values[self.ui.secondary_brightness.value() - 1],
-                     self.values[value],
-                     self.values[self.ui.secondary_green.value()],
-                     self.values[self.ui.secondary_blue.value()])
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display2,
+                              self.ui.secondary_brightness.value() - 1,
+                              value,
+                              self.ui.secondary_green.value(),
+                              self.ui.secondary_blue.value())
 
     def change_value_sg(self, value):
         """Changes Secondary Display Green ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display2,
-                     self.values[self.ui.secondary_brightness.value() - 1],
-                     self.values[self.ui.secondary_red.value()],
-                     self.values[value],
-                     self.values[self.ui.secondary_blue.value()])
-
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display2,
+                              self.ui.secondary_brightness.value() - 1,
+                              self.ui.secondary_red.value(),
+                              value,
+                              self.ui.secondary_blue.value())
 
     def change_value_sb(self, value):
         """Changes Primary Display Blue ratio"""
-        cmd_value = "xrandr\
-		--output %s \
-		--brightness %s\
-		--gamma %s:%s:%s" % \
-                    (self.display2,
-                     self.values[self.ui.secondary_brightness.value() - 1],
-                     self.values[self.ui.secondary_red.value()],
-                     self.values[self.ui.secondary_green.value()],
-                     self.values[value])
-        Executor.execute_command(cmd_value)
+        self.set_gamma_levels(self.display2,
+                              self.ui.secondary_brightness.value() - 1,
+                              self.ui.secondary_red.value(),
+                              self.ui.secondary_green.value(),
+                              value)
 
     def changed_state(self, state):
         if state == QtCore.Qt.Checked:
@@ -657,59 +1090,57 @@ class MyApplication(QtWidgets.QMainWindow):
 
     def combo_activated(self, text):
         """ Designates values to display and to sliders """
+        kelvin = ColorTemperature.parse(text)
+        if kelvin is None:
+            log.warning(f"Not a colour temperature: {text}")
+            return
         self.temperature = text
-        if text == 'Default':
-            rgb = [255, 255, 255]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
+        self.apply_temperature(kelvin)
 
-        elif text == '1900K Candle':
-            rgb = [255, 147, 41]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '2600K 40W Tungsten':
-            rgb = [255, 197, 143]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '2850K 100W Tungsten':
-            rgb = [255, 214, 170]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '3200K Halogen':
-            rgb = [255, 241, 224]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '5200K Carbon Arc':
-            rgb = [255, 250, 244]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '5400K High Noon':
-            rgb = [255, 255, 251]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '6000K Direct Sun':
-            rgb = [255, 255, 255]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '7000K Overcast Sky':
-            rgb = [201, 226, 255]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
-                self.change_secondary_sliders(rgb)
-        elif text == '20000K Clear Blue Sky':
-            rgb = [64, 156, 255]
-            self.change_primary_sliders(rgb)
-            if self.no_of_connected_dev >= 2:
+    def _temperature_entered(self):
+        """ Applies a temperature typed into the temperature combo box """
+        self.combo_activated(self.ui.comboBox.currentText())
+
+    def apply_temperature(self, kelvin):
+        """
+        Tints the primary and secondary display to a colour temperature,
+        with the monitor's own RGB gains in direct control mode when it has
+        them and with the gamma sliders otherwise
+        """
+        gains = ColorTemperature.gains(kelvin)
+        rgb = [gain * 255 for gain in gains]
+        with self.gamma_transaction():
+            if not self.set_hardware_gains(self.ui.primary_combobox.currentIndex(), gains):
+                self.change_primary_sliders(rgb)
+            if self.no_of_connected_dev >= 2 and \
+                    not self.set_hardware_gains(self.ui.secondary_combo.currentIndex(), gains):
                 self.change_secondary_sliders(rgb)
 
+    def set_hardware_gains(self, displayNum, gains):
+        """
+        Writes red, green and blue gains (0 - 1) to a display's RGB gain VCPs
+        Returns False when the display is not under direct control or has no gain controls
+        """
+        if not self.ui.directControlBox.isChecked() or self.ddc is None \
+                or displayNum >= len(self.displayFeatures):
+            return False
+        features = self.displayFeatures[displayNum]
+        bus = self.displays[displayNum][2]
+        if bus is None or not all(feature in features for feature in HARDWARE_GAINS):
+            return False
+        for feature, gain in zip(HARDWARE_GAINS, gains):
+            value = int(round(gain * features[feature][1]))
+            self.ddc.setvcp(bus, value, feature).add_done_callback(
+                lambda future, feature=feature: self._log_vcp_error(displayNum, feature, future))
+            features[feature] = (value, features[feature][1])
+        return True
+
+    def _log_vcp_error(self, displayNum, feature, future):
+        """ Logs a failed VCP write, called from the DDC worker """
+        if future.exception() is not None:
+            log.error(f"Could not set VCP 0x{feature:02x} of display {displayNum}: "
+                      f"{future.exception()}")
+
     def change_primary_sliders(self, rgb):
         """
         rgb - based on the rgb array, assign values to primary display sliders
@@ -780,26 +1211,19 @@ class MyApplication(QtWidgets.QMainWindow):
         self.help_widget.show()
 
     def save_settings(self, default=False):
-        """ save current primary and secondary display settings"""
+        """ save the current settings of every display"""
         file_path = self.default_config if default else \
             QtWidgets.QFileDialog.getSaveFileName()[
                 0]
         # just a number. path.exists won't work in case it is a new file.
-        if len(file_path) > 5:
+        if len(file_path) > 5 and self.no_of_connected_dev >= 1:
             if default:
                 self.ui.actionClearDefault.setVisible(True)
+                self.start_autosave()
+            settings = self.current_settings()
             try:
-                if self.no_of_connected_dev == 1:
-                    WriteConfig.write_primary_display(
-                        self.return_current_primary_settings(),
-                        file_path
-                    )
-                elif self.no_of_connected_dev >= 2:
-                    WriteConfig.write_both_display(
-                        self.return_current_primary_settings(),
-                        self.return_current_secondary_settings(),
-                        file_path
-                    )
+                WriteConfig.write_settings(settings, file_path)
+                self.settings = settings
             except PermissionError:
                 self._show_error(
                     "Does not have permission to write file at " + file_path)
@@ -807,6 +1231,34 @@ class MyApplication(QtWidgets.QMainWindow):
                 self._show_error(
                     "Does not have permission to write file at " + file_path)
 
+    def current_settings(self):
+        """
+        Returns the Settings to save. The displays the slider groups control
+        are saved as they are now, every other display as it was loaded.
+        """
+        keys = self.display_keys()
+        current = SavedSettings.Settings(self.temperature)
+        connectedKeys = {self.settings.key_of(key, display[0]): key
+                         for key, display in zip(keys, self.displays)}
+        for key, saved in self.settings.displays.items():
+            # loaded values of connected displays move to their current key
+            current.set(connectedKeys.get(key, key), saved)
+
+        groups = [(self.ui.primary_combobox.currentIndex(),
+                   self.return_current_primary_settings())]
+        if self.no_of_connected_dev >= 2:
+            groups.append((self.ui.secondary_combo.currentIndex(),
+                           self.return_current_secondary_settings()))
+        for displayNum, values in groups:
+            displayNum = max(0, displayNum)
+            current.set(keys[displayNum], SavedSettings.DisplaySettings(
+                *values[:4], connector=self.displays[displayNum][0],
+                name=self.displays[displayNum][1]))
+        current.primary = keys[max(0, groups[0][0])]
+        if len(groups) > 1:
+            current.secondary = keys[max(0, groups[1][0])]
+        return current
+
     def _show_error(self, message):
         """ Shows an Error Message"""
         QtWidgets.QMessageBox.critical(self, 'Error', message)
@@ -817,6 +1269,9 @@ class MyApplication(QtWidgets.QMainWindow):
         """
         if path.exists(self.default_config):
             try:
+                if self.autosave is not None:
+                    self.autosave.flush(5)
+                    self.autosave = None
                 remove(self.default_config)
                 self.ui.actionClearDefault.setVisible(False)
             except OSError as e:
@@ -833,55 +1288,71 @@ class MyApplication(QtWidgets.QMainWindow):
             text, QtCore.Qt.MatchFixedString)
         if primary_temperature_index >= 0:
             self.ui.comboBox.setCurrentIndex(primary_temperature_index)
+        else:
+            self.ui.comboBox.setEditText(text)
 
     def load_settings(self, location=None):
         """
-        Load current primary and secondary display settings
+        Load the saved settings of every connected display
         """
         file_path = location or QtWidgets.QFileDialog.getOpenFileName()[0]
-        if path.exists(file_path):
-            loaded_settings = ReadConfig.read_configuration(file_path)
-            if len(loaded_settings) == 5:
-                self._load_temperature(loaded_settings[4])
-                self.primary_sliders_in_rgb_0_99(loaded_settings)
-            elif len(loaded_settings) == 11:
-                # checks just in case saved settings are for two displays,
-                # but loads when only one display is connected
-                if self.no_of_connected_dev == 1:
-                    self.primary_sliders_in_rgb_0_99(
-                        (loaded_settings[0],
-                         loaded_settings[1],
-                         loaded_settings[2],
-                         loaded_settings[3]))
-                    return
-                # sets reverse control
-                primary_source = loaded_settings[4]
-                secondary_source = loaded_settings[10]
-                self._load_temperature(loaded_settings[5])
-                primary_combo_index = self.ui.primary_combobox.findText(
-                    primary_source, QtCore.Qt.MatchFixedString)
-                second_combo_index = self.ui.secondary_combo.findText(
-                    secondary_source, QtCore.Qt.MatchFixedString)
-                if primary_combo_index >= 0:
-                    self.ui.primary_combobox.setCurrentIndex(
-                        primary_combo_index)
-                    self.primary_source_combo_activated(primary_source)
-                if second_combo_index >= 0:
-                    self.ui.secondary_combo.setCurrentIndex(second_combo_index)
-                    self.secondary_source_combo_activated(secondary_source)
-
-                self.primary_sliders_in_rgb_0_99(
-                    (loaded_settings[0],
-                     loaded_settings[1],
-                     loaded_settings[2],
-                     loaded_settings[3]))
-                # (99, 99, 99, 99, 'LVDS-1', 99, 38, 99, 99, 'VGA-1')
-
-                self.secondary_sliders_in_rgb_0_99(
-                    (loaded_settings[6],
-                     loaded_settings[7],
-                     loaded_settings[8],
-                     loaded_settings[9]))
+        if not path.exists(file_path):
+            return
+        try:
+            settings = ReadConfig.read_settings(file_path)
+        except (configparser.Error, ValueError) as e:
+            log.error(f"Could not read settings from {file_path}: {e}")
+            self._show_error(f"Could not read settings from {file_path}")
+            return
+        self.settings = settings
+        keys = self.display_keys()
+        savedKeys = [settings.key_of(key, display[0])
+                     for key, display in zip(keys, self.displays)]
+
+        with self.gamma_transaction():
+            self._load_temperature(settings.temperature)
+            if not self.displays:
+                return
+            groups = [(self.ui.primary_combobox, settings.primary,
+                       self.primary_source_combo_activated,
+                       self.primary_sliders_in_rgb_0_99)]
+            if self.no_of_connected_dev >= 2:
+                groups.append((self.ui.secondary_combo, settings.secondary,
+                               self.secondary_source_combo_activated,
+                               self.secondary_sliders_in_rgb_0_99))
+            shown = set()
+            for combo, savedKey, activated, set_sliders in groups:
+                if savedKey in savedKeys and self.no_of_connected_dev >= 2:
+                    combo.setCurrentIndex(savedKeys.index(savedKey))
+                    activated(combo.currentText())
+                displayNum = max(0, combo.currentIndex())
+                shown.add(displayNum)
+                saved = settings.lookup(keys[displayNum], self.displays[displayNum][0])
+                if saved is None and settings.migrated:
+                    # old files without a known connector held the sliders' values
+                    saved = settings.displays.get(savedKey)
+                if saved is not None:
+                    set_sliders(saved.levels())
+
+            for displayNum, display in enumerate(self.displays):
+                if displayNum in shown or savedKeys[displayNum] is None:
+                    continue
+                self.apply_saved_display(displayNum, settings.displays[savedKeys[displayNum]])
+
+        if settings.migrated and file_path == self.default_config:
+            log.info(f"Migrating {file_path} to the per display settings format")
+            self.save_settings(True)
+
+    def apply_saved_display(self, displayNum, saved):
+        """ Applies saved values to a display neither slider group shows """
+        display = self.displays[displayNum]
+        if self.ui.directControlBox.isChecked():
+            if len(display) > 2 and display[2] is not None and \
+                    not display[0].startswith("eDP"):
+                self.directlySetBrightness(
+                    displayNum, min(saved.brightness, self.displayMaxes[displayNum]))
+        else:
+            self.set_gamma_levels(display[0], *saved.levels())
 
     def return_current_primary_settings(self):
         """
@@ -981,12 +1452,73 @@ class HelpForm(QtWidgets.QWidget):
 parser = argparse.ArgumentParser(prog='ProgramName',
                     description='What the program does',
                     epilog='use --help to show cli arguments')
-parser.add_argument('-v', '--verbose', action='store_const', const=2, default=1)
+parser.add_argument('-v', '--verbose', action='store_const', const=2, default=1,
+                    help='print progress and write debug lines to the log, '
+                         'the log level can also be set with BRIGHTNESS_CONTROLLER_LOG')
+parser.add_argument('--ddc-backend', choices=['ddcutil', 'native'], default='ddcutil',
+                    help='talk DDC/CI through the ddcutil binary or directly over /dev/i2c-N, '
+                         'native also finds the displays itself and needs no ddcutil')
+parser.add_argument('--fade', type=float, default=fadeDuration, metavar='SECONDS',
+                    help='seconds a brightness change fades over, 0 to disable')
+parser.add_argument('--gamma-rate', type=float, default=gammaRate, metavar='HZ',
+                    help='most software brightness and colour updates per display and second')
+parser.add_argument('--calibrate-ddc', action='store_true',
+                    help='measure how fast every monitor answers DDC/CI and remember it')
+parser.add_argument('--no-autosave', action='store_true',
+                    help='only write the default settings when saved from the menu')
+parser.add_argument('--display-backend', choices=['auto', 'sysfs', 'xrandr'], default='auto',
+                    help='enumerate displays from /sys/class/drm or with xrandr --verbose, '
+                         'auto reads sysfs on Wayland and runs xrandr on X11')
 
 args = parser.parse_args()
 verbosity = args.verbose
+if verbosity >= 2:
+    log.set_level(log.DEBUG)
+ddcBackend = args.ddc_backend
+fadeDuration = max(0.0, args.fade)
+gammaRate = max(1.0, args.gamma_rate)
+CDisplay.enumeration = args.display_backend
+
+def match_ddc_buses(displays, transport):
+    """
+    Appends the I2C bus of every display, found by the native transport
+    itself or else by ddcutil
+    """
+    if isinstance(transport, DDCI2C.I2CTransport):
+        transport.detect()
+        return CDisplay.match_native_order(displays, transport.edids)
+    return CDisplay.match_ddc_order(displays)
+
+def calibrate_ddc():
+    """ Tunes the DDC timing of every connected monitor, returns the exit code """
+    log.begin()
+    transport = DDCI2C.I2CTransport() if ddcBackend == "native" \
+        else DDC.DDCUtilTransport()
+    displays = match_ddc_buses(CDisplay.extract_display_names(), transport)
+    keys = DisplayCache.display_keys(displays, CDisplay.display_edids)
+    timings = DDCTuning.TimingCache()
+    status = 0
+    for display, key in zip(displays, keys):
+        bus = display[2] if len(display) > 2 else None
+        if bus is None or display[0].startswith("eDP"):
+            print(f"{display[1]} ({display[0]}): no DDC/CI, skipped")
+            continue
+        try:
+            result = DDCTuning.calibrate(transport, bus)
+        except DDC.DDCError as e:
+            print(f"{display[1]} ({display[0]}): calibration failed: {e}")
+            status = 1
+            continue
+        report = DDCTuning.format_report(display[1], bus, result)
+        print(report)
+        log.info(report)
+        timings.put(key, result)
+    timings.save()
+    return status
 
 def main():
+    if args.calibrate_ddc:
+        sys.exit(calibrate_ddc())
     UUID = 'PHIR-HWOH-MEIZ-AHTA'
     APP = QtSingleApplication(UUID, sys.argv)
     if APP.isRunning():
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Debounced settings autosave.
+Changes are collected until none arrived for a quiet period, then the
+newest settings are written once, atomically, and only if the file would
+actually change.
+"""
+
+import threading
+import time
+
+import brightness_controller_linux.util.log as log
+from brightness_controller_linux.util import write_config
+
+# seconds without a change before the settings are written
+QUIET_SECONDS = 2.0
+
+
+class Autosave:
+    """
+    Writes the settings passed to changed() to file_path on a short lived
+    thread once changes stop for quiet seconds.
+    """
+
+    def __init__(self, file_path, quiet=QUIET_SECONDS):
+        self.file_path = file_path
+        self.quiet = quiet
+        self.condition = threading.Condition()
+        self.pending = None
+        self.deadline = 0.0
+        self.busy = False
+        self.flushing = False
+        try:
+            with open(file_path) as file:
+                self.last_text = file.read()
+        except OSError:
+            self.last_text = None
+        self.changes = 0
+        self.written = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    def changed(self, settings):
+        """settings - the Settings to save, replacing any not written yet"""
+        with self.condition:
+            self.changes += 1
+            self.pending = settings
+            self.deadline = time.monotonic() + self.quiet
+            if self.busy:
+                return
+            self.busy = True
+        threading.Thread(target=self._run, name="autosave", daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                # every change pushes the deadline further out
+                while self.pending is not None and not self.flushing:
+                    delay = self.deadline - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.condition.wait(delay)
+                if self.pending is None:
+                    self.busy = False
+                    self.condition.notify_all()
+                    return
+                settings = self.pending
+                self.pending = None
+            self._save(settings)
+
+    def _save(self, settings):
+        try:
+            text = write_config.serialize_settings(settings, self.file_path)
+            if text == self.last_text:
+                with self.condition:
+                    self.unchanged += 1
+                return
+            write_config.atomic_write(self.file_path, text)
+        except Exception as e:
+            log.error(f"[autosave] writing {self.file_path} failed: {e}")
+            with self.condition:
+                self.failed += 1
+            return
+        with self.condition:
+            self.last_text = text
+            self.written += 1
+
+    def flush(self, timeout=None):
+        """
+        writes pending settings now instead of after the quiet period
+        return False if the timeout expired first
+        """
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            try:
+                return self.condition.wait_for(lambda: not self.busy, timeout)
+            finally:
+                self.flushing = False
+
+    def counters(self):
+        with self.condition:
+            return {"changes": self.changes,
+                    "written": self.written,
+                    "unchanged": self.unchanged,
+                    "failed": self.failed}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Parsing of MCCS capabilities strings and a persistent cache of them, so
+the slow capabilities query runs once per monitor instead of every launch.
+"""
+
+import threading
+
+from brightness_controller_linux.util import json_cache
+
+cache_path = json_cache.cache_directory + 'capabilities_cache.json'
+
+
+def _split_groups(text):
+    """
+    splits 'prot(monitor)vcp(10 60(0F 11))' into
+    [('prot', 'monitor'), ('vcp', '10 60(0F 11)')]
+    """
+    groups = []
+    depth = 0
+    name_start = 0
+    value_start = None
+    name = ""
+    for i, char in enumerate(text):
+        if char == "(":
+            if depth == 0:
+                name = text[name_start:i].strip()
+                value_start = i + 1
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0 and value_start is not None:
+                groups.append((name, text[value_start:i]))
+                name_start = i + 1
+                value_start = None
+            elif depth < 0:
+                break
+    return groups
+
+
+def _parse_vcp(text):
+    """return {feature: [allowed values]} from the vcp() group"""
+    features = {}
+    tokens = text.replace("(", " ( ").replace(")", " ) ").split()
+    feature = None
+    values = None
+    for token in tokens:
+        if token == "(":
+            values = []
+        elif token == ")":
+            if feature is not None:
+                features[feature] = values
+            values = None
+        elif values is not None:
+            try:
+                values.append(int(token, 16))
+            except ValueError:
+                pass
+        else:
+            try:
+                feature = int(token, 16)
+            except ValueError:
+                feature = None
+                continue
+            features[feature] = []
+    return features
+
+
+def parse_capabilities(capabilities):
+    """
+    parses a raw MCCS capabilities string
+    return {"model": str, "mccs": str, "vcp": {feature: [allowed values]}}
+    """
+    text = capabilities.strip()
+    if text.startswith("(") and text.endswith(")"):
+        text = text[1:-1]
+    parsed = {"model": "", "mccs": "", "vcp": {}}
+    for name, value in _split_groups(text):
+        name = name.lower()
+        if name == "model":
+            parsed["model"] = value.strip()
+        elif name == "mccs_ver":
+            parsed["mccs"] = value.strip()
+        elif name == "vcp":
+            parsed["vcp"] = _parse_vcp(value)
+    return parsed
+
+
+class CapabilitiesCache:
+    """
+    {display key: raw capabilities string}, persisted as json
+    display keys are the EDID hashes used by display_cache
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.entries = json_cache.load(self.path)
+        if not isinstance(self.entries, dict):
+            self.entries = {}
+
+    def get(self, key, query):
+        """
+        return the parsed capabilities of a display, calling query() for
+        the raw string only when the display is not cached yet
+        """
+        with self.lock:
+            raw = self.entries.get(key)
+        if raw is None:
+            raw = query()
+            with self.lock:
+                self.entries[key] = raw
+                self.dirty = True
+        return parse_capabilities(raw)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            json_cache.save(self.path, self.entries)
+            self.dirty = False
@@ -19,6 +19,9 @@
 import subprocess, os
 import shlex
 import re
+import time
+
+from brightness_controller_linux.util import edid
 
 debug = False
 try:
@@ -27,6 +30,17 @@ except:
     import log  #used in testing
     debug = True
 
+# {'connection': 'edid hex'} of the displays found by the last extraction
+display_edids = {}
+# {'connection': Edid} of the same displays, for their identity
+display_identities = {}
+
+# where the kernel lists DRM connectors
+sysfs_root = "/sys/class/drm"
+# how displays are enumerated: "sysfs", "xrandr" or "auto", which reads
+# sysfs on Wayland and runs xrandr on X11 so connector names match RandR's
+enumeration = "auto"
+
 def query_xrandr():
     query = "xrandr --query"
     xrandr_output = subprocess.Popen(shlex.split(query), stdout=subprocess.PIPE,
@@ -45,52 +59,221 @@ def extract_displays(output):
 
 
 def extract_edid_name(edid_hex):
+    """return the monitor name descriptor of an EDID, None when it has none"""
     try:
-        display_name = edid_hex[edid_hex.find('fc00') + 4:]
-        display_name = display_name[:display_name.find('0a')]
+        return edid.decode_hex(edid_hex).name or None
+    except edid.EdidError as e:
+        log.info(f"Error decoding EDID: {e}")
+        return None
+
+
+class Monitor:
+    """
+    One output of `xrandr --verbose`
+    geometry - (width, height, x, y) of an active output, else None
+    crtc - number of the CRTC driving the output, else None
+    edid - raw EDID bytes, b"" when xrandr printed none
+    bus - number N of the /dev/i2c-N the connector's DDC lines are on, when
+    read from sysfs and the driver links it, else None
+    """
+    __slots__ = ("connector", "connected", "enabled", "primary", "geometry",
+                 "crtc", "edid", "bus")
+
+    def __init__(self, connector, connected=False, enabled=False, primary=False,
+                 geometry=None, crtc=None, edid=b"", bus=None):
+        self.connector = connector
+        self.connected = connected
+        self.enabled = enabled
+        self.primary = primary
+        self.geometry = geometry
+        self.crtc = crtc
+        self.edid = edid
+        self.bus = bus
 
-        return bytes.fromhex(display_name).decode()
+    def __repr__(self):
+        return (f"Monitor({self.connector!r}, connected={self.connected}, "
+                f"enabled={self.enabled}, primary={self.primary}, geometry={self.geometry}, "
+                f"crtc={self.crtc}, edid={len(self.edid)} bytes)")
 
-    except Exception as e:
-        print("Error:", e)
+
+_GEOMETRY = re.compile(r"(\d+)x(\d+)\+(-?\d+)\+(-?\d+)$")
+
+
+def _parse_output_header(line):
+    """return a Monitor from a line such as
+    'HDMI-1 connected primary 1920x1080+0+0 (0x48) normal (...) 527mm x 296mm'
+    """
+    parts = line.split(None, 4)
+    monitor = Monitor(parts[0], connected=len(parts) > 1 and parts[1] == "connected")
+    for part in parts[2:4]:
+        if part == "primary":
+            monitor.primary = True
+            continue
+        geometry = _GEOMETRY.match(part)
+        if geometry:
+            monitor.geometry = tuple(map(int, geometry.groups()))
+            monitor.enabled = True
+        break
+    return monitor
+
+
+def parse_xrandr_verbose(lines):
+    """
+    parses `xrandr --verbose` output in a single pass, yielding one Monitor
+    per output as soon as its block ends
+    lines - any iterable of lines, such as the stdout of the xrandr process
+    Only the EDID and CRTC properties are read, modes and every other
+    property are skipped on their first character.
+    """
+    monitor = None
+    edid = None
+    for line in lines:
+        if not line or line == "\n":
+            continue
+        first = line[0]
+        if first == "\t":
+            if line[1] == "\t":
+                if edid is not None:
+                    edid.append(line.strip())
+                continue
+            if edid is not None:
+                monitor.edid = bytes.fromhex("".join(edid))
+                edid = None
+            if monitor is None:
+                continue
+            if line.startswith("\tEDID:"):
+                edid = []
+            elif line.startswith("\tCRTC:"):
+                value = line[6:].strip()
+                monitor.crtc = int(value) if value.isdigit() else None
+            continue
+        if first == " ":
+            # a mode or one of its timing lines
+            continue
+        if edid is not None:
+            monitor.edid = bytes.fromhex("".join(edid))
+            edid = None
+        if monitor is not None:
+            yield monitor
+        monitor = None if line.startswith("Screen ") else _parse_output_header(line)
+    if edid is not None:
+        monitor.edid = bytes.fromhex("".join(edid))
+    if monitor is not None:
+        yield monitor
+
+
+def read_xrandr_verbose(command="xrandr"):
+    """
+    yields a Monitor per output while `xrandr --verbose` is still printing
+    the rest, the process is killed if the caller stops early
+    """
+    process = subprocess.Popen([command, "--verbose"], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    try:
+        yield from parse_xrandr_verbose(process.stdout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+_SYSFS_CONNECTOR = re.compile(r"card\d+-(.+)")
+
+
+def _read_sysfs(path, mode="r"):
+    try:
+        with open(path, mode) as file:
+            return file.read()
+    except OSError:
         return None
 
-def x11_Monitor_Name_Extractor(xrandr_monitors : list):
 
-    displays = []
+def _ddc_bus(path):
+    """return N of the i2c-N a connector's ddc link points to, else None"""
+    try:
+        target = os.path.basename(os.readlink(os.path.join(path, "ddc")))
+    except OSError:
+        return None
+    suffix = target.rsplit("-", 1)[-1]
+    return int(suffix) if target.startswith("i2c-") and suffix.isdigit() else None
 
-    for monitor in xrandr_monitors:
-        monitorInfo = []
-        gettingEDID = False
-        currentEdid = ""
-        for line in monitor:
 
-            if "connected" in line:
-                monitorInfo.append(line[:line.find(' ')])
+def read_sysfs_monitors(root=None):
+    """
+    yields a Monitor per DRM connector from its status, enabled and edid
+    files and ddc link, no process is run and no output is probed
+    root - the directory holding the card*-* connectors, sysfs_root if None
+    Connector names are the kernel's, e.g. HDMI-A-1 where the X modesetting
+    driver says HDMI-1. Geometry and CRTC are not known here.
+    """
+    root = root or sysfs_root
+    try:
+        entries = sorted(os.listdir(root))
+    except OSError as e:
+        log.info(f"[sysfs] can not list {root}: {e}")
+        return
+    for entry in entries:
+        match = _SYSFS_CONNECTOR.fullmatch(entry)
+        if not match:
+            continue
+        path = os.path.join(root, entry)
+        status = _read_sysfs(os.path.join(path, "status"))
+        if status is None:
+            continue
+        yield Monitor(match.group(1), connected=status.strip() == "connected",
+                      enabled=(_read_sysfs(os.path.join(path, "enabled")) or "").strip() == "enabled",
+                      edid=_read_sysfs(os.path.join(path, "edid"), "rb") or b"",
+                      bus=_ddc_bus(path))
+
+
+def randr_connector(connector):
+    """return the name the X modesetting driver gives a DRM connector"""
+    if connector.startswith("HDMI-A-"):
+        return "HDMI-" + connector[len("HDMI-A-"):]
+    return connector
+
+
+def _connected(monitors):
+    return [monitor for monitor in monitors
+            if monitor.connected and not monitor.connector.startswith("Unknown")]
+
+
+def _timed(monitors):
+    """return (connected monitors, seconds it took to enumerate them)"""
+    start = time.perf_counter()
+    connected = _connected(monitors)
+    return connected, time.perf_counter() - start
+
+
+def x11_Monitor_Name_Extractor(monitors):
+    """
+    monitors - connected Monitor records
+    return [['connection', 'display name']]
+    """
+    displays = []
 
-            if gettingEDID and line.startswith("\t\t"):
-                currentEdid += line[2:]
-            elif gettingEDID:
-                break
+    for monitor in monitors:
+        monitorName = None
+        if monitor.edid:
+            display_edids[monitor.connector] = monitor.edid.hex()
+            try:
+                decoded = edid.decode(monitor.edid)
+            except edid.EdidError as e:
+                log.info(f"Error decoding EDID of {monitor.connector}: {e}")
             else:
-                gettingEDID = False
+                display_identities[monitor.connector] = decoded
+                monitorName = decoded.name
 
-            if line == "\tEDID: ":
-                gettingEDID = True
-
-        
-        monitorName = extract_edid_name(currentEdid)
         if monitorName:
-            monitorInfo.append(monitorName)
-            log.info(f"{monitor[0]} name is {monitorName}")
+            displays.append([monitor.connector, monitorName])
+            log.info(f"{monitor.connector} name is {monitorName}")
         else:
-            print(f"Failed to get display name from monitor {monitor[0]}")
-            log.info(f"Failed to get display name from monitor {monitor[0]}")
-            monitorInfo.append(monitorInfo[0])
+            print(f"Failed to get display name from monitor {monitor.connector}")
+            log.info(f"Failed to get display name from monitor {monitor.connector}")
+            displays.append([monitor.connector, monitor.connector])
 
-        displays.append(monitorInfo)
-
-    log.info(f"[x11] Monitor names extracted: [{displays}]")
+    log.info("[x11] Monitor names extracted: [%s]", displays)
 
     return displays
 
@@ -149,88 +332,271 @@ def wayland_Monitor_Name_Extractor():
     return displays
 
 
-def extract_display_names(testInfo = None):
-    xrandr_output = subprocess.check_output(["xrandr", "--verbose"]).decode().splitlines()
+def extract_display_names(testInfo = None, backend = None):
+    """
+    return [['connection', 'display name']] of the connected displays
+    testInfo - `xrandr --verbose` lines to parse instead of running xrandr
+    backend - "sysfs", "xrandr" or "auto", enumeration if None
+    """
+    display_edids.clear()
+    display_identities.clear()
+
+    if testInfo is not None:
+        return x11_Monitor_Name_Extractor(_connected(parse_xrandr_verbose(testInfo)))
+
+    backend = backend or enumeration
+    wayland = os.getenv("XDG_SESSION_TYPE") == "wayland"
+    if backend == "sysfs" or (backend == "auto" and wayland):
+        monitors, elapsed = _timed(read_sysfs_monitors())
+        log.info(f"[sysfs] {len(monitors)} displays enumerated in {elapsed * 1000:.2f} ms")
+        if monitors:
+            if not wayland:
+                for monitor in monitors:
+                    monitor.connector = randr_connector(monitor.connector)
+            return x11_Monitor_Name_Extractor(monitors)
+        log.warning(f"[sysfs] no connected displays under {sysfs_root}")
+
+    if wayland:
+        waylandDisplayNames = wayland_Monitor_Name_Extractor()
+        if waylandDisplayNames != None:
+            # we got display names from wayland!
+            return waylandDisplayNames
+        # fall back to old nameing
+        log.warning("Fell back to x11 monitor name extraction!")
+        print("ERROR Falling back to x11 monitor name extractor! Names may not be extracted!")
 
-    displayVerboseInfo = []
-    display = []
+    monitors, elapsed = _timed(read_xrandr_verbose())
+    sysfsMonitors, sysfsElapsed = _timed(read_sysfs_monitors())
+    log.info(f"[xrandr] {len(monitors)} displays enumerated in {elapsed * 1000:.2f} ms, "
+             f"sysfs found {len(sysfsMonitors)} in {sysfsElapsed * 1000:.2f} ms")
 
-    #get verbose data for displays
-    i = -1
-    for line in xrandr_output:
-        i += 1
+    log.info("Display info : %d displays.", len(monitors))
+    log.debug(monitors)
 
-        if line.startswith("Screen"): continue
+    return x11_Monitor_Name_Extractor(monitors)
 
-        if i == len(xrandr_output) - 1:
-            display.append(line)
-            if "disconnected" not in display[0]: 
-                if not display[0].startswith("Unknown"):
-                        displayVerboseInfo.append(display)
 
-        if not line.startswith("\t") and "connected" in line:
-            if len(display) > 0: 
-                if "disconnected" not in display[0]: 
-                    if not display[0].startswith("Unknown"):
-                        displayVerboseInfo.append(display)
+def update_display_names(displays, added, removed, rename=randr_connector, root=None):
+    """
+    return displays with only the connectors a hotplug changed read again,
+    from sysfs, or None when a display that stayed is not found there and
+    everything has to be enumerated again
+    displays - [['connection', 'display name', bus]] before the hotplug
+    added, removed - kernel connector names, as HotplugWatcher reports them
+    rename - turns a kernel connector name into the one displays use
+    Added displays are appended with the bus their connector links to, or
+    None when the driver links none.
+    """
+    monitors = {}
+    for monitor in read_sysfs_monitors(root):
+        if monitor.connected:
+            monitor.connector = rename(monitor.connector)
+            monitors[monitor.connector] = monitor
+    changed = {rename(connector) for connector in list(added) + list(removed)}
+    kept = [display for display in displays if display[0] not in changed]
+    if any(display[0] not in monitors for display in kept):
+        log.info("[hotplug] connector names differ from sysfs, enumerating all displays")
+        return None
+    for connector in changed:
+        display_edids.pop(connector, None)
+        display_identities.pop(connector, None)
+    new = [monitors[rename(connector)] for connector in added
+           if rename(connector) in monitors]
+    names = x11_Monitor_Name_Extractor(new)
+    return [display[:2] + [display[2] if len(display) > 2 else None] for display in kept] + \
+        [name + [monitor.bus] for name, monitor in zip(names, new)]
 
-            display = []
-            display.append(line)
-        else:
-            display.append(line)
 
-    log.info(f"Display info : {len(displayVerboseInfo)} displays.")
-    log.info(displayVerboseInfo)
-    log.info("")
+_EDID_DUMP_LINE = re.compile(r"\+0[0-9a-f]{3}\s+((?:[0-9a-f]{2} ){15}[0-9a-f]{2})")
 
-    if os.getenv("XDG_SESSION_TYPE") == "wayland":
-        waylandDisplayNames = wayland_Monitor_Name_Extractor()
-        if waylandDisplayNames == None:
-            # fall back to old nameing
-            log.warning("Fell back to x11 monitor name extraction!")
-            print("ERROR Falling back to x11 monitor name extractor! Names may not be extracted!")
-            return x11_Monitor_Name_Extractor(displayVerboseInfo)
 
-        # we got display names from wayland!
-        return waylandDisplayNames
+def _leading_int(value):
+    value = value.split()[0] if value.split() else ""
+    return int(value) if value.isdigit() else None
 
-    else:
-        return x11_Monitor_Name_Extractor(displayVerboseInfo)
-            
-            
-def match_ddc_order(monitorNames):
-    
-    detectedMonitors = subprocess.check_output(["ddcutil", "detect"]).decode().splitlines()
-
-    log.info("ddcutil detect output:")
-    log.info(detectedMonitors)
-            
-    reorderedMonitors = []
 
-    #laptopMonitorNames = [['eDP-1', 'eDP-1'], ['HDMI-1', 'VG279']]
+def parse_ddc_detect(detectedMonitors):
+    """
+    splits `ddcutil detect` output into one dict per display, in the order
+    ddcutil lists them
+    return [{"valid", "bus", "model", "mfg", "serial", "product",
+             "binary_serial", "edid"}]
+    bus is the number N of /dev/i2c-N or None, product and binary_serial
+    are None and edid is b"" unless ddcutil printed them (--verbose)
+    """
+    blocks = []
+    block = None
+    edid = []
+    for line in detectedMonitors:
+        if line and not line[0].isspace():
+            block = {"valid": line.startswith("Display"), "bus": None,
+                     "model": "", "mfg": "", "serial": "", "product": None,
+                     "binary_serial": None, "edid": b""}
+            blocks.append(block)
+            edid = []
+            continue
+        if block is None:
+            continue
+        dump = _EDID_DUMP_LINE.search(line)
+        if dump:
+            edid.append(dump.group(1))
+            if len(edid) == 8:
+                block["edid"] = bytes.fromhex("".join(edid))
+            continue
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key = key.strip()
+        value = value.strip()
+        if key == "I2C bus" and value.rsplit("-", 1)[-1].isdigit():
+            block["bus"] = int(value.rsplit("-", 1)[-1])
+        elif key == "Model":
+            block["model"] = value
+        elif key == "Mfg id":
+            # newer ddcutil appends the vendor's name, "DEL - Dell Inc."
+            block["mfg"] = value.split(" ", 1)[0]
+        elif key == "Serial number":
+            block["serial"] = value
+        elif key == "Product code":
+            block["product"] = _leading_int(value)
+        elif key == "Binary serial number":
+            block["binary_serial"] = _leading_int(value)
+    return blocks
+
+
+def _edid_keys(decoded):
+    """return the identity keys of a decoded EDID, most exact first"""
+    return [("edid", decoded.base_digest),
+            ("identity", decoded.identity),
+            ("product", decoded.manufacturer, decoded.product, decoded.serial),
+            ("name", decoded.manufacturer, decoded.name, decoded.serial_text)]
+
+
+def _ddc_keys(ddcDisplay):
+    """return the identity keys ddcutil printed for a display, most exact first"""
+    keys = []
+    if ddcDisplay["edid"]:
+        keys.append(("edid", edid.digest(ddcDisplay["edid"][:edid.BLOCK_SIZE])))
+    if ddcDisplay["product"] is not None and (ddcDisplay["serial"] or ddcDisplay["binary_serial"]):
+        keys.append(("identity", edid.identity(ddcDisplay["mfg"], ddcDisplay["product"],
+                                               ddcDisplay["serial"] or ddcDisplay["binary_serial"])))
+    if ddcDisplay["product"] is not None and ddcDisplay["binary_serial"] is not None:
+        keys.append(("product", ddcDisplay["mfg"], ddcDisplay["product"],
+                     ddcDisplay["binary_serial"]))
+    if ddcDisplay["mfg"]:
+        keys.append(("name", ddcDisplay["mfg"], ddcDisplay["model"], ddcDisplay["serial"]))
+    return keys
+
+
+def match_ddc_order(monitorNames, detectedMonitors=None, identities=None):
+    """
+    reorders monitorNames the way ddcutil lists them and appends the I2C bus
+    number of every monitor, so DDC requests can address the bus directly
+    Monitors are matched by EDID identity through a dict, so two monitors
+    of the same model end up on their own buses; the model name is only
+    compared for monitors whose EDID is unknown.
+    identities - {connection: Edid}, display_identities if None
+    return [['connection', 'display name', bus]]
+    """
+    if detectedMonitors is None:
+        detectedMonitors = subprocess.check_output(["ddcutil", "detect", "--verbose"]).decode().splitlines()
+    if identities is None:
+        identities = display_identities
+
+    log.debug("ddcutil detect output:")
+    log.debug(detectedMonitors)
 
-    #laptopTestCase = ['Display 1', '   I2C bus:             /dev/i2c-1', '   EDID synopsis:', '      Mfg id:           AUS', '      Model:            VG279', '      Serial number:    Redacted', '      Manufacture year: 2020', '      EDID version:     1.3', '   VCP version:         2.2', '', 'Invalid display', '   I2C bus:             /dev/i2c-4', '   EDID synopsis:', '      Mfg id:           BOE', '      Model:            ', '      Serial number:    ', '      Manufacture year: 2015', '      EDID version:     1.4', '   DDC communication failed', '   This is an eDP laptop display. Laptop displays do not support DDC/CI.', '']
+    return _match_buses(monitorNames, parse_ddc_detect(detectedMonitors), identities)
 
-    for line in detectedMonitors:
-        if "Model" in line:
-            for monitor in monitorNames:
-                modelName = line.split(":")[1].strip()
-                log.info(f"[ddcReorder] Model name output {modelName}")
-                if modelName == '':
-                    if monitor[1].startswith('eDP'):
-                        reorderedMonitors.append(monitor)
-                        log.info(f"[ddcReorder] added {monitor} from {modelName}")
-                        break
-
-                if monitor[1] in modelName:
-                    reorderedMonitors.append(monitor)
-                    log.info(f"[ddcReorder] added {monitor} from {modelName}")
-                    break
+
+def native_detect_blocks(edids):
+    """
+    return the displays I2CTransport.detect() found in the form
+    parse_ddc_detect returns them, in bus order
+    edids - {bus: EDID base block}
+    """
+    blocks = []
+    for bus in sorted(edids):
+        block = {"valid": True, "bus": bus, "model": "", "mfg": "", "serial": "",
+                 "product": None, "binary_serial": None, "edid": edids[bus]}
+        try:
+            decoded = edid.decode(edids[bus])
+        except edid.EdidError as e:
+            log.warning(f"[ddcReorder] unreadable EDID on bus {bus}: {e}")
+        else:
+            block.update(model=decoded.name, mfg=decoded.manufacturer,
+                         serial=decoded.serial_text, product=decoded.product,
+                         binary_serial=decoded.serial)
+        blocks.append(block)
+    return blocks
+
+
+def match_native_order(monitorNames, edids, identities=None):
+    """
+    match_ddc_order for the native DDC backend, which reads the EDID of
+    every display over I2C itself instead of asking ddcutil
+    edids - {bus: EDID base block}, as I2CTransport.detect() keeps them
+    """
+    if identities is None:
+        identities = display_identities
+    return _match_buses(monitorNames, native_detect_blocks(edids), identities)
+
+
+def _match_buses(monitorNames, detected, identities):
+    """match_ddc_order once the detected displays are parsed"""
+    # {identity key: [monitor index]} in monitorNames order
+    byIdentity = {}
+    for i, monitor in enumerate(monitorNames):
+        decoded = identities.get(monitor[0])
+        if decoded is not None:
+            for key in _edid_keys(decoded):
+                byIdentity.setdefault(key, []).append(i)
+    used = set()
+
+    def take(candidates):
+        for i in candidates or ():
+            if i not in used:
+                used.add(i)
+                return i
+        return None
+
+    matches = []
+    for ddcDisplay in detected:
+        match = None
+        for key in _ddc_keys(ddcDisplay):
+            match = take(byIdentity.get(key))
+            if match is not None:
+                break
+        matches.append(match)
+
+    # fall back to model names for what the identities did not match
+    for n, ddcDisplay in enumerate(detected):
+        if matches[n] is not None:
+            continue
+        modelName = ddcDisplay["model"]
+        if modelName == '':
+            matches[n] = take(i for i, monitor in enumerate(monitorNames)
+                              if monitor[1].startswith('eDP'))
+        else:
+            matches[n] = take(i for i, monitor in enumerate(monitorNames)
+                              if monitor[1] in modelName)
+
+    reorderedMonitors = []
+    for ddcDisplay, match in zip(detected, matches):
+        if match is None:
+            continue
+        monitor = monitorNames[match]
+        reorderedMonitors.append(monitor[:2] + [ddcDisplay["bus"]])
+        log.info("[ddcReorder] added %s from %s on bus %s", monitor, ddcDisplay['model'], ddcDisplay['bus'])
 
     if len(monitorNames) != len(reorderedMonitors):
         print(f"ERROR IN MONITOR REORDERING please create an issue on the github with your log file at ~/.config/brightness_controller/log.txt")
         log.error(f"Failed attempting to reorder monitors, input: {monitorNames}  attempted output: {reorderedMonitors}")
-        return monitorNames # fall back to unreordered output
+        # fall back to unreordered output, giving out the buses of valid
+        # displays in order just like addressing them by display number did
+        validBuses = [ddcDisplay["bus"] for ddcDisplay in detected if ddcDisplay["valid"]]
+        return [monitor[:2] + [validBuses[i] if i < len(validBuses) else None]
+                for i, monitor in enumerate(monitorNames)]
     return reorderedMonitors
 
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Colour temperature to RGB conversion.
+The blackbody colour of every TABLE_STEP kelvin is computed once, any
+temperature in between is interpolated from its two neighbours.
+"""
+
+import math
+import re
+
+MIN_KELVIN = 1000
+MAX_KELVIN = 40000
+TABLE_STEP = 100
+# the temperature the blackbody approximation renders as pure white
+NEUTRAL_KELVIN = 6600
+
+# the preset names of the temperature combo box
+PRESETS = {
+    "Default": NEUTRAL_KELVIN,
+    "1900K Candle": 1900,
+    "2600K 40W Tungsten": 2600,
+    "2850K 100W Tungsten": 2850,
+    "3200K Halogen": 3200,
+    "5200K Carbon Arc": 5200,
+    "5400K High Noon": 5400,
+    "6000K Direct Sun": 6000,
+    "7000K Overcast Sky": 7000,
+    "20000K Clear Blue Sky": 20000,
+}
+
+
+def _clamp(value):
+    return max(0.0, min(255.0, value))
+
+
+def blackbody(kelvin):
+    """
+    return the (red, green, blue) colour, 0 - 255, of a blackbody at kelvin
+    Uses Tanner Helland's curve fit of the CIE 1964 colour matching data.
+    """
+    t = kelvin / 100
+    if t <= 66:
+        red = 255.0
+        green = 99.4708025861 * math.log(t) - 161.1195681661
+    else:
+        red = 329.698727446 * (t - 60) ** -0.1332047592
+        green = 288.1221695283 * (t - 60) ** -0.0755148492
+    if t >= 66:
+        blue = 255.0
+    elif t <= 19:
+        blue = 0.0
+    else:
+        blue = 138.5177312231 * math.log(t - 10) - 305.0447927307
+    return (_clamp(red), _clamp(green), _clamp(blue))
+
+
+TABLE = tuple(blackbody(kelvin)
+              for kelvin in range(MIN_KELVIN, MAX_KELVIN + 1, TABLE_STEP))
+
+
+def rgb(kelvin):
+    """return the (red, green, blue) colour, 0 - 255, of any temperature"""
+    position = (min(max(kelvin, MIN_KELVIN), MAX_KELVIN) - MIN_KELVIN) / TABLE_STEP
+    index = min(int(position), len(TABLE) - 2)
+    fraction = position - index
+    low = TABLE[index]
+    high = TABLE[index + 1]
+    return (low[0] + (high[0] - low[0]) * fraction,
+            low[1] + (high[1] - low[1]) * fraction,
+            low[2] + (high[2] - low[2]) * fraction)
+
+
+def gains(kelvin):
+    """return the (red, green, blue) gains, 0 - 1, of a temperature"""
+    red, green, blue = rgb(kelvin)
+    return (red / 255, green / 255, blue / 255)
+
+
+def parse(text):
+    """
+    return the temperature a preset name or a typed value such as
+    '4500', '4500K' or '4500 k' stands for, None when it is neither
+    """
+    if text in PRESETS:
+        return PRESETS[text]
+    match = re.fullmatch(r"\s*(\d+)\s*[kK]?\s*", text)
+    if not match:
+        return None
+    kelvin = int(match.group(1))
+    if not MIN_KELVIN <= kelvin <= MAX_KELVIN:
+        return None
+    return kelvin
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+DDC/CI spoken directly over /dev/i2c-N, without the ddcutil binary.
+Packets follow the VESA DDC/CI 1.1 Get/Set VCP Feature layout.
+"""
+
+import fcntl
+import glob
+import os
+import threading
+import time
+
+import brightness_controller_linux.util.log as log
+from brightness_controller_linux.util import check_displays
+from brightness_controller_linux.util.ddc_worker import DDCError, BRIGHTNESS
+
+I2C_SLAVE = 0x0703
+
+DDC_ADDRESS = 0x37
+EDID_ADDRESS = 0x50
+HOST_ADDRESS = 0x51
+# checksums are taken over the 8 bit write address of the display, and
+# replies over the 8 bit address of the host
+DISPLAY_WRITE_ADDRESS = DDC_ADDRESS << 1
+REPLY_CHECKSUM_SEED = 0x50
+
+GET_VCP_REQUEST = 0x01
+GET_VCP_REPLY = 0x02
+SET_VCP_REQUEST = 0x03
+CAPABILITIES_REQUEST = 0xF3
+CAPABILITIES_REPLY = 0xE3
+
+# delays the DDC/CI standard asks the host to respect, in seconds
+GET_VCP_DELAY = 0.04
+SET_VCP_DELAY = 0.05
+CAPABILITIES_DELAY = 0.05
+GET_VCP_REPLY_LENGTH = 11
+# a capabilities fragment carries at most 32 bytes of the string
+CAPABILITIES_REPLY_LENGTH = 38
+# longer than any real capabilities string, a display that keeps sending
+# fragments past it is broken and would hold its bus forever
+MAX_CAPABILITIES_LENGTH = 2048
+
+SYSFS_I2C = "/sys/bus/i2c/devices"
+# adapters that never carry a display's DDC lines, ddcutil skips them too;
+# a write to an SMBus device may reconfigure the hardware behind it
+IGNORED_ADAPTERS = ("SMBus", "soc:i2cdsi", "smu", "mac-io", "u4", "AMDGPU SMU")
+
+
+def checksum(data, seed=0):
+    for byte in data:
+        seed ^= byte
+    return seed
+
+
+def encode_getvcp(feature):
+    """return the bytes written to the display to read a feature"""
+    packet = bytes([HOST_ADDRESS, 0x80 | 2, GET_VCP_REQUEST, feature])
+    return packet + bytes([checksum(packet, DISPLAY_WRITE_ADDRESS)])
+
+
+def encode_setvcp(feature, value):
+    """return the bytes written to the display to set a feature"""
+    packet = bytes([HOST_ADDRESS, 0x80 | 4, SET_VCP_REQUEST, feature,
+                    (value >> 8) & 0xFF, value & 0xFF])
+    return packet + bytes([checksum(packet, DISPLAY_WRITE_ADDRESS)])
+
+
+def encode_capabilities(offset):
+    """return the bytes written to the display to read a capabilities fragment"""
+    packet = bytes([HOST_ADDRESS, 0x80 | 3, CAPABILITIES_REQUEST,
+                    (offset >> 8) & 0xFF, offset & 0xFF])
+    return packet + bytes([checksum(packet, DISPLAY_WRITE_ADDRESS)])
+
+
+def _reply_payload(reply):
+    """return the payload of a DDC/CI reply after checking its framing"""
+    if len(reply) < 3:
+        raise DDCError(f"short DDC reply {reply.hex()}")
+    length = reply[1] & 0x7F
+    if length == 0:
+        raise DDCError("display answered with a null message")
+    if len(reply) < length + 3:
+        raise DDCError(f"truncated DDC reply {reply.hex()}")
+    if reply[length + 2] != checksum(reply[:length + 2], REPLY_CHECKSUM_SEED):
+        raise DDCError(f"bad DDC reply checksum {reply.hex()}")
+    return reply[2:length + 2]
+
+
+def decode_capabilities(reply, offset):
+    """return the string fragment carried by a capabilities reply"""
+    payload = _reply_payload(reply)
+    if len(payload) < 3 or payload[0] != CAPABILITIES_REPLY:
+        raise DDCError(f"unexpected DDC reply {reply.hex()}")
+    if payload[1] << 8 | payload[2] != offset:
+        raise DDCError(f"capabilities fragment for offset "
+                       f"{payload[1] << 8 | payload[2]}, expected {offset}")
+    return payload[3:]
+
+
+def decode_getvcp(reply, feature):
+    """
+    decodes a Get VCP Feature reply
+    return (current value, max value)
+    """
+    payload = _reply_payload(reply)
+    if len(payload) != 8 or payload[0] != GET_VCP_REPLY:
+        raise DDCError(f"unexpected DDC reply {reply.hex()}")
+    if payload[1] != 0:
+        raise DDCError(f"feature 0x{feature:02x} is not supported")
+    if payload[2] != feature:
+        raise DDCError(f"reply for feature 0x{payload[2]:02x}, "
+                       f"expected 0x{feature:02x}")
+    maximum = payload[4] << 8 | payload[5]
+    current = payload[6] << 8 | payload[7]
+    return current, maximum
+
+
+class I2CBus:
+    """an open /dev/i2c-N character device"""
+
+    def __init__(self, number):
+        self.number = number
+        self.fd = os.open(f"/dev/i2c-{number}", os.O_RDWR)
+        self.slave = None
+
+    def _address(self, address):
+        if self.slave != address:
+            fcntl.ioctl(self.fd, I2C_SLAVE, address)
+            self.slave = address
+
+    def write(self, address, data):
+        self._address(address)
+        os.write(self.fd, data)
+
+    def read(self, address, length):
+        self._address(address)
+        return os.read(self.fd, length)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def list_buses(pattern="/dev/i2c-*"):
+    """return the numbers of every i2c character device, ascending"""
+    numbers = []
+    for device in glob.glob(pattern):
+        suffix = device.rsplit("-", 1)[-1]
+        if suffix.isdigit():
+            numbers.append(int(suffix))
+    return sorted(numbers)
+
+
+def adapter_name(number, root=SYSFS_I2C):
+    """return the name of the i2c-N adapter, None when it can not be read"""
+    try:
+        with open(os.path.join(root, f"i2c-{number}", "name")) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def display_buses(drm_root=None, i2c_root=SYSFS_I2C):
+    """
+    return the buses a display may answer on, found without writing to any:
+    those DRM connectors link as their DDC lines or, when the driver links
+    none, every adapter whose name is known and not one of IGNORED_ADAPTERS
+    """
+    linked = sorted({monitor.bus for monitor in check_displays.read_sysfs_monitors(drm_root)
+                     if monitor.bus is not None})
+    if linked:
+        return linked
+    buses = []
+    for number in list_buses():
+        name = adapter_name(number, i2c_root)
+        if name is None or name.startswith(IGNORED_ADAPTERS):
+            log.debug("[ddc-i2c] skipping /dev/i2c-%d (%s)", number, name)
+            continue
+        buses.append(number)
+    return buses
+
+
+def accessible_buses():
+    """return the numbers of the display buses this user may open"""
+    return [number for number in display_buses()
+            if os.access(f"/dev/i2c-{number}", os.R_OK | os.W_OK)]
+
+
+class I2CTransport:
+    """
+    executes DDC requests over /dev/i2c-N
+    Displays are addressed by I2C bus number. Bus handles stay open for the
+    lifetime of the transport.
+    open_bus and sleep can be replaced to run against a fake bus.
+    """
+
+    def __init__(self, open_bus=I2CBus, buses=None, sleep=time.sleep,
+                 sleep_multiplier=1.0, retries=3):
+        self.open_bus = open_bus
+        self.bus_numbers = buses
+        self.sleep = sleep
+        self.sleep_multiplier = sleep_multiplier
+        self.retries = retries
+        self.handles = {}
+        self.locks = {}
+        self.ready_at = {}
+        self.timings = {}
+        # {bus: the EDID base block read by detect()}
+        self.edids = {}
+        self.lock = threading.Lock()
+
+    def _bus(self, number):
+        with self.lock:
+            if number not in self.handles:
+                self.handles[number] = self.open_bus(number)
+                self.locks[number] = threading.Lock()
+                self.ready_at[number] = 0.0
+            return self.handles[number], self.locks[number]
+
+    def set_timing(self, bus, sleep_multiplier, retries):
+        """scales the standard's delays and sets the retry count for a bus"""
+        self.timings[bus] = (sleep_multiplier, retries)
+
+    def _timing(self, bus):
+        return self.timings.get(bus, (self.sleep_multiplier, self.retries))
+
+    def _wait_until_ready(self, number):
+        delay = self.ready_at[number] - time.monotonic()
+        if delay > 0:
+            self.sleep(delay)
+
+    def _hold_off(self, number, delay):
+        self.ready_at[number] = time.monotonic() + \
+            delay * self._timing(number)[0]
+
+    def detect(self):
+        """
+        return the bus numbers of displays that answer DDC, in bus order
+        This mirrors how ddcutil lists its displays. The EDIDs they sent
+        are kept in edids, to tell which connector every bus belongs to.
+        """
+        detected = []
+        edids = {}
+        candidates = self.bus_numbers if self.bus_numbers is not None \
+            else display_buses()
+        for number in candidates:
+            try:
+                bus, lock = self._bus(number)
+                with lock:
+                    bus.write(EDID_ADDRESS, bytes([0]))
+                    edid = bus.read(EDID_ADDRESS, 128)
+                    if len(edid) != 128:
+                        continue
+                self.getvcp(number, BRIGHTNESS)
+            except (OSError, DDCError) as e:
+                log.info(f"[ddc-i2c] /dev/i2c-{number} is not a DDC display: {e}")
+                continue
+            detected.append(number)
+            edids[number] = bytes(edid)
+        self.edids = edids
+        log.info(f"[ddc-i2c] detected DDC displays on buses {detected}")
+        return detected
+
+    def _transaction(self, bus, device, packet, decode, delay, length):
+        """
+        writes a request packet and returns its reply passed through decode,
+        retrying replies that fail to decode
+        """
+        sleep_multiplier, retries = self._timing(bus)
+        error = None
+        for attempt in range(retries):
+            self._wait_until_ready(bus)
+            try:
+                device.write(DDC_ADDRESS, packet)
+                self.sleep(delay * sleep_multiplier)
+                return decode(device.read(DDC_ADDRESS, length))
+            except (OSError, DDCError) as e:
+                error = e
+                self._hold_off(bus, delay)
+        raise DDCError(f"request on /dev/i2c-{bus} failed after "
+                       f"{retries} tries: {error}")
+
+    def _getvcp(self, bus, device, feature):
+        return self._transaction(
+            bus, device, encode_getvcp(feature),
+            lambda reply: decode_getvcp(reply, feature),
+            GET_VCP_DELAY, GET_VCP_REPLY_LENGTH)
+
+    def getvcp(self, bus, feature):
+        device, lock = self._bus(bus)
+        with lock:
+            return self._getvcp(bus, device, feature)
+
+    def getvcp_many(self, bus, features):
+        """
+        reads several features while holding the bus once
+        return {feature: (current value, max value) or DDCError}
+        """
+        device, lock = self._bus(bus)
+        results = {}
+        with lock:
+            for feature in features:
+                try:
+                    results[feature] = self._getvcp(bus, device, feature)
+                except DDCError as e:
+                    results[feature] = e
+        return results
+
+    def capabilities(self, bus):
+        """return the display's raw MCCS capabilities string"""
+        device, lock = self._bus(bus)
+        fragments = []
+        offset = 0
+        with lock:
+            while True:
+                fragment = self._transaction(
+                    bus, device, encode_capabilities(offset),
+                    lambda reply: decode_capabilities(reply, offset),
+                    CAPABILITIES_DELAY, CAPABILITIES_REPLY_LENGTH)
+                if not fragment:
+                    break
+                fragments.append(fragment)
+                offset += len(fragment)
+                if offset > MAX_CAPABILITIES_LENGTH:
+                    raise DDCError(f"capabilities on /dev/i2c-{bus} are longer than "
+                                   f"{MAX_CAPABILITIES_LENGTH} bytes")
+        return b"".join(fragments).rstrip(b"\x00").decode("ascii", "replace")
+
+    def setvcp(self, bus, feature, value):
+        device, lock = self._bus(bus)
+        sleep_multiplier, retries = self._timing(bus)
+        error = None
+        with lock:
+            for attempt in range(retries):
+                self._wait_until_ready(bus)
+                try:
+                    device.write(DDC_ADDRESS, encode_setvcp(feature, int(value)))
+                    self._hold_off(bus, SET_VCP_DELAY)
+                    return
+                except OSError as e:
+                    error = e
+                    self._hold_off(bus, SET_VCP_DELAY)
+        raise DDCError(f"setvcp 0x{feature:02x} on /dev/i2c-{bus} "
+                       f"failed after {retries} tries: {error}")
+
+    def close(self):
+        with self.lock:
+            for bus in self.handles.values():
+                bus.close()
+            self.handles = {}
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Per monitor DDC timing autotuner.
+The delays of the DDC/CI standard are written for the slowest monitors.
+calibrate() measures how far a monitor's delays can be scaled down before
+requests start failing, and how many tries it needs at that speed.
+"""
+
+import math
+import time
+
+from brightness_controller_linux.util import json_cache
+from brightness_controller_linux.util.ddc_worker import DDCError, BRIGHTNESS, percentile
+
+cache_path = json_cache.cache_directory + 'ddc_timing.json'
+
+BASELINE_MULTIPLIER = 1.0
+# tried from the baseline down for monitors that cope with it, and up for
+# monitors that already fail at the standard's delays
+FASTER_MULTIPLIERS = (0.7, 0.5, 0.35, 0.25, 0.15, 0.1)
+SLOWER_MULTIPLIERS = (1.5, 2.0, 3.0)
+MIN_RETRIES = 2
+MAX_RETRIES = 10
+# acceptable chance of a request failing after all of its tries
+TARGET_FAILURE = 0.001
+
+
+def measure(transport, bus, samples, feature=BRIGHTNESS):
+    """
+    runs rounds of read, write back, verifying read against a display
+    return {"p50", "p95"} round trip in seconds and the "failure_rate"
+    """
+    latencies = []
+    failures = 0
+    for i in range(samples):
+        start = time.perf_counter()
+        try:
+            current = transport.getvcp(bus, feature)[0]
+            transport.setvcp(bus, feature, current)
+            if transport.getvcp(bus, feature)[0] != current:
+                failures += 1
+        except DDCError:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    ordered = sorted(latencies)
+    return {"p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "failure_rate": failures / samples}
+
+
+def retry_budget(failure_rate):
+    """return the tries needed to push failures below TARGET_FAILURE"""
+    if failure_rate <= 0:
+        return MIN_RETRIES
+    if failure_rate >= 1:
+        return MAX_RETRIES
+    tries = math.ceil(math.log(TARGET_FAILURE) / math.log(failure_rate))
+    return max(MIN_RETRIES, min(MAX_RETRIES, tries))
+
+
+def calibrate(transport, bus, samples=10, feature=BRIGHTNESS):
+    """
+    finds the smallest sleep multiplier a display answers reliably at
+    return {"sleep_multiplier", "retries", "before", "after"} where before
+    and after are measure() reports at the baseline and tuned timing
+    """
+    # fails early for displays that do not speak DDC at all
+    transport.set_timing(bus, SLOWER_MULTIPLIERS[-1], MIN_RETRIES)
+    transport.getvcp(bus, feature)
+
+    transport.set_timing(bus, BASELINE_MULTIPLIER, 1)
+    before = measure(transport, bus, samples, feature)
+
+    chosen = BASELINE_MULTIPLIER
+    chosen_failure_rate = before["failure_rate"]
+    if before["failure_rate"] == 0:
+        for multiplier in FASTER_MULTIPLIERS:
+            transport.set_timing(bus, multiplier, 1)
+            if measure(transport, bus, samples, feature)["failure_rate"] > 0:
+                break
+            chosen = multiplier
+    else:
+        for multiplier in SLOWER_MULTIPLIERS:
+            transport.set_timing(bus, multiplier, 1)
+            failure_rate = measure(transport, bus, samples,
+                                   feature)["failure_rate"]
+            if failure_rate < chosen_failure_rate:
+                chosen = multiplier
+                chosen_failure_rate = failure_rate
+            if failure_rate == 0:
+                break
+
+    retries = retry_budget(chosen_failure_rate)
+    transport.set_timing(bus, chosen, retries)
+    after = measure(transport, bus, samples, feature)
+    return {"sleep_multiplier": chosen, "retries": retries,
+            "before": before, "after": after}
+
+
+def format_report(name, bus, result):
+    before = result["before"]
+    after = result["after"]
+    return (f"{name} (/dev/i2c-{bus}): sleep multiplier "
+            f"{result['sleep_multiplier']:g}, {result['retries']} tries\n"
+            f"  p50 {before['p50'] * 1000:.1f} ms -> {after['p50'] * 1000:.1f} ms, "
+            f"p95 {before['p95'] * 1000:.1f} ms -> {after['p95'] * 1000:.1f} ms, "
+            f"failures {before['failure_rate']:.0%} -> {after['failure_rate']:.0%}")
+
+
+class TimingCache:
+    """
+    {display key: calibrate() result}, persisted as json
+    display keys are the EDID hashes used by display_cache
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_path
+        self.entries = json_cache.load(self.path)
+        if not isinstance(self.entries, dict):
+            self.entries = {}
+
+    def put(self, key, result):
+        self.entries[key] = result
+
+    def apply(self, transport, buses):
+        """
+        hands the learned timing of every known display to the transport
+        buses - {display key: bus}
+        """
+        for key, bus in buses.items():
+            if key in self.entries and bus is not None:
+                transport.set_timing(bus, self.entries[key]["sleep_multiplier"],
+                                     self.entries[key]["retries"])
+
+    def save(self):
+        json_cache.save(self.path, self.entries)
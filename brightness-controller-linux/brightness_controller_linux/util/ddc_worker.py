@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import brightness_controller_linux.util.log as log
+
+BRIGHTNESS = 0x10
+CONTRAST = 0x12
+RED_GAIN = 0x16
+GREEN_GAIN = 0x18
+BLUE_GAIN = 0x1A
+INPUT_SOURCE = 0x60
+# read together when a display is probed, if its capabilities list them
+MONITOR_FEATURES = (BRIGHTNESS, CONTRAST, RED_GAIN, GREEN_GAIN, BLUE_GAIN,
+                    INPUT_SOURCE)
+
+
+class DDCError(Exception):
+    """raised when a display does not answer a DDC request"""
+
+
+def parse_getvcp(output):
+    """
+    parses the output of `ddcutil getvcp`
+    return (current value, max value)
+    """
+    if "Display not found" in output:
+        raise DDCError(output.strip())
+    try:
+        current = int(output.split(',')[0].split('=')[1].strip())
+        maximum = int(output.split(',')[1].split('=')[1].strip())
+    except (IndexError, ValueError):
+        raise DDCError(f"Could not parse getvcp output: {output.strip()}")
+    return current, maximum
+
+
+def parse_getvcp_brief(output):
+    """
+    parses the output of `ddcutil getvcp --brief` for any number of features
+    return {feature: (current value, max value) or DDCError}
+    non continuous features have no max value and return (value, None)
+    """
+    if "Display not found" in output:
+        raise DDCError(output.strip())
+    results = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) < 3 or fields[0] != "VCP":
+            continue
+        try:
+            feature = int(fields[1], 16)
+        except ValueError:
+            continue
+        try:
+            if fields[2] == "C":
+                results[feature] = (int(fields[3]), int(fields[4]))
+            elif fields[2] in ("SNC", "CNC", "NC"):
+                results[feature] = (int(fields[3].lstrip("x"), 16), None)
+            else:
+                results[feature] = DDCError(f"feature 0x{feature:02x}: {line.strip()}")
+        except (IndexError, ValueError):
+            results[feature] = DDCError(f"Could not parse getvcp output: {line.strip()}")
+    return results
+
+
+class DDCUtilTransport:
+    """
+    executes DDC requests through the ddcutil binary
+    displays are addressed by I2C bus number, which spares ddcutil from
+    enumerating every display to resolve a display number
+    """
+
+    def __init__(self, command="ddcutil"):
+        self.command = command
+        self.timings = {}
+
+    def set_timing(self, bus, sleep_multiplier, retries):
+        """sets the ddcutil sleep multiplier and retry count used for a bus"""
+        self.timings[bus] = (sleep_multiplier, retries)
+
+    def _run(self, args, bus=None):
+        if bus in self.timings:
+            sleep_multiplier, retries = self.timings[bus]
+            args = args + ["--sleep-multiplier", f"{sleep_multiplier:g}",
+                           "--maxtries", f"{retries},{retries},{retries}"]
+        result = subprocess.run([self.command] + args,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        output = str(result.stdout, "utf-8")
+        if result.returncode != 0:
+            raise DDCError(output.strip() or
+                           f"ddcutil exited with {result.returncode}")
+        return output
+
+    def getvcp(self, bus, feature):
+        return parse_getvcp(self._run(
+            ["getvcp", f"{feature:02X}", "--bus", str(bus)], bus))
+
+    def setvcp(self, bus, feature, value):
+        self._run(["setvcp", f"{feature:02X}", str(int(value)),
+                   "--bus", str(bus)], bus)
+
+    def getvcp_many(self, bus, features):
+        """
+        reads several features with one ddcutil run
+        return {feature: (current value, max value) or DDCError}
+        """
+        try:
+            results = parse_getvcp_brief(self._run(
+                ["getvcp"] + [f"{feature:02X}" for feature in features] +
+                ["--brief", "--bus", str(bus)], bus))
+        except DDCError:
+            results = {}
+        # ddcutil versions that read one feature per run only answer the
+        # first one, ask again for whatever is missing
+        for feature in features:
+            if feature not in results:
+                try:
+                    results[feature] = self.getvcp(bus, feature)
+                except DDCError as e:
+                    results[feature] = e
+        return results
+
+    def capabilities(self, bus):
+        """return the display's raw MCCS capabilities string"""
+        output = self._run(["capabilities", "--verbose", "--bus", str(bus)], bus)
+        for line in output.splitlines():
+            if "capabilities string:" in line.lower():
+                return line.split(":", 1)[1].strip()
+        raise DDCError(f"no capabilities string for /dev/i2c-{bus}")
+
+
+class DDCWorker(threading.Thread):
+    """
+    One long lived thread per session running the asyncio loop that
+    executes every DDC request. Requests are submitted with submit() and
+    answered through a Future, so the GUI thread never waits on a display.
+    Every I2C bus has its own lock: requests for different buses run at
+    the same time, requests for one bus run one after another in the order
+    they were submitted. The blocking transport calls run on a small
+    thread pool. The transport, and whatever detection state it holds,
+    stays alive for the whole session.
+    """
+
+    def __init__(self, transport=None, history_size=200, max_buses=8):
+        """
+        max_buses - how many buses are talked to at the same time
+        """
+        threading.Thread.__init__(self, name="ddc-worker", daemon=True)
+        self.transport = transport or DDCUtilTransport()
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_buses,
+                                           thread_name_prefix="ddc-io")
+        self.bus_locks = {}
+        self.history_size = history_size
+        self.latencies = {}
+        self.latency_lock = threading.Lock()
+
+    def submit(self, operation, bus, feature, value=None):
+        """
+        queues a request, operation is "getvcp", "setvcp", "getvcp_many"
+        (feature is then a list of features) or "capabilities"
+        returns a Future holding the transport's answer
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.request(operation, bus, feature, value), self.loop)
+
+    def getvcp(self, bus, feature=BRIGHTNESS):
+        return self.submit("getvcp", bus, feature)
+
+    def setvcp(self, bus, value, feature=BRIGHTNESS):
+        return self.submit("setvcp", bus, feature, value)
+
+    def getvcp_many(self, bus, features):
+        return self.submit("getvcp_many", bus, features)
+
+    def capabilities(self, bus):
+        return self.submit("capabilities", bus, None)
+
+    def stop(self):
+        """finishes every submitted request, then ends the loop"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+        log.info(f"[ddc] latency report: {self.latency_report()}")
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        pending = asyncio.all_tasks(self.loop)
+        if pending:
+            self.loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+        self.executor.shutdown()
+
+    async def request(self, operation, bus, feature, value=None):
+        """
+        runs one request on the worker's loop, waiting for the bus to be
+        free first
+        """
+        if bus not in self.bus_locks:
+            self.bus_locks[bus] = asyncio.Lock()
+        async with self.bus_locks[bus]:
+            start = time.perf_counter()
+            try:
+                return await self.loop.run_in_executor(
+                    self.executor, self._call, operation, bus, feature, value)
+            finally:
+                self._record(bus, time.perf_counter() - start)
+
+    def _call(self, operation, bus, feature, value):
+        if operation == "getvcp":
+            return self.transport.getvcp(bus, feature)
+        if operation == "getvcp_many":
+            return self.transport.getvcp_many(bus, feature)
+        if operation == "capabilities":
+            return self.transport.capabilities(bus)
+        return self.transport.setvcp(bus, feature, value)
+
+    def _record(self, bus, latency):
+        with self.latency_lock:
+            if bus not in self.latencies:
+                self.latencies[bus] = deque(maxlen=self.history_size)
+            self.latencies[bus].append(latency)
+
+    def latency(self, bus, percent=95):
+        """return the percentile latency of recent requests on bus, 0 if none"""
+        with self.latency_lock:
+            ordered = sorted(self.latencies.get(bus, ()))
+        return percentile(ordered, percent)
+
+    def latency_report(self):
+        """
+        return {bus: {"count", "mean", "p50", "p95"}} in seconds,
+        computed over the most recent requests on every bus
+        """
+        report = {}
+        with self.latency_lock:
+            for bus, samples in self.latencies.items():
+                ordered = sorted(samples)
+                report[bus] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": percentile(ordered, 50),
+                    "p95": percentile(ordered, 95),
+                }
+        return report
+
+
+def percentile(ordered, percent):
+    """nearest rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def probe_displays(read, buses, on_result=None):
+    """
+    reads every display at the same time with one task per I2C bus, so
+    displays sharing a bus are still read one after another
+    read - callable(display) returning the display's value
+    buses - {display: bus}
+    on_result - callable(display, result) called as each result arrives,
+    from the probing thread. A failed read passes its exception as result.
+    return {display: result}
+    """
+    groups = {}
+    for display, bus in buses.items():
+        groups.setdefault(bus, []).append(display)
+    results = {}
+
+    def probe_bus(displays):
+        for display in displays:
+            try:
+                result = read(display)
+            except Exception as e:
+                result = e
+            results[display] = result
+            if on_result:
+                on_result(display, result)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(groups)),
+                            thread_name_prefix="ddc-probe") as pool:
+        for displays in groups.values():
+            pool.submit(probe_bus, displays)
+    return results
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+On-disk cache of the display topology found by check_displays, so startup
+can skip `xrandr --verbose` and `ddcutil detect` when nothing changed.
+Every display is keyed by the hash of its EDID, numbered when identical
+monitors send the same one.
+"""
+
+from brightness_controller_linux.util import edid, json_cache
+
+CACHE_VERSION = 1
+cache_path = json_cache.cache_directory + 'display_cache.json'
+
+
+def edid_hash(edid_hex):
+    return edid.digest(bytes.fromhex(edid_hex))
+
+
+def display_key(connection, edids):
+    """
+    return the cache key of a connector, the hash of its EDID when known
+    edids - {connection: edid hex}
+    """
+    edid_hex = edids.get(connection)
+    if edid_hex:
+        return edid_hash(edid_hex)
+    return "connector:" + connection
+
+
+def display_keys(displays, edids):
+    """
+    return the cache key of every display, in the order of displays
+    Identical monitors without a serial number send the same EDID, the
+    second and later of them by connector name get '#2', '#3'... appended.
+    displays - [['connection', ...]]
+    """
+    keys = [display_key(display[0], edids) for display in displays]
+    ordinals = {}
+    for i in sorted(range(len(displays)), key=lambda i: displays[i][0]):
+        ordinals[keys[i]] = ordinals.get(keys[i], 0) + 1
+        if ordinals[keys[i]] > 1:
+            keys[i] = f"{keys[i]}#{ordinals[keys[i]]}"
+    return keys
+
+
+def build(displays, edids, maxes=None, ddc=False):
+    """
+    displays - [['connection', 'display name', bus]] as ordered by the app
+    maxes - VCP 0x10 max of every display, same order as displays
+    return the cache document
+    """
+    entries = []
+    for i, (display, key) in enumerate(zip(displays, display_keys(displays, edids))):
+        entries.append({
+            "key": key,
+            "connector": display[0],
+            "name": display[1],
+            "bus": display[2] if len(display) > 2 else None,
+            "vcp_max": maxes[i] if maxes else None,
+        })
+    return {"version": CACHE_VERSION, "ddc": ddc, "displays": entries}
+
+
+def keys(cache):
+    return [entry["key"] for entry in cache["displays"]]
+
+
+def topology(cache):
+    """return what identifies a topology, everything but the VCP maxes"""
+    return [(entry["key"], entry["connector"], entry["name"], entry["bus"])
+            for entry in cache["displays"]]
+
+
+def displays(cache):
+    """return [['connection', 'display name', bus]] stored in the cache"""
+    result = []
+    for entry in cache["displays"]:
+        display = [entry["connector"], entry["name"]]
+        if cache["ddc"]:
+            display.append(entry["bus"])
+        result.append(display)
+    return result
+
+
+def maxes(cache):
+    return [entry["vcp_max"] or 1 for entry in cache["displays"]]
+
+
+def load(path=None, ddc=False):
+    """
+    return the cached topology, or None when there is no usable cache
+    ddc - whether ddcutil is usable now, a cache written with a different
+    setting is ignored
+    """
+    cache = json_cache.load(path or cache_path)
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return None
+    if cache.get("ddc") != ddc or not cache.get("displays"):
+        return None
+    return cache
+
+
+def save(cache, path=None):
+    json_cache.save(path or cache_path, cache)
+
+
+def merge_maxes(cache, previous):
+    """copies VCP maxes of displays that were already cached into cache"""
+    known = {entry["key"]: entry["vcp_max"] for entry in previous["displays"]}
+    for entry in cache["displays"]:
+        if entry["vcp_max"] is None:
+            entry["vcp_max"] = known.get(entry["key"])
+    return cache
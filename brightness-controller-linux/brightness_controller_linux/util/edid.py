@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Decoder for the 128 byte base block of EDID 1.3 and 1.4.
+A monitor sends the same EDID every time, so decoded blocks are kept by
+their hash and every later decode of the same bytes is a lookup.
+"""
+
+import hashlib
+from functools import lru_cache
+
+HEADER = bytes.fromhex("00ffffffffffff00")
+BLOCK_SIZE = 128
+DESCRIPTOR_OFFSETS = (54, 72, 90, 108)
+DECODE_CACHE_SIZE = 64
+
+# display descriptor tags
+SERIAL_TEXT = 0xFF
+TEXT = 0xFE
+RANGE_LIMITS = 0xFD
+NAME = 0xFC
+
+
+class EdidError(ValueError):
+    """raised for data that is not an EDID base block"""
+
+
+class Descriptor:
+    """
+    One of the four 18 byte descriptors
+    tag - TIMING for a detailed timing, else the display descriptor tag
+    value - (width, height, pixel clock kHz) of a timing, the text of a
+    text descriptor, the raw 13 data bytes of any other descriptor
+    """
+    __slots__ = ("tag", "value")
+    TIMING = -1
+
+    def __init__(self, tag, value):
+        self.tag = tag
+        self.value = value
+
+    def __repr__(self):
+        return f"Descriptor({self.tag}, {self.value!r})"
+
+
+class Edid:
+    """
+    A decoded EDID base block
+    manufacturer - three letter PNP id such as 'DEL'
+    product - the 16 bit product code
+    serial - the 32 bit serial number, 0 when unset
+    serial_text, name - from the display descriptors, '' when absent
+    digest - hash of all the bytes, base_digest - of the base block alone,
+    which is all that some tools (such as ddcutil) print
+    """
+    __slots__ = ("digest", "base_digest", "manufacturer", "product", "serial", "week", "year",
+                 "version", "descriptors", "extensions", "checksum_valid",
+                 "name", "serial_text")
+
+    def __repr__(self):
+        return (f"Edid({self.manufacturer} {self.product:04x} {self.name!r} "
+                f"serial={self.serial_text or self.serial} {self.version})")
+
+    @property
+    def identity(self):
+        """
+        return 'MFG:product:serial', which tells two monitors of the same
+        model apart and stays the same on every connector
+        """
+        return identity(self.manufacturer, self.product, self.serial_text or self.serial)
+
+
+def identity(manufacturer, product, serial):
+    """return the identity of a monitor whose EDID was decoded elsewhere"""
+    return f"{manufacturer}:{product:04x}:{serial}"
+
+
+def digest(data):
+    """return the hash an EDID is cached and keyed by"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def _manufacturer(data):
+    code = (data[8] << 8) | data[9]
+    return "".join(chr(64 + ((code >> shift) & 0x1F)) for shift in (10, 5, 0))
+
+
+def _text(raw):
+    return raw.split(b"\n", 1)[0].decode("cp437").strip()
+
+
+def _descriptor(block):
+    if block[0] or block[1]:
+        clock = (block[0] | block[1] << 8) * 10
+        width = block[2] | (block[4] & 0xF0) << 4
+        height = block[5] | (block[7] & 0xF0) << 4
+        return Descriptor(Descriptor.TIMING, (width, height, clock))
+    tag = block[3]
+    if tag in (SERIAL_TEXT, TEXT, NAME):
+        return Descriptor(tag, _text(block[5:18]))
+    return Descriptor(tag, bytes(block[5:18]))
+
+
+def _decode(data):
+    if len(data) < BLOCK_SIZE:
+        raise EdidError(f"EDID is {len(data)} bytes, at least {BLOCK_SIZE} expected")
+    if data[:8] != HEADER:
+        raise EdidError("EDID header missing")
+    edid = Edid()
+    edid.digest = digest(data)
+    edid.base_digest = digest(data[:BLOCK_SIZE])
+    edid.manufacturer = _manufacturer(data)
+    edid.product = data[10] | data[11] << 8
+    edid.serial = int.from_bytes(data[12:16], "little")
+    edid.week = data[16]
+    edid.year = 1990 + data[17]
+    edid.version = f"{data[18]}.{data[19]}"
+    edid.descriptors = tuple(_descriptor(data[offset:offset + 18])
+                             for offset in DESCRIPTOR_OFFSETS)
+    edid.extensions = data[126]
+    edid.checksum_valid = sum(data[:BLOCK_SIZE]) % 256 == 0
+    texts = {d.tag: d.value for d in reversed(edid.descriptors)
+             if d.tag in (SERIAL_TEXT, NAME)}
+    edid.name = texts.get(NAME, "")
+    edid.serial_text = texts.get(SERIAL_TEXT, "")
+    return edid
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def decode(data):
+    """
+    return the Edid of raw bytes, raises EdidError when they are not one
+    The result is shared between callers and must not be modified.
+    """
+    return _decode(bytes(data))
+
+
+def decode_hex(edid_hex):
+    """return the Edid of a hex string as xrandr prints it"""
+    try:
+        data = bytes.fromhex(edid_hex)
+    except ValueError as e:
+        raise EdidError(f"EDID is not hex: {e}") from None
+    return decode(data)
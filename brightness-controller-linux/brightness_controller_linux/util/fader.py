@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Timed brightness transitions.
+A fade writes the values between a start and a target over a duration,
+with no more steps than the display's write latency leaves room for.
+"""
+
+import threading
+import time
+
+import brightness_controller_linux.util.log as log
+
+# no point in stepping faster than a display refreshes
+MIN_INTERVAL = 1 / 60
+# weight of the newest step in the running latency estimate
+LATENCY_WEIGHT = 0.3
+
+
+def step_count(start, target, duration, latency):
+    """
+    return how many writes a fade from start to target takes, at most one
+    per unit of change and one per latency (or MIN_INTERVAL)
+    """
+    interval = max(latency or 0.0, MIN_INTERVAL)
+    return max(1, min(abs(target - start), int(duration / interval)))
+
+
+class Fader:
+    """
+    Runs one fade per key (a display) on its own short lived thread.
+    Every step is written synchronously, so a slow display delays the
+    fade instead of piling up writes; steps whose time has passed are
+    skipped. Starting a new fade or calling cancel() ends the running one
+    for that key before its next step.
+    """
+
+    def __init__(self, step, name="fader", clock=time.monotonic):
+        """
+        step - callable(key, value) performing one blocking write
+        """
+        self.step = step
+        self.name = name
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.generations = {}
+        self.threads = {}
+        self.latencies = {}
+
+    def latency(self, key):
+        """return the measured seconds one step of key takes, 0 if unknown"""
+        with self.condition:
+            return self.latencies.get(key, 0.0)
+
+    def fade(self, key, start, target, duration, latency=None):
+        """
+        fades key from start to target over duration seconds
+        latency - expected seconds per write, defaults to what earlier
+        fades of key measured
+        returns the thread running the fade
+        """
+        if latency is None:
+            latency = self.latency(key)
+        steps = step_count(start, target, duration, latency) \
+            if duration > 0 else 1
+        with self.condition:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            self.condition.notify_all()
+            thread = threading.Thread(
+                target=self._run,
+                args=(key, generation, start, target, duration, steps),
+                name=f"{self.name}-{key}", daemon=True)
+            self.threads[key] = thread
+        thread.start()
+        return thread
+
+    def cancel(self, key):
+        with self.condition:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            self.condition.notify_all()
+
+    def cancel_all(self):
+        with self.condition:
+            for key in self.generations:
+                self.generations[key] += 1
+            self.condition.notify_all()
+
+    def wait(self, key, timeout=None):
+        """
+        waits for the running fade of key to end
+        return False if it is still running after timeout
+        """
+        with self.condition:
+            thread = self.threads.get(key)
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _cancelled(self, key, generation):
+        return self.generations[key] != generation
+
+    def _run(self, key, generation, start, target, duration, steps):
+        interval = duration / steps
+        begin = self.clock()
+        i = 0
+        while i < steps:
+            # a late step moves straight to the value that is due now
+            due = int((self.clock() - begin) / interval) if interval else 0
+            i = min(steps, max(i + 1, due))
+            with self.condition:
+                if self._cancelled(key, generation):
+                    return
+            value = int(round(start + (target - start) * i / steps))
+            stepStart = self.clock()
+            try:
+                self.step(key, value)
+            except Exception as e:
+                log.error(f"[{self.name}] fading {key} to {value} failed: {e}")
+                return
+            elapsed = self.clock() - stepStart
+            with self.condition:
+                previous = self.latencies.get(key)
+                self.latencies[key] = elapsed if previous is None else \
+                    previous + LATENCY_WEIGHT * (elapsed - previous)
+                if i < steps:
+                    delay = begin + (i + 1) * interval - self.clock()
+                    if delay > 0:
+                        self.condition.wait_for(
+                            lambda: self._cancelled(key, generation), delay)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Gamma ramp generation with a cache of recently used ramps, so moving a
+slider back and forth never computes the same ramp twice.
+"""
+
+import array
+from functools import lru_cache
+
+# slider position i (0 - 99) maps to the brightness or gamma LEVELS[i]
+LEVELS = tuple((i + 1) / 100 for i in range(100))
+# ramps of different channels, brightnesses and CRTC sizes kept around
+CHANNEL_CACHE_SIZE = 1024
+RAMP_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=CHANNEL_CACHE_SIZE)
+def channel(size, brightness, gamma):
+    """
+    return one channel's ramp of size 16 bit entries, the same values
+    `xrandr --brightness brightness --gamma gamma` would send
+    The ramp is shared between callers and must not be modified.
+    """
+    if size < 2:
+        return array.array("H", [int(min(brightness, 1.0) * 65535)] * size)
+    exponent = 1.0 / gamma
+    last = size - 1
+    return array.array("H", (int(min((i / last) ** exponent * brightness, 1.0) * 65535)
+                             for i in range(size)))
+
+
+@lru_cache(maxsize=RAMP_CACHE_SIZE)
+def ramps(size, brightness, red, green, blue):
+    """return the (red, green, blue) ramps of a CRTC with size entries"""
+    return (channel(size, brightness, red),
+            channel(size, brightness, green),
+            channel(size, brightness, blue))
+
+
+def cache_info():
+    """return {"ramps": ..., "channels": ...} hit and miss counters"""
+    return {"ramps": ramps.cache_info(), "channels": channel.cache_info()}
+
+
+def cache_clear():
+    ramps.cache_clear()
+    channel.cache_clear()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Display hotplug detection.
+The kernel broadcasts a DRM uevent whenever a connector changes, the
+watcher then reads the connectors from sysfs and reports which monitors
+came and went, nothing is re-detected when the connected set is the same.
+"""
+
+import os
+import select
+import socket
+import threading
+
+import brightness_controller_linux.util.log as log
+from brightness_controller_linux.util import check_displays, edid
+
+NETLINK_KOBJECT_UEVENT = 15
+# the multicast group the kernel sends uevents to
+KERNEL_GROUP = 1
+# hotplug events come in bursts, the connectors are read once it is over
+SETTLE_SECONDS = 0.5
+RECEIVE_SIZE = 16384
+
+
+def parse_uevent(data):
+    """
+    return the KEY=value pairs of a kernel uevent as a dict,
+    {} for anything else (such as udevd's own messages)
+    data - 'action@devpath' followed by NUL separated KEY=value
+    """
+    fields = data.split(b"\0")
+    if b"@" not in fields[0]:
+        return {}
+    event = {}
+    for field in fields[1:]:
+        key, sep, value = field.partition(b"=")
+        if sep:
+            event[key.decode("ascii", "replace")] = value.decode("utf-8", "replace")
+    return event
+
+
+def is_drm_hotplug(event):
+    return event.get("SUBSYSTEM") == "drm" and event.get("HOTPLUG") == "1"
+
+
+def connected(root=None):
+    """return {connector: EDID digest} of the connected DRM connectors"""
+    return {monitor.connector: edid.digest(monitor.edid)
+            for monitor in check_displays.read_sysfs_monitors(root)
+            if monitor.connected}
+
+
+def diff(old, new):
+    """
+    return (added, removed) connector lists between two connected() sets,
+    a connector that now has a different monitor is in both
+    """
+    added = sorted(c for c in new if old.get(c) != new[c])
+    removed = sorted(c for c in old if new.get(c) != old[c])
+    return added, removed
+
+
+class HotplugWatcher:
+    """
+    Listens for DRM uevents on a netlink socket in a thread of its own and
+    calls on_change(added, removed) from that thread when the connected
+    monitors differ from the last time they were read.
+    """
+
+    def __init__(self, on_change, root=None, settle=SETTLE_SECONDS):
+        self.on_change = on_change
+        self.root = root
+        self.settle = settle
+        self.lock = threading.Lock()
+        self.known = connected(root)
+        self.socket = None
+        self.thread = None
+        self.wakeup = None
+
+    def handle_uevent(self, data):
+        """
+        handles one raw uevent, return (added, removed) or None when the
+        event is no DRM hotplug
+        """
+        if not is_drm_hotplug(parse_uevent(data)):
+            return None
+        return self.rescan()
+
+    def rescan(self):
+        """reads the connectors again, reports and returns (added, removed)"""
+        with self.lock:
+            current = connected(self.root)
+            added, removed = diff(self.known, current)
+            self.known = current
+        if added or removed:
+            log.info(f"[hotplug] displays added {added}, removed {removed}")
+            try:
+                self.on_change(added, removed)
+            except Exception as e:
+                log.error(f"[hotplug] handling the change failed: {e}")
+        return added, removed
+
+    def start(self):
+        """returns False when uevents can not be received"""
+        try:
+            self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                        NETLINK_KOBJECT_UEVENT)
+            self.socket.bind((0, KERNEL_GROUP))
+        except (OSError, AttributeError) as e:
+            log.warning(f"[hotplug] can not listen for uevents: {e}")
+            self.socket = None
+            return False
+        self.wakeup = os.pipe()
+        self.thread = threading.Thread(target=self._run, name="hotplug", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if self.thread is None:
+            return
+        os.write(self.wakeup[1], b"\0")
+        self.thread.join(5)
+        self.thread = None
+        self.socket.close()
+        for fd in self.wakeup:
+            os.close(fd)
+
+    def _receive(self, timeout):
+        """return the uevents that arrive within timeout, None once stopped"""
+        ready, _, _ = select.select([self.socket, self.wakeup[0]], [], [], timeout)
+        if self.wakeup[0] in ready:
+            return None
+        events = []
+        while ready:
+            events.append(self.socket.recv(RECEIVE_SIZE))
+            ready, _, _ = select.select([self.socket], [], [], 0)
+        return events
+
+    def _run(self):
+        while True:
+            events = self._receive(None)
+            if events is None:
+                return
+            if not any(is_drm_hotplug(parse_uevent(data)) for data in events):
+                continue
+            # let the rest of the burst arrive before reading sysfs once
+            while True:
+                more = self._receive(self.settle)
+                if more is None:
+                    return
+                if not more:
+                    break
+            self.rescan()
@@ -17,41 +17,276 @@
 # along with Brightness Controller.  If not, see
 # <http://www.gnu.org/licenses/>.
 
-import os, sys
+"""
+Application log at ~/.config/brightness_controller/log.txt.
+Lines are handed to a background thread through a bounded queue and
+written through one open file, flushed every FLUSH_BYTES or FLUSH_SECONDS
+and rotated to log.txt.1 ... log.txt.BACKUP_COUNT past MAX_BYTES.
+Calls below the current level return before doing anything, arguments
+given after a %-style message are only formatted for lines that are kept.
+"""
+
+import atexit
+import getpass
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
-logPath = f"/home/{os.getlogin()}/.config/brightness_controller/log.txt"
-
-def write(logString, level):
-    currentTime = datetime.now()
-    with open(logPath, 'a') as file:
-        if type(logString) is list:
-            for line in logString:
-                if type(line) is list:
-                    write(line, level)
-                else:
-                    file.write(f"[{currentTime}] [{level}] {line}\n")
+logDirectory = f"/home/{getpass.getuser()}/.config/brightness_controller"
+logPath = f"{logDirectory}/log.txt"
+
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+# lines waiting for the writer, more are dropped instead of blocking the caller
+QUEUE_SIZE = 10000
+FLUSH_BYTES = 64 * 1024
+FLUSH_SECONDS = 1.0
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+FATAL = 50
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning",
+               ERROR: "ERROR", FATAL: "FATAL"}
+# e.g. BRIGHTNESS_CONTROLLER_LOG=debug, or warning to keep the log short
+LEVEL_ENVIRONMENT = "BRIGHTNESS_CONTROLLER_LOG"
+
+
+def parse_level(text):
+    """return the level a name such as 'debug' or a number stands for, None if neither"""
+    text = (text or "").strip()
+    if text.isdigit():
+        return int(text)
+    for number, name in LEVEL_NAMES.items():
+        if name.lower() == text.lower():
+            return number
+    return None
+
+
+def environment_level():
+    """return the level LEVEL_ENVIRONMENT asks for, INFO when unset or unknown"""
+    requested = parse_level(os.getenv(LEVEL_ENVIRONMENT))
+    return INFO if requested is None else requested
+
+
+level = environment_level()
+
+
+def _lines(logString):
+    """yields every item of nested lists, or logString itself"""
+    stack = [iter([logString])]
+    while stack:
+        for item in stack[-1]:
+            if type(item) is list:
+                stack.append(iter(item))
+                break
+            yield item
         else:
-            file.write(f"[{currentTime}] [{level}] {logString}\n")
+            stack.pop()
+
+
+class LogWriter:
+    """
+    Writes log records on a thread of its own, the callers only queue them.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                 queue_size=QUEUE_SIZE, flush_bytes=FLUSH_BYTES,
+                 flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(queue_size)
+        self.file = None
+        self.size = 0
+        self.dropped = 0
+        self.reportedDrops = 0
+        self.failed = False
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, logString, level, args=()):
+        """
+        args - formatted into logString with % right away, as the caller
+        may change them before the writer thread gets to the record
+        """
+        if args:
+            try:
+                logString = logString % args
+            except (TypeError, ValueError) as e:
+                logString = f"{logString} {args} (formatting failed: {e})"
+        # lists are copied for the same reason
+        elif type(logString) is list:
+            logString = list(logString)
+        try:
+            self.queue.put_nowait((datetime.now(), level, logString))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5):
+        """waits until everything queued so far is on disk"""
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+    def _open(self):
+        try:
+            self.file = open(self.path, "a", buffering=self.flush_bytes)
+            self.size = self.file.tell()
+        except OSError as e:
+            if not self.failed:
+                print(f"Can not write the log {self.path}: {e}", file=sys.stderr)
+                self.failed = True
+            self.file = None
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, record):
+        currentTime, level, logString = record
+        if self.file is None:
+            self._open()
+            if self.file is None:
+                return
+        text = "".join(f"[{currentTime}] [{level}] {line}\n" for line in _lines(logString))
+        dropped = self.dropped
+        if dropped != self.reportedDrops:
+            text = f"[{currentTime}] [warning] {dropped - self.reportedDrops} log lines " \
+                "dropped, the log writer fell behind\n" + text
+            self.reportedDrops = dropped
+        if self.size and self.size + len(text) > self.max_bytes:
+            try:
+                self._rotate()
+            except OSError as e:
+                print(f"Can not rotate the log {self.path}: {e}", file=sys.stderr)
+            self._open()
+            if self.file is None:
+                return
+            self.size = 0
+        self.file.write(text)
+        self.size += len(text)
+
+    def _run(self):
+        dirty = False
+        lastFlush = time.monotonic()
+        while True:
+            # sleep for good when everything is on disk
+            timeout = max(0.0, lastFlush + self.flush_seconds - time.monotonic()) \
+                if dirty else None
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = ()
+            if record:
+                if isinstance(record, tuple):
+                    try:
+                        self._write(record)
+                    except Exception as e:
+                        print(f"Can not write the log {self.path}: {e}", file=sys.stderr)
+                    dirty = True
+                    # a fatal error is usually followed by an exit
+                    if record[1] != "FATAL" and \
+                            time.monotonic() - lastFlush < self.flush_seconds:
+                        continue
+            if self.file is not None:
+                try:
+                    self.file.flush()
+                except OSError:
+                    pass
+            dirty = False
+            lastFlush = time.monotonic()
+            if isinstance(record, threading.Event):
+                record.set()
+            elif record is None:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                return
+
+
+_writer = None
+_writerLock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writerLock:
+            if _writer is None:
+                _writer = LogWriter(logPath)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def set_level(newLevel):
+    global level
+    level = newLevel
+
+
+def enabled(messageLevel):
+    """return whether lines of messageLevel are written, to skip building costly ones"""
+    return messageLevel >= level
+
+
+def write(logString, levelName, args=()):
+    _get_writer().put(logString, levelName, args)
+
+
+def flush():
+    """waits until every line logged so far is written"""
+    if _writer is not None:
+        _writer.flush()
+
+def debug(logString, *args):
+    if DEBUG >= level:
+        write(logString, "debug", args)
 
-def info(logString):
-    write(logString, "info")
+def info(logString, *args):
+    if INFO >= level:
+        write(logString, "info", args)
 
-def warning(logString):
-    write(logString, "warning")
+def warning(logString, *args):
+    if WARNING >= level:
+        write(logString, "warning", args)
 
-def error(logString):
-    write(logString, "ERROR")
+def error(logString, *args):
+    if ERROR >= level:
+        write(logString, "ERROR", args)
 
-def fatal(logString):
-    write(logString, "FATAL")
+def fatal(logString, *args):
+    if FATAL >= level:
+        write(logString, "FATAL", args)
 
 def begin():
     if not os.path.exists(logPath):
         try:
-            os.makedirs(f"/home/{os.getlogin()}/.config/brightness_controller")
+            os.makedirs(logDirectory)
         except:
             None
         open(logPath, 'w').close()
 
-    info("Application start!")
\ No newline at end of file
+    info("Application start!")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Day and night schedule for brightness and colour temperature.
+Transitions start at local sunrise and sunset, computed offline from
+coordinates with NOAA's solar equations, or at fixed times of day.
+"""
+
+import math
+from datetime import datetime, date, time, timedelta, timezone
+
+from brightness_controller_linux.util import color_temperature
+
+DAY = "day"
+NIGHT = "night"
+# the sun's centre is this far below the horizon at sunrise and sunset,
+# refraction plus the sun's radius
+SUN_ALTITUDE = -0.833
+# a transition never steps faster than this, in seconds
+MIN_STEP_INTERVAL = 1.0
+
+J2000 = date(2000, 1, 1)
+UNIX_EPOCH_JULIAN = 2440587.5
+
+
+def _from_julian(julian):
+    return datetime.fromtimestamp((julian - UNIX_EPOCH_JULIAN) * 86400,
+                                  timezone.utc).astimezone()
+
+
+def sun_events(day, latitude, longitude):
+    """
+    return [(local datetime, DAY or NIGHT)] for the sunrise and sunset of
+    a date. On a polar day or night the list holds a single entry at local
+    midnight.
+    latitude, longitude - degrees, north and east positive
+    """
+    solar_noon = (day - J2000).days + 0.0008 - longitude / 360
+    anomaly = math.radians((357.5291 + 0.98560028 * solar_noon) % 360)
+    centre = 1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) + \
+        0.0003 * math.sin(3 * anomaly)
+    ecliptic = math.radians((math.degrees(anomaly) + centre + 180 + 102.9372) % 360)
+    transit = 2451545.0 + solar_noon + 0.0053 * math.sin(anomaly) - \
+        0.0069 * math.sin(2 * ecliptic)
+    declination = math.asin(math.sin(ecliptic) * math.sin(math.radians(23.4397)))
+    phi = math.radians(latitude)
+    cos_hour_angle = (math.sin(math.radians(SUN_ALTITUDE)) -
+                      math.sin(phi) * math.sin(declination)) / \
+        (math.cos(phi) * math.cos(declination))
+    if abs(cos_hour_angle) > 1:
+        midnight = datetime.combine(day, time()).astimezone()
+        return [(midnight, NIGHT if cos_hour_angle > 1 else DAY)]
+    hour_angle = math.degrees(math.acos(cos_hour_angle))
+    return [(_from_julian(transit - hour_angle / 360), DAY),
+            (_from_julian(transit + hour_angle / 360), NIGHT)]
+
+
+def _mired(kelvin):
+    return 1e6 / kelvin
+
+
+class Schedule:
+    """
+    Brightness (percent) and colour temperature (kelvin) for day and night.
+    A transition starts at every sunrise and sunset and takes `transition`
+    seconds. Without coordinates the fixed sunrise and sunset times are
+    used.
+    """
+
+    def __init__(self, day_kelvin=color_temperature.NEUTRAL_KELVIN,
+                 night_kelvin=3400, day_brightness=100, night_brightness=80,
+                 transition=1800, latitude=None, longitude=None,
+                 sunrise=time(7, 0), sunset=time(20, 0)):
+        self.values = {DAY: (day_kelvin, day_brightness),
+                       NIGHT: (night_kelvin, night_brightness)}
+        self.transition = transition
+        self.latitude = latitude
+        self.longitude = longitude
+        self.sunrise = sunrise
+        self.sunset = sunset
+
+    @classmethod
+    def from_settings(cls, options, day_kelvin, day_brightness):
+        """
+        builds a schedule from the [schedule] options of the settings file
+        day_kelvin, day_brightness - used for whatever the file leaves out
+        """
+        def number(key, default, kind=float):
+            return kind(options[key]) if options.get(key) else default
+
+        def clock(key, default):
+            return time.fromisoformat(options[key]) if options.get(key) else default
+
+        return cls(day_kelvin=number("day_temperature", day_kelvin, int),
+                   night_kelvin=number("night_temperature", 3400, int),
+                   day_brightness=number("day_brightness", day_brightness, int),
+                   night_brightness=number("night_brightness", 80, int),
+                   transition=number("transition_minutes", 30) * 60,
+                   latitude=number("latitude", None),
+                   longitude=number("longitude", None),
+                   sunrise=clock("sunrise", time(7, 0)),
+                   sunset=clock("sunset", time(20, 0)))
+
+    def events(self, day):
+        """return [(local datetime, DAY or NIGHT)] starting on a date"""
+        if self.latitude is not None and self.longitude is not None:
+            return sun_events(day, self.latitude, self.longitude)
+        return [(datetime.combine(day, self.sunrise).astimezone(), DAY),
+                (datetime.combine(day, self.sunset).astimezone(), NIGHT)]
+
+    def _around(self, now):
+        """return the events from two days before to two days after now"""
+        events = []
+        for offset in range(-2, 3):
+            events += self.events(now.date() + timedelta(days=offset))
+        return sorted(events)
+
+    def state(self, now):
+        """
+        return (kelvin, brightness, transitioning) at an aware datetime
+        """
+        events = self._around(now)
+        past = [i for i, (at, phase) in enumerate(events) if at <= now]
+        if not past:
+            return self.values[events[0][1]] + (False,)
+        index = past[-1]
+        at, phase = events[index]
+        previous = events[index - 1][1] if index > 0 else phase
+        progress = (now - at).total_seconds() / self.transition \
+            if self.transition > 0 else 1.0
+        if previous == phase or progress >= 1:
+            return self.values[phase] + (False,)
+        start_kelvin, start_brightness = self.values[previous]
+        end_kelvin, end_brightness = self.values[phase]
+        # even steps in mired look even to the eye, steps in kelvin do not
+        mired = _mired(start_kelvin) + \
+            (_mired(end_kelvin) - _mired(start_kelvin)) * progress
+        brightness = start_brightness + \
+            (end_brightness - start_brightness) * progress
+        return (int(round(1e6 / mired)), int(round(brightness)), True)
+
+    def next_transition(self, now):
+        """return when the next transition after now starts"""
+        for at, phase in self._around(now):
+            if at > now:
+                return at
+        return now + timedelta(days=1)
+
+    def step_interval(self, write_cost):
+        """
+        return the seconds between two steps of a transition, as few steps
+        as still change the output visibly, but never less than write_cost
+        """
+        (day_kelvin, day_brightness) = self.values[DAY]
+        (night_kelvin, night_brightness) = self.values[NIGHT]
+        steps = max(1, abs(day_brightness - night_brightness),
+                    int(abs(_mired(day_kelvin) - _mired(night_kelvin))))
+        return max(MIN_STEP_INTERVAL, write_cost, self.transition / steps)
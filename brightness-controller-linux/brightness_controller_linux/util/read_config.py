@@ -17,6 +17,8 @@
 
 import configparser
 
+from brightness_controller_linux.util import settings as Settings
+
 
 def read_configuration(file_path):
     """
@@ -46,4 +48,67 @@ def read_configuration(file_path):
         return (p_brightness, p_red, p_green, p_blue, p_source, temperature,
                 s_brightness, s_red, s_green, s_blue, s_source)
     else:
-        return p_brightness, p_red, p_green, p_blue, temperature
\ No newline at end of file
+        return p_brightness, p_red, p_green, p_blue, temperature
+
+def _legacy_settings(file_path, config):
+    """
+    return Settings from a file in the primary/secondary format, its
+    displays keyed by the connector they were saved from
+    """
+    loaded = read_configuration(file_path)
+    if len(loaded) == 11:
+        temperature = loaded[5]
+        displays = [(loaded[0:4], loaded[4]), (loaded[6:10], loaded[10])]
+    else:
+        temperature = loaded[4]
+        displays = [(loaded[0:4], config.get('primary', 'source', fallback=''))]
+    settings = Settings.Settings(temperature)
+    keys = []
+    for levels, connector in displays:
+        if connector == 'Default':
+            connector = ''
+        keys.append("connector:" + connector if connector else "primary")
+        settings.set(keys[-1], Settings.DisplaySettings(*levels, connector=connector))
+    settings.primary = keys[0]
+    settings.secondary = keys[1] if len(keys) > 1 else None
+    settings.migrated = True
+    return settings
+
+
+def read_settings(file_path):
+    """
+    reads the settings of every display from given file path, migrating
+    files written in the old primary/secondary format
+    return Settings
+    raises configparser.Error or ValueError on a malformed file
+    """
+    config = configparser.RawConfigParser()
+    config.read(file_path)
+    if not config.has_section('general') and config.has_section('primary'):
+        return _legacy_settings(file_path, config)
+    settings = Settings.Settings(
+        config.get('general', 'temperature', fallback='Default'),
+        config.get('general', 'primary', fallback=None),
+        config.get('general', 'secondary', fallback=None))
+    for section in config.sections():
+        if not section.startswith(Settings.SECTION_PREFIX):
+            continue
+        options = config[section]
+        settings.set(section[len(Settings.SECTION_PREFIX):], Settings.DisplaySettings(
+            options.getint('brightness', 99), options.getint('red', 99),
+            options.getint('green', 99), options.getint('blue', 99),
+            options.get('connector', ''), options.get('name', '')))
+    return settings
+
+
+def read_schedule(file_path):
+    """
+    reads the [schedule] section of the given file path
+    return {option: str} or None when there is no enabled schedule
+    """
+    config = configparser.RawConfigParser()
+    config.read(file_path)
+    if not config.has_section('schedule') or \
+            not config.getboolean('schedule', 'enabled', fallback=True):
+        return None
+    return dict(config['schedule'])
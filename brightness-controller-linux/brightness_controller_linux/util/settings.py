@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Saved settings for any number of displays.
+Every display is stored under its display cache key (the hash of its
+EDID, numbered for identical monitors, or 'connector:NAME' without one)
+and found again by that key, or by its connector when the monitor was
+swapped for another.
+"""
+
+SETTINGS_VERSION = 2
+SECTION_PREFIX = "display:"
+
+
+class DisplaySettings:
+    """
+    brightness, red, green, blue - slider positions
+    connector, name - where and what the display was when saved
+    """
+    __slots__ = ("brightness", "red", "green", "blue", "connector", "name")
+
+    def __init__(self, brightness=99, red=99, green=99, blue=99, connector="", name=""):
+        self.brightness = brightness
+        self.red = red
+        self.green = green
+        self.blue = blue
+        self.connector = connector
+        self.name = name
+
+    def levels(self):
+        return (self.brightness, self.red, self.green, self.blue)
+
+    def __eq__(self, other):
+        return isinstance(other, DisplaySettings) and \
+            all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return f"DisplaySettings({self.levels()}, {self.connector!r}, {self.name!r})"
+
+
+class Settings:
+    """
+    displays - {key: DisplaySettings}
+    primary, secondary - keys of the displays the two slider groups control
+    migrated - read from a file in the old primary/secondary format
+    """
+
+    def __init__(self, temperature="Default", primary=None, secondary=None):
+        self.temperature = temperature
+        self.primary = primary
+        self.secondary = secondary
+        self.displays = {}
+        self.connectors = {}
+        self.migrated = False
+
+    def set(self, key, display):
+        previous = self.displays.get(key)
+        if previous is not None and self.connectors.get(previous.connector) == key:
+            del self.connectors[previous.connector]
+        self.displays[key] = display
+        if display.connector:
+            self.connectors[display.connector] = key
+
+    def lookup(self, key, connector=None):
+        """
+        return the saved settings of a display, by its key or else by the
+        connector it is plugged into, None when it was never saved
+        """
+        display = self.displays.get(key)
+        if display is None and connector:
+            display = self.displays.get(self.connectors.get(connector))
+        return display
+
+    def key_of(self, key, connector=None):
+        """return the key a display's settings are saved under, or None"""
+        if key in self.displays:
+            return key
+        return self.connectors.get(connector)
+
+    def __len__(self):
+        return len(self.displays)
@@ -16,74 +16,90 @@
 # along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
 
 import configparser
+import io
+import os
+import tempfile
 
 
-def default_config(config, display_type='primary'):
-    config[display_type]['brightness'] = 99
-    config[display_type]['red'] = 99
-    config[display_type]['green'] = 99
-    config[display_type]['blue'] = 99
-    config[display_type]['source'] = 'Default'
-    config[display_type]['temperature'] = 99
-    return config
+from brightness_controller_linux.util import settings as Settings
 
 
-def set_value_in_config(config, br_rgb, display_type='primary'):
-    config[display_type]['brightness'] = str(br_rgb[0])
-    config[display_type]['red'] = str(br_rgb[1])
-    config[display_type]['green'] = str(br_rgb[2])
-    config[display_type]['blue'] = str(br_rgb[3])
-    config[display_type]['source'] = str(br_rgb[4])
-    config[display_type]['temperature'] = str(br_rgb[5])
+def _existing_config(file_path):
+    """
+    return the configuration already in file_path without its display
+    sections, so sections such as [schedule] survive a save
+    """
+    config = configparser.RawConfigParser()
+    try:
+        config.read(file_path)
+    except configparser.Error:
+        config = configparser.RawConfigParser()
+    for section in config.sections():
+        if section in ('general', 'primary', 'secondary') or \
+                section.startswith(Settings.SECTION_PREFIX):
+            config.remove_section(section)
     return config
 
 
-def write_primary_display(p_br_rgb, file_path):
+def atomic_write(file_path, text):
     """
-    writes the configuration file as set in brightness controller
-    p_br_rgb - (int primary_brightness, int primary_red,
-    int primary_green, int primary_blue, str temperature)
-    @rtype : object
+    replaces file_path with text so that a crash at any point leaves
+    either the old or the new file, never a mix: the text goes to a
+    temporary file next to it, is flushed to disk and renamed over it
     """
-    config = configparser.RawConfigParser()
-    config['primary'] = {}
-    config['primary']['has_secondary'] = "False"
-    if p_br_rgb is None:
-        config = default_config(config)
-    else:
-        config = set_value_in_config(config, p_br_rgb)
-
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path),
+                                     suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as temp:
+            temp.write(text)
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    # make the rename itself survive a power cut
+    dir_fd = os.open(directory, os.O_RDONLY)
     try:
-        with open(file_path, 'w+') as configfile:
-            config.write(configfile)
-    except PermissionError as e:
-        raise e
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
 
 
-def write_both_display(p_br_rgb, s_br_rgb, file_path):
+def serialize_settings(settings, file_path):
     """
-    writes the configuration file as set in brightness controller
-    `p_br_rgb` - (int primary_brightness, int primary_red,
-    int primary_green, int primary_blue, str source, str temperature)
-    s_br_rgb - (int secondary_brightness, int secondary_red,
-    int secondary_green, int secondary_blue, str source, str temperature)
-    file_path - the save file path
+    return the text write_settings would write, file_path's other
+    sections included
     """
-    config = configparser.RawConfigParser()
-    config['primary'] = {}
-    config['primary']['has_secondary'] = "True"
-    if p_br_rgb is None:
-        config = default_config(config)
-    else:
-        config = set_value_in_config(config, p_br_rgb)
-    config['secondary'] = {}
-    if s_br_rgb is None:
-        default_config(config, 'secondary')
-    else:
-        set_value_in_config(config, s_br_rgb, 'secondary')
+    config = _existing_config(file_path)
+    config['general'] = {'version': str(Settings.SETTINGS_VERSION),
+                         'temperature': settings.temperature}
+    if settings.primary is not None:
+        config['general']['primary'] = settings.primary
+    if settings.secondary is not None:
+        config['general']['secondary'] = settings.secondary
+    for key, display in settings.displays.items():
+        config[Settings.SECTION_PREFIX + key] = {
+            'connector': display.connector,
+            'name': display.name,
+            'brightness': str(display.brightness),
+            'red': str(display.red),
+            'green': str(display.green),
+            'blue': str(display.blue),
+        }
+    text = io.StringIO()
+    config.write(text)
+    return text.getvalue()
 
-    try:
-        with open(file_path, 'w+') as configfile:
-            config.write(configfile)
-    except PermissionError as e:
-        raise e
+
+def write_settings(settings, file_path):
+    """
+    writes the settings of every display to the configuration file
+    settings - Settings
+    file_path - the save file path
+    """
+    atomic_write(file_path, serialize_settings(settings, file_path))
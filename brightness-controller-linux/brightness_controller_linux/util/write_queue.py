@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+
+import brightness_controller_linux.util.log as log
+
+
+class CoalescingWriteQueue:
+    """
+    Latest value wins write queue.
+    Every key (a display) holds at most one pending value. Submitting while
+    a value is still pending replaces it, so a slow display only ever
+    receives the newest value once it is ready again. Writes run on one
+    short lived thread per busy key, never on the caller's thread.
+    With min_interval a key is written at most once per interval, whatever
+    arrives in between is folded into the next write.
+    """
+
+    def __init__(self, write, name="write-queue", min_interval=0.0, merge=None):
+        """
+        write - callable(key, value) performing the blocking write
+        min_interval - seconds between the starts of two writes of a key
+        merge - callable(pending, value) returning the value replacing a
+        pending one, by default the newer value simply wins
+        """
+        self.write = write
+        self.name = name
+        self.min_interval = min_interval
+        self.merge = merge
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.busy = set()
+        self.last_write = {}
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.write_time = 0.0
+
+    def submit(self, key, value):
+        with self.condition:
+            self.submitted += 1
+            if key in self.pending:
+                self.coalesced += 1
+                if self.merge:
+                    value = self.merge(self.pending[key], value)
+            self.pending[key] = value
+            if key in self.busy:
+                return
+            self.busy.add(key)
+        threading.Thread(target=self._drain, args=(key,),
+                         name=f"{self.name}-{key}", daemon=True).start()
+
+    def _drain(self, key):
+        while True:
+            with self.condition:
+                if key not in self.pending:
+                    self.busy.discard(key)
+                    self.condition.notify_all()
+                    return
+                # newer values keep replacing the pending one meanwhile
+                while self.min_interval:
+                    delay = self.last_write.get(key, 0.0) + \
+                        self.min_interval - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.condition.wait(delay)
+                value = self.pending.pop(key)
+                self.last_write[key] = time.monotonic()
+            start = time.perf_counter()
+            try:
+                self.write(key, value)
+            except Exception as e:
+                log.error(f"[{self.name}] writing {value} to {key} failed: {e}")
+                with self.condition:
+                    self.failed += 1
+                continue
+            with self.condition:
+                self.written += 1
+                self.write_time += time.perf_counter() - start
+
+    def flush(self, timeout=None):
+        """
+        waits until every pending value has been written
+        return False if the timeout expired first
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.busy, timeout)
+
+    def write_cost(self):
+        """return the mean seconds a successful write took, 0 before the first"""
+        with self.condition:
+            return self.write_time / self.written if self.written else 0.0
+
+    def counters(self):
+        with self.condition:
+            return {"submitted": self.submitted,
+                    "coalesced": self.coalesced,
+                    "written": self.written,
+                    "failed": self.failed}
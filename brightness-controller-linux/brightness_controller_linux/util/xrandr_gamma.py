@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+# This file is part of Brightness Controller.
+#
+# Brightness Controller is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Brightness Controller is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Brightness Controller.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Software brightness and colour through the X server's gamma ramps.
+XRandRGamma sends RandR SetCrtcGamma over one kept open Xlib connection,
+XRandRCommand runs the xrandr binary and is used when libXrandr or the
+X server can not be reached.
+"""
+
+import ctypes
+import ctypes.util
+import subprocess
+import threading
+
+import brightness_controller_linux.util.log as log
+from brightness_controller_linux.util import gamma_ramps
+
+
+class GammaError(Exception):
+    """raised when the gamma of an output can not be set"""
+
+
+class _ScreenResources(ctypes.Structure):
+    _fields_ = [("timestamp", ctypes.c_ulong),
+                ("configTimestamp", ctypes.c_ulong),
+                ("ncrtc", ctypes.c_int),
+                ("crtcs", ctypes.POINTER(ctypes.c_ulong)),
+                ("noutput", ctypes.c_int),
+                ("outputs", ctypes.POINTER(ctypes.c_ulong)),
+                ("nmode", ctypes.c_int),
+                ("modes", ctypes.c_void_p)]
+
+
+class _OutputInfo(ctypes.Structure):
+    _fields_ = [("timestamp", ctypes.c_ulong),
+                ("crtc", ctypes.c_ulong),
+                ("name", ctypes.c_char_p),
+                ("nameLen", ctypes.c_int),
+                ("mm_width", ctypes.c_ulong),
+                ("mm_height", ctypes.c_ulong),
+                ("connection", ctypes.c_ushort),
+                ("subpixel_order", ctypes.c_ushort),
+                ("ncrtc", ctypes.c_int),
+                ("crtcs", ctypes.POINTER(ctypes.c_ulong)),
+                ("nclone", ctypes.c_int),
+                ("clones", ctypes.POINTER(ctypes.c_ulong)),
+                ("nmode", ctypes.c_int),
+                ("npreferred", ctypes.c_int),
+                ("modes", ctypes.POINTER(ctypes.c_ulong))]
+
+
+class _CrtcGamma(ctypes.Structure):
+    _fields_ = [("size", ctypes.c_int),
+                ("red", ctypes.POINTER(ctypes.c_ushort)),
+                ("green", ctypes.POINTER(ctypes.c_ushort)),
+                ("blue", ctypes.POINTER(ctypes.c_ushort))]
+
+
+class _ErrorEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int),
+                ("display", ctypes.c_void_p),
+                ("resourceid", ctypes.c_ulong),
+                ("serial", ctypes.c_ulong),
+                ("error_code", ctypes.c_ubyte),
+                ("request_code", ctypes.c_ubyte),
+                ("minor_code", ctypes.c_ubyte)]
+
+
+_ErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p,
+                                 ctypes.POINTER(_ErrorEvent))
+
+# Xlib's default error handler exits the process, errors on the displays
+# opened here are kept until set_gammas() reports them instead
+# {display: [(error code, request code, minor code, resource)]}
+_x_errors = {}
+_x_errors_lock = threading.Lock()
+_previous_handler = None
+
+
+def _x_error(display, event):
+    """the X error handler, Xlib calls it from whichever thread read the error"""
+    error = event.contents
+    with _x_errors_lock:
+        errors = _x_errors.get(display)
+        if errors is not None:
+            errors.append((error.error_code, error.request_code,
+                           error.minor_code, error.resourceid))
+            return 0
+    # errors of other connections, such as the toolkit's, are not ours
+    if _previous_handler:
+        return _previous_handler(display, event)
+    return 0
+
+
+_x_error_handler = _ErrorHandler(_x_error)
+
+
+def _install_error_handler(x11, display):
+    """routes the X errors of display to _x_errors"""
+    global _previous_handler
+    with _x_errors_lock:
+        _x_errors[display] = []
+        if _previous_handler is not None:
+            return
+        _previous_handler = x11.XSetErrorHandler(_x_error_handler) or False
+
+
+def _take_errors(display):
+    """return and forget the X errors recorded for display"""
+    with _x_errors_lock:
+        errors = _x_errors.get(display) or []
+        if errors:
+            _x_errors[display] = []
+        return errors
+
+
+def _load_libraries():
+    """return (libX11, libXrandr) with the prototypes used here declared"""
+    x11_name = ctypes.util.find_library("X11")
+    xrandr_name = ctypes.util.find_library("Xrandr")
+    if not x11_name or not xrandr_name:
+        raise GammaError("libX11 or libXrandr is not installed")
+    x11 = ctypes.CDLL(x11_name)
+    xrandr = ctypes.CDLL(xrandr_name)
+
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    x11.XFlush.argtypes = [ctypes.c_void_p]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XSetErrorHandler.argtypes = [_ErrorHandler]
+    x11.XSetErrorHandler.restype = _ErrorHandler
+
+    xrandr.XRRGetScreenResourcesCurrent.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    xrandr.XRRGetScreenResourcesCurrent.restype = ctypes.POINTER(_ScreenResources)
+    xrandr.XRRFreeScreenResources.argtypes = [ctypes.POINTER(_ScreenResources)]
+    xrandr.XRRGetOutputInfo.argtypes = [ctypes.c_void_p,
+                                        ctypes.POINTER(_ScreenResources),
+                                        ctypes.c_ulong]
+    xrandr.XRRGetOutputInfo.restype = ctypes.POINTER(_OutputInfo)
+    xrandr.XRRFreeOutputInfo.argtypes = [ctypes.POINTER(_OutputInfo)]
+    xrandr.XRRGetCrtcGammaSize.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    xrandr.XRRGetCrtcGammaSize.restype = ctypes.c_int
+    xrandr.XRRAllocGamma.argtypes = [ctypes.c_int]
+    xrandr.XRRAllocGamma.restype = ctypes.POINTER(_CrtcGamma)
+    xrandr.XRRSetCrtcGamma.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                       ctypes.POINTER(_CrtcGamma)]
+    xrandr.XRRFreeGamma.argtypes = [ctypes.POINTER(_CrtcGamma)]
+    return x11, xrandr
+
+
+class XRandRGamma:
+    """
+    Sets gamma ramps with RandR requests over one Xlib connection that
+    stays open for the session. Every set_gamma() is a single
+    SetCrtcGamma request; a batch waits for the X server to handle it,
+    so errors such as a CRTC that went away are raised as GammaError.
+    """
+
+    def __init__(self, display_name=None):
+        """
+        display_name - the X display to connect to, $DISPLAY when None
+        """
+        self.x11, self.xrandr = _load_libraries()
+        self.display = self.x11.XOpenDisplay(
+            display_name.encode() if display_name else None)
+        if not self.display:
+            raise GammaError(f"can not open X display {display_name or ''}")
+        _install_error_handler(self.x11, self.display)
+        self.root = self.x11.XDefaultRootWindow(self.display)
+        self.lock = threading.Lock()
+        # {output name: (crtc, gamma buffer)}
+        self.crtcs = {}
+        self.refresh()
+
+    def refresh(self):
+        """re-reads which CRTC drives every connected output"""
+        with self.lock:
+            self._free_gammas()
+            resources = self.xrandr.XRRGetScreenResourcesCurrent(
+                self.display, self.root)
+            if not resources:
+                raise GammaError("RandR screen resources unavailable")
+            try:
+                for i in range(resources.contents.noutput):
+                    info = self.xrandr.XRRGetOutputInfo(
+                        self.display, resources, resources.contents.outputs[i])
+                    if not info:
+                        continue
+                    try:
+                        crtc = info.contents.crtc
+                        name = info.contents.name[:info.contents.nameLen] \
+                            .decode("utf-8", "replace")
+                    finally:
+                        self.xrandr.XRRFreeOutputInfo(info)
+                    if not crtc:
+                        continue
+                    size = self.xrandr.XRRGetCrtcGammaSize(self.display, crtc)
+                    if size <= 0:
+                        continue
+                    self.crtcs[name] = (crtc, self.xrandr.XRRAllocGamma(size))
+            finally:
+                self.xrandr.XRRFreeScreenResources(resources)
+
+    def outputs(self):
+        with self.lock:
+            return list(self.crtcs)
+
+    def set_gamma(self, output, brightness, red, green, blue):
+        """
+        output - RandR output name, as xrandr prints it
+        brightness, red, green, blue - the values xrandr takes for
+        --brightness and --gamma red:green:blue
+        """
+        self.set_gammas({output: (brightness, red, green, blue)})
+
+    def set_gammas(self, changes):
+        """
+        sets several outputs in one batch, flushed to the server together
+        changes - {output: (brightness, red, green, blue)}
+        """
+        if any(output not in self.crtcs for output in changes):
+            # the output may have been connected after the last refresh
+            self.refresh()
+        with self.lock:
+            missing = [output for output in changes if output not in self.crtcs]
+            for output, (brightness, red, green, blue) in changes.items():
+                if output in missing:
+                    continue
+                crtc, gamma = self.crtcs[output]
+                size = gamma.contents.size
+                ramps = gamma_ramps.ramps(size, brightness, red, green, blue)
+                for channel, ramp in zip((gamma.contents.red, gamma.contents.green,
+                                          gamma.contents.blue), ramps):
+                    ctypes.memmove(channel, ramp.tobytes(), size * 2)
+                self.xrandr.XRRSetCrtcGamma(self.display, crtc, gamma)
+            self.x11.XSync(self.display, 0)
+            errors = _take_errors(self.display)
+            if errors:
+                # the CRTCs are read again before the next batch
+                self._free_gammas()
+        if errors:
+            raise GammaError(f"X server rejected the gamma of {', '.join(changes)}: "
+                             + ", ".join(f"error {code} on request {request}.{minor}"
+                                         for code, request, minor, resource in errors))
+        if missing:
+            raise GammaError(f"outputs {', '.join(missing)} have no active CRTC")
+
+    def sync(self):
+        """waits until the X server has handled every request sent"""
+        with self.lock:
+            self.x11.XSync(self.display, 0)
+
+    def _free_gammas(self):
+        for crtc, gamma in self.crtcs.values():
+            self.xrandr.XRRFreeGamma(gamma)
+        self.crtcs = {}
+
+    def close(self):
+        with self.lock:
+            if self.display:
+                self._free_gammas()
+                self.x11.XCloseDisplay(self.display)
+                with _x_errors_lock:
+                    _x_errors.pop(self.display, None)
+                self.display = None
+
+
+class XRandRCommand:
+    """
+    Sets gamma by running the xrandr binary, one process per batch of
+    changes.
+    """
+
+    def __init__(self, command="xrandr"):
+        self.command = command
+
+    def set_gamma(self, output, brightness, red, green, blue):
+        self.set_gammas({output: (brightness, red, green, blue)})
+
+    def set_gammas(self, changes):
+        """
+        sets several outputs with a single xrandr run
+        changes - {output: (brightness, red, green, blue)}
+        """
+        args = [self.command]
+        for output, (brightness, red, green, blue) in changes.items():
+            args += ["--output", output, "--brightness", str(brightness),
+                     "--gamma", f"{red}:{green}:{blue}"]
+        result = subprocess.run(args, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise GammaError(str(result.stderr, "utf-8").strip() or
+                             f"xrandr exited with {result.returncode}")
+
+    def refresh(self):
+        pass
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_backend(display_name=None):
+    """return XRandRGamma when the X server can be reached, else XRandRCommand"""
+    try:
+        backend = XRandRGamma(display_name)
+    except (GammaError, OSError) as e:
+        log.info(f"[gamma] native RandR unavailable, using the xrandr binary: {e}")
+        return XRandRCommand()
+    log.info(f"[gamma] native RandR gamma for outputs {backend.outputs()}")
+    return backend
@@ -0,0 +1,97 @@
+"""In-memory stand-in for a monitor sitting on /dev/i2c-N."""
+import time
+
+from brightness_controller_linux.util import ddc_i2c
+
+EDID = bytes([0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x00]) + bytes(120)
+
+
+class FakeDDCBus:
+
+    def __init__(self, features=None, edid=EDID, latency=0.0, null_replies=0,
+                 capabilities="", min_delay=0.0):
+        """
+        features - {feature: [current, max]}
+        capabilities - the MCCS capabilities string
+        latency - seconds every write takes
+        null_replies - number of replies answered with a DDC null message
+        min_delay - seconds the monitor needs before its reply can be read,
+        earlier reads get a null message
+        """
+        self.features = features if features is not None \
+            else {0x10: [50, 100]}
+        self.edid = edid
+        self.latency = latency
+        self.null_replies = null_replies
+        self.capabilities = capabilities.encode("ascii")
+        self.min_delay = min_delay
+        self.written_at = 0.0
+        self.reply = b""
+        self.writes = []
+        self.closed = False
+
+    def write(self, address, data):
+        time.sleep(self.latency)
+        self.written_at = time.monotonic()
+        self.writes.append((address, bytes(data)))
+        if address == ddc_i2c.EDID_ADDRESS:
+            if self.edid is None:
+                raise OSError(6, "No such device or address")
+            return
+        if not self.features:
+            raise OSError(6, "No such device or address")
+        if data[-1] != ddc_i2c.checksum(data[:-1],
+                                        ddc_i2c.DISPLAY_WRITE_ADDRESS):
+            raise AssertionError(f"bad checksum in {data.hex()}")
+        opcode, feature = data[2], data[3]
+        if opcode == ddc_i2c.SET_VCP_REQUEST:
+            self.features[feature][0] = data[4] << 8 | data[5]
+        elif opcode == ddc_i2c.GET_VCP_REQUEST:
+            self.reply = self._getvcp_reply(feature)
+        elif opcode == ddc_i2c.CAPABILITIES_REQUEST:
+            self.reply = self._capabilities_reply(data[3] << 8 | data[4])
+
+    def _capabilities_reply(self, offset):
+        fragment = self.capabilities[offset:offset + 32]
+        reply = bytes([0x6E, 0x80 | (len(fragment) + 3),
+                       ddc_i2c.CAPABILITIES_REPLY, offset >> 8,
+                       offset & 0xFF]) + fragment
+        return reply + bytes([ddc_i2c.checksum(
+            reply, ddc_i2c.REPLY_CHECKSUM_SEED)])
+
+    def _getvcp_reply(self, feature):
+        if self.null_replies:
+            self.null_replies -= 1
+            reply = bytes([0x6E, 0x80])
+        elif feature in self.features:
+            current, maximum = self.features[feature]
+            reply = bytes([0x6E, 0x88, ddc_i2c.GET_VCP_REPLY, 0x00, feature,
+                           0x00, maximum >> 8, maximum & 0xFF,
+                           current >> 8, current & 0xFF])
+        else:
+            reply = bytes([0x6E, 0x88, ddc_i2c.GET_VCP_REPLY, 0x01, feature,
+                           0, 0, 0, 0, 0])
+        return reply + bytes([ddc_i2c.checksum(
+            reply, ddc_i2c.REPLY_CHECKSUM_SEED)])
+
+    def read(self, address, length):
+        if address == ddc_i2c.EDID_ADDRESS:
+            return self.edid[:length]
+        if time.monotonic() - self.written_at < self.min_delay:
+            reply = bytes([0x6E, 0x80])
+            reply += bytes([ddc_i2c.checksum(reply,
+                                             ddc_i2c.REPLY_CHECKSUM_SEED)])
+            return reply.ljust(length, b"\x00")
+        return self.reply[:length].ljust(length, b"\x00")
+
+    def close(self):
+        self.closed = True
+
+
+def fake_buses(buses):
+    """return an open_bus callable handing out the given {number: bus}"""
+    def open_bus(number):
+        if number not in buses:
+            raise OSError(2, f"No such file /dev/i2c-{number}")
+        return buses[number]
+    return open_bus
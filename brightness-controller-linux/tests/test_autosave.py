@@ -0,0 +1,109 @@
+import logging
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from brightness_controller_linux.util import read_config, write_config
+from brightness_controller_linux.util import settings as Settings
+from brightness_controller_linux.util.autosave import Autosave
+
+
+def settings(brightness, displays=2):
+    saved = Settings.Settings("Default", primary="edid-0")
+    for i in range(displays):
+        saved.set(f"edid-{i}", Settings.DisplaySettings(brightness, 99, 99, 99, f"DP-{i}"))
+    return saved
+
+
+def test_burst_is_written_once(tmp_path):
+    path = tmp_path / "settings"
+    autosave = Autosave(str(path), quiet=0.1)
+    for value in range(50):
+        autosave.changed(settings(value))
+        time.sleep(0.002)
+    assert not path.exists()
+    assert autosave.flush(5)
+    assert read_config.read_settings(str(path)).lookup("edid-0").brightness == 49
+    assert autosave.counters() == {"changes": 50, "written": 1, "unchanged": 0, "failed": 0}
+
+
+def test_unchanged_settings_are_not_written(tmp_path):
+    path = tmp_path / "settings"
+    write_config.write_settings(settings(10), str(path))
+    before = os.stat(path).st_mtime_ns
+    autosave = Autosave(str(path), quiet=0.01)
+    autosave.changed(settings(10))
+    autosave.flush(5)
+    assert os.stat(path).st_mtime_ns == before
+    assert autosave.counters()["unchanged"] == 1
+
+
+def test_crash_before_rename_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "settings"
+    write_config.write_settings(settings(10), str(path))
+    before = path.read_text()
+
+    def crash(*args):
+        raise KeyboardInterrupt("power cut")
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(KeyboardInterrupt):
+        write_config.write_settings(settings(20), str(path))
+    assert path.read_text() == before
+    assert os.listdir(tmp_path) == ["settings"]
+
+
+def test_write_is_synced_before_rename(tmp_path, monkeypatch):
+    calls = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append("fsync") or fsync(fd))
+    monkeypatch.setattr(os, "replace", lambda *a: calls.append("replace") or replace(*a))
+    write_config.write_settings(settings(10), str(tmp_path / "settings"))
+    assert calls == ["fsync", "replace", "fsync"]
+
+
+WRITER = textwrap.dedent("""
+    import sys
+    from brightness_controller_linux.util import write_config
+    from tests.test_autosave import settings
+    i = 0
+    while True:
+        write_config.write_settings(settings(i % 100, displays=64), sys.argv[1])
+        i += 1
+""")
+
+
+def test_killed_writer_never_leaves_a_torn_file(tmp_path):
+    path = tmp_path / "settings"
+    write_config.write_settings(settings(0, displays=64), str(path))
+    for kill in range(5):
+        writer = subprocess.Popen([sys.executable, "-c", WRITER, str(path)],
+                                  cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": os.getcwd()})
+        time.sleep(0.3 + kill * 0.07)
+        writer.send_signal(signal.SIGKILL)
+        writer.wait()
+        loaded = read_config.read_settings(str(path))
+        assert len(loaded) == 64
+        assert len({d.brightness for d in loaded.displays.values()}) == 1
+
+
+def test_writes_per_minute_during_slider_use(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    autosave = Autosave(str(tmp_path / "settings"), quiet=0.2)
+    start = time.monotonic()
+    # three drags at 60 changes per second with pauses between them
+    for drag in range(3):
+        for step in range(30):
+            autosave.changed(settings(drag * 30 + step))
+            time.sleep(1 / 60)
+        time.sleep(0.3)
+    autosave.flush(5)
+    elapsed = time.monotonic() - start
+    counters = autosave.counters()
+    LOGGER.info(f"autosave during slider use: {counters['changes'] / elapsed * 60:.0f} "
+                f"changes/min, {counters['written'] / elapsed * 60:.0f} writes/min")
+    assert counters["written"] == 3
@@ -0,0 +1,43 @@
+from brightness_controller_linux.util import capabilities as caps
+
+DELL = "(prot(monitor)type(LCD)model(U2415)cmds(01 02 03 07 0C E3 F3)" \
+       "vcp(02 04 05 08 10 12 14(05 08 0B 0C) 16 18 1A 52 60(0F 11 12) " \
+       "AA(01 02) AC AE B2 B6 C6 C8 C9 D6(01 04 05) DC(00 02 03 05) DF FD)" \
+       "mccs_ver(2.1)mswhql(1))"
+
+
+def test_parse_capabilities():
+    parsed = caps.parse_capabilities(DELL)
+    assert parsed["model"] == "U2415"
+    assert parsed["mccs"] == "2.1"
+    assert parsed["vcp"][0x10] == []
+    assert parsed["vcp"][0x60] == [0x0F, 0x11, 0x12]
+    assert parsed["vcp"][0x14] == [0x05, 0x08, 0x0B, 0x0C]
+    assert 0x1A in parsed["vcp"] and 0xFD in parsed["vcp"]
+
+
+def test_parse_capabilities_tolerates_garbage():
+    assert caps.parse_capabilities("")["vcp"] == {}
+    assert caps.parse_capabilities("vcp(10 zz 12")["vcp"] == {}
+    assert set(caps.parse_capabilities("vcp(10 12)")["vcp"]) == {0x10, 0x12}
+
+
+def test_cache_queries_each_display_once(tmp_path):
+    path = str(tmp_path / "capabilities_cache.json")
+    queries = []
+
+    def query():
+        queries.append(1)
+        return DELL
+
+    cache = caps.CapabilitiesCache(path)
+    assert cache.get("edid-a", query)["model"] == "U2415"
+    assert cache.get("edid-a", query)["model"] == "U2415"
+    cache.save()
+    assert len(queries) == 1
+
+    reloaded = caps.CapabilitiesCache(path)
+    assert 0x60 in reloaded.get("edid-a", query)["vcp"]
+    assert len(queries) == 1
+    reloaded.get("edid-b", query)
+    assert len(queries) == 2
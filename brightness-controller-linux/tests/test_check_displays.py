@@ -1,4 +1,7 @@
+import io
+import logging
 import os
+import time
 
 from brightness_controller_linux.util import check_displays as cd
 
@@ -22,3 +25,383 @@ def test_extract_display_two():
 
     output = cd.extract_displays(content)
     assert output == ["eDP-1", "HDMI-1"]
+
+
+def read_ddcutil_detect():
+    with open("tests/ddcutil_detect.txt", "r") as file:
+        return file.read().splitlines()
+
+
+def test_parse_ddc_detect():
+    detected = cd.parse_ddc_detect(read_ddcutil_detect())
+    assert [d["bus"] for d in detected] == [1, 4, 6]
+    assert [d["valid"] for d in detected] == [True, False, True]
+    assert [d["model"] for d in detected] == ["VG279", "", "DELL U2415"]
+
+
+def test_match_ddc_order_records_bus():
+    monitors = [["DP-1", "DELL U2415"], ["eDP-1", "eDP-1"], ["HDMI-1", "VG279"]]
+    output = cd.match_ddc_order(monitors, read_ddcutil_detect())
+    assert output == [["HDMI-1", "VG279", 1], ["eDP-1", "eDP-1", 4],
+                      ["DP-1", "DELL U2415", 6]]
+
+
+def test_match_ddc_order_fallback_keeps_display_numbering():
+    monitors = [["HDMI-1", "Unknown"], ["DP-1", "Other"], ["DP-2", "Third"]]
+    output = cd.match_ddc_order(monitors, read_ddcutil_detect())
+    assert output == [["HDMI-1", "Unknown", 1], ["DP-1", "Other", 6],
+                      ["DP-2", "Third", None]]
+
+
+def read_xrandr_verbose():
+    with open("tests/xrandr_verbose.txt", "r") as file:
+        return file.readlines()
+
+
+def test_parse_xrandr_verbose():
+    monitors = list(cd.parse_xrandr_verbose(read_xrandr_verbose()))
+    assert [m.connector for m in monitors] == ["eDP-1", "HDMI-1", "DP-1"]
+    assert [m.connected for m in monitors] == [True, True, False]
+    assert [m.primary for m in monitors] == [True, False, False]
+    assert [m.geometry for m in monitors] == [(1920, 1080, 0, 0),
+                                              (1920, 1080, 1920, 0), None]
+    assert [m.crtc for m in monitors] == [0, 1, None]
+    assert [len(m.edid) for m in monitors] == [128, 128, 0]
+    assert monitors[1].edid[:8] == bytes.fromhex("00ffffffffffff00")
+
+
+def test_extract_display_names_from_verbose(monkeypatch):
+    monkeypatch.delenv("XDG_SESSION_TYPE", raising=False)
+    displays = cd.extract_display_names(read_xrandr_verbose())
+    assert displays[1] == ["HDMI-1", "VG279"]
+    assert [d[0] for d in displays] == ["eDP-1", "HDMI-1"]
+    assert set(cd.display_edids) == {"eDP-1", "HDMI-1"}
+
+
+def test_read_xrandr_verbose_stops_early(tmp_path):
+    xrandr = tmp_path / "xrandr"
+    xrandr.write_text("#!/bin/sh\ncat tests/xrandr_verbose.txt\nsleep 10\n")
+    xrandr.chmod(0o755)
+    start = time.perf_counter()
+    monitors = cd.read_xrandr_verbose(str(xrandr))
+    assert next(monitors).connector == "eDP-1"
+    monitors.close()
+    assert time.perf_counter() - start < 5
+
+
+def synthetic_xrandr_verbose(outputs, modes):
+    lines = read_xrandr_verbose()
+    header = lines[0]
+    block = lines[1:lines.index(next(l for l in lines if l.startswith("HDMI-1")))]
+    mode = [l for l in block if l.startswith(" ")][:3]
+    body = [l for l in block[1:] if not l.startswith(" ")]
+    result = [header]
+    for i in range(outputs):
+        result.append(f"DP-{i} connected 1920x1080+{1920 * i}+0 (0x48) normal () 0mm x 0mm\n")
+        result += body
+        result += mode * modes
+    return "".join(result)
+
+
+def legacy_extract(xrandr_output):
+    """the list splitting and line walking check_displays used before"""
+    displayVerboseInfo = []
+    display = []
+    for i, line in enumerate(xrandr_output):
+        if line.startswith("Screen"):
+            continue
+        if i == len(xrandr_output) - 1:
+            display.append(line)
+            if "disconnected" not in display[0]:
+                displayVerboseInfo.append(display)
+        if not line.startswith("\t") and "connected" in line:
+            if len(display) > 0 and "disconnected" not in display[0]:
+                displayVerboseInfo.append(display)
+            display = [line]
+        else:
+            display.append(line)
+    edids = {}
+    for monitor in displayVerboseInfo:
+        name = None
+        gettingEDID = False
+        currentEdid = ""
+        for line in monitor:
+            if "connected" in line:
+                name = line[:line.find(' ')]
+            if gettingEDID and line.startswith("\t\t"):
+                currentEdid += line[2:]
+            elif gettingEDID:
+                break
+            if line == "\tEDID: ":
+                gettingEDID = True
+        edids[name] = currentEdid
+    return edids
+
+
+def test_parse_xrandr_verbose_benchmark():
+    LOGGER = logging.getLogger(__name__)
+    timings = {}
+    for outputs, modes in ((4, 20), (16, 60), (64, 120)):
+        text = synthetic_xrandr_verbose(outputs, modes)
+        start = time.perf_counter()
+        legacy = legacy_extract(text.splitlines())
+        old = time.perf_counter() - start
+        start = time.perf_counter()
+        monitors = list(cd.parse_xrandr_verbose(io.StringIO(text)))
+        new = time.perf_counter() - start
+        assert {m.connector: m.edid.hex() for m in monitors} == legacy
+        timings[(outputs, modes)] = (round(old * 1000, 2), round(new * 1000, 2))
+    LOGGER.info(f"xrandr --verbose parse, legacy vs streaming ms by (outputs, modes) = {timings}")
+    assert timings[(64, 120)][1] < timings[(64, 120)][0]
+
+
+def fake_sysfs(root):
+    """a /sys/class/drm tree with the displays of xrandr_verbose.txt"""
+    edids = {m.connector: m.edid for m in cd.parse_xrandr_verbose(read_xrandr_verbose())}
+    (root / "card0").mkdir()
+    (root / "renderD128").mkdir()
+    (root / "version").write_text("drm 1.1.0 20060810\n")
+    for name, status, enabled, data in (
+            ("card0-eDP-1", "connected", "enabled", edids["eDP-1"]),
+            ("card0-HDMI-A-1", "connected", "enabled", edids["HDMI-1"]),
+            ("card0-DP-1", "disconnected", "disabled", b"")):
+        connector = root / name
+        connector.mkdir()
+        (connector / "status").write_text(status + "\n")
+        (connector / "enabled").write_text(enabled + "\n")
+        (connector / "edid").write_bytes(data)
+    os.symlink("../../../i2c-5", root / "card0-HDMI-A-1" / "ddc")
+    return root
+
+
+def test_read_sysfs_monitors(tmp_path):
+    monitors = list(cd.read_sysfs_monitors(str(fake_sysfs(tmp_path))))
+    assert [m.connector for m in monitors] == ["DP-1", "HDMI-A-1", "eDP-1"]
+    assert [m.connected for m in monitors] == [False, True, True]
+    assert [m.enabled for m in monitors] == [False, True, True]
+    assert [len(m.edid) for m in monitors] == [0, 128, 128]
+    assert [m.bus for m in monitors] == [None, 5, None]
+
+
+def test_read_sysfs_monitors_missing_root(tmp_path):
+    assert list(cd.read_sysfs_monitors(str(tmp_path / "missing"))) == []
+
+
+def test_extract_display_names_from_sysfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(cd, "sysfs_root", str(fake_sysfs(tmp_path)))
+    monkeypatch.setenv("XDG_SESSION_TYPE", "x11")
+    assert cd.extract_display_names(backend="sysfs") == \
+        [["HDMI-1", "VG279"], ["eDP-1", "eDP-1"]]
+    assert cd.display_identities["HDMI-1"].name == "VG279"
+    # Wayland compositors use the kernel's connector names
+    monkeypatch.setenv("XDG_SESSION_TYPE", "wayland")
+    assert cd.extract_display_names() == \
+        [["HDMI-A-1", "VG279"], ["eDP-1", "eDP-1"]]
+
+
+def test_update_display_names_reads_only_changed_connectors(tmp_path):
+    root = str(fake_sysfs(tmp_path))
+    cd.display_edids.clear()
+    displays = [["eDP-1", "eDP-1", None]]
+    updated = cd.update_display_names(displays, ["HDMI-A-1"], [], root=root)
+    assert updated == [["eDP-1", "eDP-1", None], ["HDMI-1", "VG279", 5]]
+    # the display that stayed is not read again
+    assert list(cd.display_edids) == ["HDMI-1"]
+    assert cd.update_display_names(updated, [], ["HDMI-A-1"], root=root) == \
+        [["eDP-1", "eDP-1", None]]
+    assert "HDMI-1" not in cd.display_identities
+
+
+def test_update_display_names_unknown_connector(tmp_path):
+    root = str(fake_sysfs(tmp_path))
+    # amdgpu's X driver names connectors unlike the kernel
+    displays = [["eDP", "eDP", None], ["HDMI-A-0", "VG279", 5]]
+    assert cd.update_display_names(displays, ["DP-1"], [], root=root) is None
+
+
+def test_sysfs_enumeration_benchmark(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    root = str(fake_sysfs(tmp_path))
+    xrandr = tmp_path / "xrandr"
+    xrandr.write_text(f"#!/bin/sh\ncat {os.path.abspath('tests/xrandr_verbose.txt')}\n")
+    xrandr.chmod(0o755)
+    runs = 20
+    start = time.perf_counter()
+    for i in range(runs):
+        spawned = [m.connector for m in cd.read_xrandr_verbose(str(xrandr)) if m.connected]
+    spawn = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for i in range(runs):
+        read = [m.connector for m in cd.read_sysfs_monitors(root) if m.connected]
+    sysfs = (time.perf_counter() - start) / runs
+    assert len(spawned) == len(read) == 2
+    LOGGER.info(f"display enumeration, xrandr process {spawn * 1000:.2f} ms "
+                f"(without any output probing) vs sysfs {sysfs * 1000:.3f} ms")
+    assert sysfs < spawn
+
+
+def detect_block(number, bus, mfg, model, serial, product=None, binary_serial=None,
+                 edid_bytes=None):
+    lines = [f"Display {number}", f"   I2C bus:  /dev/i2c-{bus}", "   EDID synopsis:",
+             f"      Mfg id:               {mfg} - Vendor", f"      Model:                {model}"]
+    if product is not None:
+        lines.append(f"      Product code:         {product}  (0x{product:04x})")
+    lines.append(f"      Serial number:        {serial}")
+    if binary_serial is not None:
+        lines.append(f"      Binary serial number: {binary_serial} (0x{binary_serial:08x})")
+    if edid_bytes is not None:
+        lines.append("   EDID hex dump:")
+        lines.append("              +0          +4          +8          +c            0   4   8   c   ")
+        for offset in range(0, 128, 16):
+            row = edid_bytes[offset:offset + 16]
+            lines.append(f"      +{offset:04x}   {' '.join(f'{b:02x}' for b in row)}   ................")
+    return lines + ["   VCP version:         2.2", ""]
+
+
+def identical_monitors(count):
+    """count monitors of one model, told apart only by their serials"""
+    from tests.test_edid import make_edid
+    monitors, identities = [], {}
+    for i in range(count):
+        connector = f"DP-{i}"
+        decoded = cd.edid.decode(make_edid(serial=1000 + i, serial_text=f"SN{i:05d}"))
+        monitors.append([connector, decoded.name])
+        identities[connector] = decoded
+    return monitors, identities
+
+
+def test_parse_ddc_detect_verbose():
+    from tests.test_edid import make_edid
+    data = make_edid(serial=7)
+    detected = cd.parse_ddc_detect(detect_block(1, 3, "DEL", "DELL U2415", "SN7",
+                                                0xA0C3, 7, data))
+    assert detected[0]["mfg"] == "DEL"
+    assert detected[0]["product"] == 0xA0C3
+    assert detected[0]["binary_serial"] == 7
+    assert detected[0]["edid"] == data
+
+
+def test_match_ddc_order_identical_models():
+    monitors, identities = identical_monitors(3)
+    # ddcutil lists them in a different order than the connectors
+    detect = []
+    for n, i in enumerate((2, 0, 1)):
+        detect += detect_block(n + 1, 10 + i, "DEL", "DELL U2415", f"SN{i:05d}")
+    output = cd.match_ddc_order(monitors, detect, identities)
+    assert output == [["DP-2", "DELL U2415", 12], ["DP-0", "DELL U2415", 10],
+                      ["DP-1", "DELL U2415", 11]]
+
+
+def test_match_ddc_order_by_edid_and_product_code():
+    from tests.test_edid import make_edid
+    monitors, identities = identical_monitors(2)
+    # no serial text at all, but the binary serial or the EDID itself
+    detect = detect_block(1, 21, "DEL", "DELL U2415", "", 0xA0C3, 1001) + \
+        detect_block(2, 20, "DEL", "DELL U2415", "", edid_bytes=make_edid(
+            serial=1000, serial_text="SN00000"))
+    output = cd.match_ddc_order(monitors, detect, identities)
+    assert output == [["DP-1", "DELL U2415", 21], ["DP-0", "DELL U2415", 20]]
+
+
+def test_match_ddc_order_by_identity():
+    monitors, identities = identical_monitors(2)
+    # a model name that differs from the EDID's, matched by product code and serial
+    detect = detect_block(1, 51, "DEL", "U2415", "SN00001", 0xA0C3) + \
+        detect_block(2, 50, "DEL", "U2415", "SN00000", 0xA0C3)
+    output = cd.match_ddc_order(monitors, detect, identities)
+    assert output == [["DP-1", "DELL U2415", 51], ["DP-0", "DELL U2415", 50]]
+
+
+def test_match_ddc_order_edid_with_extension_block():
+    from tests.test_edid import make_edid
+    monitors, identities = [], {}
+    detect = []
+    # the connectors read base block and CEA extension, ddcutil dumps the base block
+    for i in range(2):
+        base = make_edid(serial=i, serial_text="")
+        identities[f"DP-{i}"] = cd.edid.decode(base + bytes([2, 3]) + bytes(126))
+        monitors.append([f"DP-{i}", "DELL U2415"])
+    for n, i in enumerate((1, 0)):
+        detect += detect_block(n + 1, 30 + i, "DEL", "DELL U2415", "",
+                               edid_bytes=make_edid(serial=i, serial_text=""))
+    output = cd.match_ddc_order(monitors, detect, identities)
+    assert output == [["DP-1", "DELL U2415", 31], ["DP-0", "DELL U2415", 30]]
+
+
+def test_match_ddc_order_runs_verbose_detect(tmp_path, monkeypatch):
+    from tests.test_edid import make_edid
+    monitors, identities = [], {}
+    detect = []
+    for i in range(2):
+        base = make_edid(serial=i, serial_text="")
+        identities[f"DP-{i}"] = cd.edid.decode(base + bytes([2, 3]) + bytes(126))
+        monitors.append([f"DP-{i}", "DELL U2415"])
+    # identical monitors without serial text, only the EDID dump tells them apart
+    for n, i in enumerate((1, 0)):
+        detect += detect_block(n + 1, 40 + i, "DEL", "DELL U2415", "",
+                               edid_bytes=make_edid(serial=i, serial_text=""))
+    (tmp_path / "detect.txt").write_text("\n".join(detect))
+    os.symlink(os.path.abspath("tests/fake_ddcutil"), tmp_path / "ddcutil")
+    monkeypatch.setenv("FAKE_DDCUTIL_DETECT", str(tmp_path / "detect.txt"))
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    output = cd.match_ddc_order(monitors, identities=identities)
+    assert output == [["DP-1", "DELL U2415", 41], ["DP-0", "DELL U2415", 40]]
+
+
+def test_match_native_order():
+    from tests.test_edid import make_edid
+    monitors, identities = [], {}
+    for i in range(2):
+        base = make_edid(serial=i, serial_text="")
+        identities[f"DP-{i}"] = cd.edid.decode(base + bytes([2, 3]) + bytes(126))
+        monitors.append([f"DP-{i}", "DELL U2415"])
+    # as I2CTransport.detect() read them, no ddcutil involved
+    edids = {6: make_edid(serial=1, serial_text=""), 9: make_edid(serial=0, serial_text=""),
+             11: b"\0" * 128}
+    output = cd.match_native_order(monitors, edids, identities)
+    assert output == [["DP-1", "DELL U2415", 6], ["DP-0", "DELL U2415", 9]]
+
+
+def legacy_match_ddc_order(monitorNames, detected):
+    """the nested model name comparison match_ddc_order used before"""
+    reorderedMonitors = []
+    for ddcDisplay in detected:
+        modelName = ddcDisplay["model"]
+        for monitor in monitorNames:
+            if modelName == '':
+                if monitor[1].startswith('eDP'):
+                    reorderedMonitors.append(monitor[:2] + [ddcDisplay["bus"]])
+                    break
+            if monitor[1] in modelName:
+                reorderedMonitors.append(monitor[:2] + [ddcDisplay["bus"]])
+                break
+    return reorderedMonitors
+
+
+def test_match_ddc_order_benchmark(monkeypatch):
+    from tests.test_edid import make_edid
+    LOGGER = logging.getLogger(__name__)
+    monkeypatch.setattr(cd.log, "info", lambda *args: None)
+    timings = {}
+    for count in (16, 256, 1024):
+        monitors, identities, detect = [], {}, []
+        for i in range(count):
+            decoded = cd.edid.decode(make_edid(name=f"U{i:05d}", serial=i,
+                                               serial_text=f"SN{i:05d}"))
+            monitors.append([f"DP-{i}", decoded.name])
+            identities[f"DP-{i}"] = decoded
+        for n, i in enumerate(reversed(range(count))):
+            detect += detect_block(n + 1, i, "DEL", f"U{i:05d}", f"SN{i:05d}")
+        start = time.perf_counter()
+        detected = cd.parse_ddc_detect(detect)
+        parse = time.perf_counter() - start
+        start = time.perf_counter()
+        legacy = legacy_match_ddc_order(monitors, detected)
+        old = time.perf_counter() - start
+        start = time.perf_counter()
+        output = cd.match_ddc_order(monitors, detect, identities)
+        new = time.perf_counter() - start - parse
+        assert output == legacy
+        timings[count] = (round(old * 1000, 2), round(new * 1000, 2))
+    LOGGER.info(f"ddcutil matching, legacy vs identity ms by display count = {timings}")
+    assert timings[1024][1] < timings[1024][0]
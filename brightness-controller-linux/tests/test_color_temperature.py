@@ -0,0 +1,59 @@
+import logging
+import time
+
+from brightness_controller_linux.util import color_temperature as ct
+
+
+def test_neutral_is_white():
+    assert ct.rgb(ct.NEUTRAL_KELVIN) == (255.0, 255.0, 255.0)
+    assert ct.gains(ct.PRESETS["Default"]) == (1.0, 1.0, 1.0)
+
+
+def test_range_is_clamped():
+    assert ct.rgb(500) == ct.rgb(ct.MIN_KELVIN)
+    assert ct.rgb(90000) == ct.rgb(ct.MAX_KELVIN)
+    assert ct.rgb(ct.MAX_KELVIN) == ct.TABLE[-1]
+
+
+def test_interpolation_follows_the_curve():
+    # away from 6600 K, where the curve fit itself jumps
+    for kelvin in (1234, 2850, 4321, 7777, 12345, 33333):
+        expected = ct.blackbody(kelvin)
+        for channel, value in zip(ct.rgb(kelvin), expected):
+            assert abs(channel - value) < 1.5
+
+
+def test_warmer_is_redder():
+    reds = [ct.gains(kelvin)[2] for kelvin in range(1000, 6601, 100)]
+    assert reds == sorted(reds)
+    red, green, blue = ct.rgb(1900)
+    assert red == 255 and green < 160 and blue < 60
+
+
+def test_parse():
+    assert ct.parse("1900K Candle") == 1900
+    assert ct.parse("4500") == 4500
+    assert ct.parse(" 4500 K ") == 4500
+    assert ct.parse("4500k") == 4500
+    assert ct.parse("900K") is None
+    assert ct.parse("warm") is None
+
+
+def test_lookup_benchmark():
+    LOGGER = logging.getLogger(__name__)
+    kelvins = [1000 + i * 39 for i in range(1000)]
+
+    start = time.perf_counter()
+    for kelvin in kelvins:
+        ct.blackbody(kelvin)
+    computed = (time.perf_counter() - start) / len(kelvins)
+
+    start = time.perf_counter()
+    for kelvin in kelvins:
+        ct.rgb(kelvin)
+    looked_up = (time.perf_counter() - start) / len(kelvins)
+
+    LOGGER.info(f"kelvin to rgb: curve fit {computed * 1e6:.2f}us, "
+                f"table lookup {looked_up * 1e6:.2f}us")
+    # far below one 60 Hz frame
+    assert looked_up < 1 / 60 / 100
@@ -0,0 +1,131 @@
+import logging
+import time
+
+import pytest
+
+from brightness_controller_linux.util import ddc_i2c
+from brightness_controller_linux.util.ddc_worker import DDCError
+from tests.fake_i2c import FakeDDCBus, fake_buses
+
+
+def no_sleep(seconds):
+    pass
+
+
+def test_encode_getvcp():
+    assert ddc_i2c.encode_getvcp(0x10).hex() == "51820110ac"
+
+
+def test_encode_setvcp():
+    packet = ddc_i2c.encode_setvcp(0x10, 50)
+    assert packet[:-1].hex() == "518403100032"
+    assert packet[-1] == ddc_i2c.checksum(packet[:-1], 0x6E)
+
+
+def test_decode_getvcp_rejects_bad_checksum():
+    reply = bytes([0x6E, 0x88, 0x02, 0x00, 0x10, 0x00, 0, 100, 0, 40])
+    good = reply + bytes([ddc_i2c.checksum(reply, 0x50)])
+    assert ddc_i2c.decode_getvcp(good, 0x10) == (40, 100)
+    with pytest.raises(DDCError):
+        ddc_i2c.decode_getvcp(good[:-1] + bytes([good[-1] ^ 1]), 0x10)
+
+
+def test_transport_roundtrip():
+    bus = FakeDDCBus({0x10: [40, 100]})
+    transport = ddc_i2c.I2CTransport(fake_buses({4: bus}), buses=[4],
+                                     sleep=no_sleep)
+    assert transport.getvcp(4, 0x10) == (40, 100)
+    transport.setvcp(4, 0x10, 70)
+    assert transport.getvcp(4, 0x10) == (70, 100)
+    transport.close()
+    assert bus.closed
+
+
+def test_transport_detects_displays_in_bus_order():
+    buses = {2: FakeDDCBus({0x10: [1, 100]}),
+             3: FakeDDCBus(features={}),
+             5: FakeDDCBus({0x10: [2, 100]}),
+             7: FakeDDCBus(edid=None)}
+    transport = ddc_i2c.I2CTransport(fake_buses(buses), buses=[2, 3, 5, 7],
+                                     sleep=no_sleep)
+    assert transport.detect() == [2, 5]
+    assert transport.edids == {2: buses[2].edid, 5: buses[5].edid}
+    assert transport.getvcp(5, 0x10) == (2, 100)
+    with pytest.raises(DDCError):
+        transport.getvcp(3, 0x10)
+
+
+def test_display_buses_skip_other_adapters(tmp_path, monkeypatch):
+    drm, i2c = tmp_path / "drm", tmp_path / "i2c"
+    drm.mkdir()
+    for number, name in ((0, "SMBus I801 adapter at efa0"), (3, "i915 gmbus dpb"),
+                         (4, "AMDGPU SMU 0")):
+        (i2c / f"i2c-{number}").mkdir(parents=True)
+        (i2c / f"i2c-{number}" / "name").write_text(name + "\n")
+    monkeypatch.setattr(ddc_i2c, "list_buses", lambda: [0, 3, 4, 7])
+    # 7 has no adapter name at all
+    assert ddc_i2c.display_buses(str(drm), str(i2c)) == [3]
+    connector = drm / "card0-DP-1"
+    connector.mkdir()
+    (connector / "status").write_text("disconnected\n")
+    (connector / "ddc").symlink_to("../../i2c-9")
+    # buses the connectors link are all there is to probe
+    assert ddc_i2c.display_buses(str(drm), str(i2c)) == [9]
+
+
+def test_transport_retries_null_replies():
+    bus = FakeDDCBus(null_replies=2)
+    transport = ddc_i2c.I2CTransport(fake_buses({1: bus}), buses=[1],
+                                     sleep=no_sleep)
+    assert transport.getvcp(1, 0x10) == (50, 100)
+
+    bus.null_replies = 3
+    with pytest.raises(DDCError):
+        transport.getvcp(1, 0x10)
+
+
+def test_transport_benchmark():
+    LOGGER = logging.getLogger(__name__)
+    bus = FakeDDCBus()
+    transport = ddc_i2c.I2CTransport(fake_buses({1: bus}), buses=[1],
+                                     sleep=no_sleep)
+    start = time.perf_counter()
+    for value in range(2000):
+        transport.setvcp(1, 0x10, value % 101)
+        transport.getvcp(1, 0x10)
+    elapsed = time.perf_counter() - start
+    LOGGER.info(f"native DDC encode/decode: {4000 / elapsed:.0f} requests/s "
+                "without bus delays")
+
+    # with the standard's delays a get costs 40 ms and a set holds the bus
+    # for 50 ms, which is the floor ddcutil adds its process startup to
+    transport = ddc_i2c.I2CTransport(fake_buses({1: FakeDDCBus()}), buses=[1])
+    start = time.perf_counter()
+    transport.getvcp(1, 0x10)
+    transport.setvcp(1, 0x10, 10)
+    transport.getvcp(1, 0x10)
+    elapsed = time.perf_counter() - start
+    LOGGER.info(f"native DDC get/set/get with standard delays: {elapsed:.3f}s")
+    assert 0.12 <= elapsed < 0.5
+
+
+def test_transport_batched_reads_and_capabilities():
+    capabilities = "(prot(monitor)vcp(10 12 16 18 1A 60(0F 11))mccs_ver(2.2))"
+    bus = FakeDDCBus({0x10: [40, 100], 0x12: [75, 100], 0x60: [0x0F, 0x12]},
+                     capabilities=capabilities)
+    transport = ddc_i2c.I2CTransport(fake_buses({3: bus}), buses=[3],
+                                     sleep=no_sleep)
+    results = transport.getvcp_many(3, [0x10, 0x12, 0x16, 0x60])
+    assert results[0x10] == (40, 100)
+    assert results[0x12] == (75, 100)
+    assert results[0x60] == (0x0F, 0x12)
+    assert isinstance(results[0x16], DDCError)
+    assert transport.capabilities(3) == capabilities
+
+
+def test_transport_capabilities_are_bounded():
+    bus = FakeDDCBus(capabilities="x" * (ddc_i2c.MAX_CAPABILITIES_LENGTH + 100))
+    transport = ddc_i2c.I2CTransport(fake_buses({3: bus}), buses=[3],
+                                     sleep=no_sleep)
+    with pytest.raises(DDCError):
+        transport.capabilities(3)
@@ -0,0 +1,47 @@
+import logging
+
+from brightness_controller_linux.util import ddc_i2c, ddc_tuning
+from tests.fake_i2c import FakeDDCBus, fake_buses
+
+
+def test_retry_budget():
+    assert ddc_tuning.retry_budget(0) == ddc_tuning.MIN_RETRIES
+    assert ddc_tuning.retry_budget(0.1) == 3
+    assert ddc_tuning.retry_budget(1) == ddc_tuning.MAX_RETRIES
+
+
+def test_calibrate_fast_monitor():
+    LOGGER = logging.getLogger(__name__)
+    # answers after 15 ms where the standard asks for 40 ms
+    bus = FakeDDCBus(min_delay=0.015)
+    transport = ddc_i2c.I2CTransport(fake_buses({2: bus}), buses=[2])
+    result = ddc_tuning.calibrate(transport, 2, samples=3)
+    LOGGER.info(ddc_tuning.format_report("fast", 2, result))
+
+    assert result["sleep_multiplier"] == 0.5
+    assert result["retries"] == ddc_tuning.MIN_RETRIES
+    assert result["after"]["failure_rate"] == 0
+    assert result["after"]["p50"] < result["before"]["p50"]
+
+
+def test_calibrate_slow_monitor():
+    LOGGER = logging.getLogger(__name__)
+    bus = FakeDDCBus(min_delay=0.05)
+    transport = ddc_i2c.I2CTransport(fake_buses({2: bus}), buses=[2])
+    result = ddc_tuning.calibrate(transport, 2, samples=2)
+    LOGGER.info(ddc_tuning.format_report("slow", 2, result))
+
+    assert result["before"]["failure_rate"] == 1
+    assert result["sleep_multiplier"] == 1.5
+    assert result["after"]["failure_rate"] == 0
+
+
+def test_timing_cache_applies_learned_timing(tmp_path):
+    path = str(tmp_path / "ddc_timing.json")
+    cache = ddc_tuning.TimingCache(path)
+    cache.put("edid-a", {"sleep_multiplier": 0.25, "retries": 3})
+    cache.save()
+
+    transport = ddc_i2c.I2CTransport(fake_buses({}), buses=[])
+    ddc_tuning.TimingCache(path).apply(transport, {"edid-a": 7, "edid-b": 8})
+    assert transport.timings == {7: (0.25, 3)}
@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import subprocess
+import time
+
+import pytest
+
+from brightness_controller_linux.util import ddc_worker as ddc
+
+FAKE_DDCUTIL = os.path.abspath("tests/fake_ddcutil")
+
+
+@pytest.fixture
+def fake_state(tmp_path, monkeypatch):
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"1": {"10": 40}, "2": {"10": 75}}))
+    monkeypatch.setenv("FAKE_DDCUTIL_STATE", str(state))
+    return state
+
+
+def test_parse_getvcp():
+    output = "VCP code 0x10 (Brightness                    ): " \
+             "current value =    50, max value =   100"
+    assert ddc.parse_getvcp(output) == (50, 100)
+
+
+def test_parse_getvcp_display_not_found():
+    with pytest.raises(ddc.DDCError):
+        ddc.parse_getvcp("Display not found")
+
+
+def test_worker_get_and_set(fake_state):
+    worker = ddc.DDCWorker(ddc.DDCUtilTransport(FAKE_DDCUTIL))
+    worker.start()
+    assert worker.getvcp(1).result() == (40, 100)
+    worker.setvcp(2, 30).result()
+    assert worker.getvcp(2).result() == (30, 100)
+    with pytest.raises(ddc.DDCError):
+        worker.getvcp(3).result()
+    worker.stop()
+
+    report = worker.latency_report()
+    assert report[1]["count"] == 1
+    assert report[2]["count"] == 2
+
+
+def test_worker_latency(fake_state, monkeypatch):
+    LOGGER = logging.getLogger(__name__)
+    monkeypatch.setenv("FAKE_DDCUTIL_DELAY", "0.05")
+    worker = ddc.DDCWorker(ddc.DDCUtilTransport(FAKE_DDCUTIL))
+    worker.start()
+    futures = [worker.setvcp(1, value) for value in range(5)]
+    futures[-1].result()
+    worker.stop()
+
+    report = worker.latency_report()[1]
+    LOGGER.info("fake ddcutil round trip = " + str(report))
+    assert report["count"] == 5
+    assert report["p50"] >= 0.05
+
+
+def test_probe_displays_serializes_shared_bus():
+    active = {}
+    overlaps = []
+
+    def read(display):
+        bus = display % 2
+        if active.get(bus):
+            overlaps.append(display)
+        active[bus] = True
+        time.sleep(0.02)
+        active[bus] = False
+        return display * 10
+
+    arrived = []
+    results = ddc.probe_displays(read, {d: d % 2 for d in range(1, 7)},
+                                 lambda display, result: arrived.append(display))
+    assert overlaps == []
+    assert results == {d: d * 10 for d in range(1, 7)}
+    assert sorted(arrived) == list(range(1, 7))
+
+
+def test_probe_displays_benchmark(tmp_path, monkeypatch):
+    LOGGER = logging.getLogger(__name__)
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({str(d): {"10": d} for d in range(1, 9)}))
+    monkeypatch.setenv("FAKE_DDCUTIL_STATE", str(state))
+    monkeypatch.setenv("FAKE_DDCUTIL_DELAY", "0.2")
+    transport = ddc.DDCUtilTransport(FAKE_DDCUTIL)
+
+    timings = {}
+    for count in (1, 2, 4, 8):
+        start = time.perf_counter()
+        results = ddc.probe_displays(
+            lambda display: transport.getvcp(display, ddc.BRIGHTNESS),
+            {d: d for d in range(1, count + 1)})
+        timings[count] = time.perf_counter() - start
+        assert results == {d: (d, 100) for d in range(1, count + 1)}
+
+    LOGGER.info("startup probe wall time by display count = " + str(timings))
+    # serial probing would take 8x as long as a single display
+    assert timings[8] < timings[1] * 4
+
+
+def test_bus_addressing_benchmark(tmp_path, monkeypatch):
+    LOGGER = logging.getLogger(__name__)
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"3": {"10": 20}, "5": {"10": 30}}))
+    monkeypatch.setenv("FAKE_DDCUTIL_STATE", str(state))
+    monkeypatch.setenv("FAKE_DDCUTIL_DETECT_DELAY", "0.1")
+
+    start = time.perf_counter()
+    for value in range(5):
+        subprocess.run([FAKE_DDCUTIL, "setvcp", "10", str(value), "-d", "2"])
+    by_display = time.perf_counter() - start
+
+    transport = ddc.DDCUtilTransport(FAKE_DDCUTIL)
+    start = time.perf_counter()
+    for value in range(5):
+        transport.setvcp(5, ddc.BRIGHTNESS, value)
+    by_bus = time.perf_counter() - start
+
+    LOGGER.info(f"5 writes by display number {by_display:.3f}s, "
+                f"by bus {by_bus:.3f}s")
+    assert transport.getvcp(5, ddc.BRIGHTNESS) == (4, 100)
+    assert by_bus < by_display - 0.4
+
+
+def test_parse_getvcp_brief():
+    results = ddc.parse_getvcp_brief("VCP 10 C 50 100\nVCP 60 SNC x0f\n"
+                                     "VCP 16 ERR\n")
+    assert results[0x10] == (50, 100)
+    assert results[0x60] == (0x0F, None)
+    assert isinstance(results[0x16], ddc.DDCError)
+
+
+def test_worker_batched_reads(fake_state, monkeypatch):
+    monkeypatch.setenv("FAKE_DDCUTIL_CAPABILITIES", "(vcp(10 12))")
+    fake_state.write_text(json.dumps({"4": {"10": 40, "12": 60}}))
+    worker = ddc.DDCWorker(ddc.DDCUtilTransport(FAKE_DDCUTIL))
+    worker.start()
+    assert worker.getvcp_many(4, [ddc.BRIGHTNESS, ddc.CONTRAST]).result() == \
+        {0x10: (40, 100), 0x12: (60, 100)}
+    assert worker.capabilities(4).result() == "(vcp(10 12))"
+    worker.stop()
+
+
+class SleepingTransport:
+    """answers after a fixed delay and records requests overlapping on a bus"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.active = set()
+        self.overlaps = []
+        self.values = {}
+
+    def setvcp(self, bus, feature, value):
+        if bus in self.active:
+            self.overlaps.append(bus)
+        self.active.add(bus)
+        time.sleep(self.latency)
+        self.values.setdefault(bus, []).append(value)
+        self.active.discard(bus)
+
+    def getvcp(self, bus, feature):
+        time.sleep(self.latency)
+        return (self.values.get(bus, [50])[-1], 100)
+
+
+def test_worker_serializes_one_bus_in_order():
+    transport = SleepingTransport(0.01)
+    worker = ddc.DDCWorker(transport)
+    worker.start()
+    futures = [worker.setvcp(bus, value) for value in range(5)
+               for bus in (1, 2)]
+    for future in futures:
+        future.result()
+    worker.stop()
+    assert transport.overlaps == []
+    assert transport.values == {1: list(range(5)), 2: list(range(5))}
+
+
+def test_stop_finishes_submitted_requests():
+    transport = SleepingTransport(0.02)
+    worker = ddc.DDCWorker(transport)
+    worker.start()
+    futures = [worker.setvcp(1, value) for value in range(3)]
+    worker.stop()
+    assert all(future.done() for future in futures)
+    assert transport.values[1] == [0, 1, 2]
+
+
+def test_concurrent_bus_writes_benchmark():
+    LOGGER = logging.getLogger(__name__)
+    latency = 0.05
+    timings = {}
+    for count in (1, 2, 4, 8):
+        transport = SleepingTransport(latency)
+        start = time.perf_counter()
+        for bus in range(count):
+            transport.setvcp(bus, ddc.BRIGHTNESS, 30)
+        serial = time.perf_counter() - start
+
+        worker = ddc.DDCWorker(transport)
+        worker.start()
+        start = time.perf_counter()
+        futures = [worker.setvcp(bus, 60) for bus in range(count)]
+        for future in futures:
+            future.result()
+        concurrent = time.perf_counter() - start
+        worker.stop()
+        timings[count] = (serial, concurrent)
+        assert transport.overlaps == []
+
+    LOGGER.info("one write per display, serial vs worker seconds by display "
+                "count = " + str({count: (round(serial, 3), round(concurrent, 3))
+                                  for count, (serial, concurrent) in timings.items()}))
+    serial, concurrent = timings[8]
+    assert serial >= 8 * latency
+    assert concurrent < 3 * latency
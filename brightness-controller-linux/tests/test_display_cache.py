@@ -0,0 +1,69 @@
+import logging
+import time
+
+from brightness_controller_linux.util import display_cache as dc
+
+EDIDS = {"HDMI-1": "00ffffffffffff0006b3" + "00" * 118,
+         "DP-1": "00ffffffffffff0010ac" + "00" * 118}
+
+
+def test_display_key():
+    assert dc.display_key("HDMI-1", EDIDS) == \
+        dc.edid_hash(EDIDS["HDMI-1"])
+    assert dc.display_key("eDP-1", EDIDS) == "connector:eDP-1"
+
+
+def test_identical_edids_get_numbered_keys():
+    edids = {"DP-2": EDIDS["DP-1"], "DP-1": EDIDS["DP-1"], "HDMI-1": EDIDS["HDMI-1"]}
+    displays = [["DP-2", "DELL U2415"], ["HDMI-1", "VG279"], ["DP-1", "DELL U2415"]]
+    key = dc.edid_hash(EDIDS["DP-1"])
+    assert dc.display_keys(displays, edids) == \
+        [key + "#2", dc.edid_hash(EDIDS["HDMI-1"]), key]
+    assert dc.keys(dc.build(displays, edids)) == dc.display_keys(displays, edids)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "display_cache.json")
+    displays = [["HDMI-1", "VG279", 3], ["DP-1", "DELL U2415", 5]]
+    cache = dc.build(displays, EDIDS, [100, 75], ddc=True)
+    dc.save(cache, path)
+
+    loaded = dc.load(path, ddc=True)
+    assert dc.displays(loaded) == displays
+    assert dc.maxes(loaded) == [100, 75]
+    assert dc.topology(loaded) == dc.topology(cache)
+    # a cache written while ddcutil was usable does not apply without it
+    assert dc.load(path, ddc=False) is None
+
+
+def test_load_ignores_broken_cache(tmp_path):
+    path = tmp_path / "display_cache.json"
+    assert dc.load(str(path)) is None
+    path.write_text("{not json")
+    assert dc.load(str(path)) is None
+    path.write_text('{"version": 0, "ddc": false, "displays": []}')
+    assert dc.load(str(path)) is None
+
+
+def test_topology_change_keeps_known_maxes():
+    previous = dc.build([["HDMI-1", "VG279", 3]], EDIDS, [100], ddc=True)
+    current = dc.build([["HDMI-1", "VG279", 3], ["DP-1", "DELL U2415", 5]],
+                       EDIDS, ddc=True)
+    assert dc.topology(current) != dc.topology(previous)
+    dc.merge_maxes(current, previous)
+    assert [e["vcp_max"] for e in current["displays"]] == [100, None]
+
+
+def test_cache_load_benchmark(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    path = str(tmp_path / "display_cache.json")
+    edids = {f"DP-{i}": f"{i:04x}" + "00" * 126 for i in range(12)}
+    displays = [[f"DP-{i}", f"Monitor {i}", i] for i in range(12)]
+    dc.save(dc.build(displays, edids, [100] * 12, ddc=True), path)
+
+    start = time.perf_counter()
+    for i in range(100):
+        loaded = dc.load(path, ddc=True)
+    elapsed = (time.perf_counter() - start) / 100
+    LOGGER.info(f"loading a 12 display topology from cache: {elapsed * 1000:.3f}ms")
+    assert dc.displays(loaded) == displays
@@ -0,0 +1,131 @@
+import logging
+import random
+import time
+
+import pytest
+
+from brightness_controller_linux.util import check_displays as cd
+from brightness_controller_linux.util import edid
+
+
+def text_descriptor(tag, text):
+    return bytes([0, 0, 0, tag, 0]) + (text + "\n").encode().ljust(13, b" ")[:13]
+
+
+def timing_descriptor(width, height, clock_khz):
+    clock = clock_khz // 10
+    return bytes([clock & 0xFF, clock >> 8, width & 0xFF, 0, (width >> 8) << 4,
+                  height & 0xFF, 0, (height >> 8) << 4]) + bytes(10)
+
+
+def make_edid(manufacturer="DEL", product=0xA0C3, serial=0x12345678,
+              name="DELL U2415", serial_text="7MT0186S0KGL", extensions=1):
+    data = bytearray(128)
+    data[0:8] = edid.HEADER
+    code = 0
+    for letter in manufacturer:
+        code = code << 5 | (ord(letter) - 64)
+    data[8:10] = code.to_bytes(2, "big")
+    data[10:12] = product.to_bytes(2, "little")
+    data[12:16] = serial.to_bytes(4, "little")
+    data[16], data[17], data[18], data[19] = 12, 24, 1, 4
+    descriptors = [timing_descriptor(1920, 1200, 154000),
+                   text_descriptor(edid.SERIAL_TEXT, serial_text),
+                   text_descriptor(edid.NAME, name),
+                   bytes([0, 0, 0, edid.RANGE_LIMITS, 0]) + bytes(13)]
+    for offset, descriptor in zip(edid.DESCRIPTOR_OFFSETS, descriptors):
+        data[offset:offset + 18] = descriptor
+    data[126] = extensions
+    data[127] = -sum(data[:127]) % 256
+    return bytes(data)
+
+
+def test_decode():
+    decoded = edid.decode(make_edid())
+    assert decoded.manufacturer == "DEL"
+    assert decoded.product == 0xA0C3
+    assert decoded.serial == 0x12345678
+    assert decoded.serial_text == "7MT0186S0KGL"
+    assert decoded.name == "DELL U2415"
+    assert (decoded.week, decoded.year, decoded.version) == (12, 2014, "1.4")
+    assert decoded.extensions == 1
+    assert decoded.checksum_valid
+    assert decoded.descriptors[0].tag == edid.Descriptor.TIMING
+    assert decoded.descriptors[0].value == (1920, 1200, 154000)
+    assert decoded.descriptors[3].tag == edid.RANGE_LIMITS
+    assert decoded.identity == "DEL:a0c3:7MT0186S0KGL"
+
+
+def test_identity_tells_identical_models_apart():
+    first = edid.decode(make_edid(serial_text="", serial=1))
+    second = edid.decode(make_edid(serial_text="", serial=2))
+    assert first.name == second.name
+    assert first.identity != second.identity
+
+
+def test_name_not_confused_by_fc00_elsewhere():
+    # the product code and serial contain the bytes the old search looked for
+    data = make_edid(product=0x00FC, serial=0x0A00FC00, name="VG279")
+    assert cd.extract_edid_name(data.hex()) == "VG279"
+    assert cd.extract_edid_name(make_edid(name="").hex()) is None
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(edid.EdidError):
+        edid.decode(bytes(128))
+    with pytest.raises(edid.EdidError):
+        edid.decode(make_edid()[:100])
+    with pytest.raises(edid.EdidError):
+        edid.decode_hex("not hex")
+
+
+def test_decode_is_memoized():
+    data = make_edid(serial=99)
+    assert edid.decode(data) is edid.decode(bytes(data))
+    assert edid.decode.cache_info().hits > 0
+
+
+def corpus(size, seed=7):
+    rng = random.Random(seed)
+    blobs = []
+    for i in range(size):
+        data = bytearray(make_edid(
+            manufacturer="".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)),
+            product=rng.randrange(1 << 16), serial=rng.randrange(1 << 32),
+            name=f"Model {i}", serial_text=str(rng.randrange(1 << 40))))
+        # flip random bytes outside the header
+        for _ in range(rng.randrange(0, 12)):
+            data[rng.randrange(8, 128)] = rng.randrange(256)
+        blobs.append(bytes(data) + bytes(rng.randrange(0, 3) * 128))
+    return blobs
+
+
+def test_decode_fuzz():
+    rng = random.Random(11)
+    for data in corpus(500):
+        edid.decode(data)
+        # and fully random data
+        noise = bytes(rng.randrange(256) for _ in range(rng.randrange(0, 260)))
+        for blob in (noise, edid.HEADER + noise):
+            try:
+                edid.decode(blob)
+            except edid.EdidError:
+                pass
+
+
+def test_decode_throughput():
+    LOGGER = logging.getLogger(__name__)
+    blobs = corpus(2000, seed=3)
+    edid.decode.cache_clear()
+    start = time.perf_counter()
+    for data in blobs:
+        edid.decode(data)
+    decoded = (time.perf_counter() - start) / len(blobs)
+    recent = blobs[-edid.DECODE_CACHE_SIZE:]
+    start = time.perf_counter()
+    for i in range(10):
+        for data in recent:
+            edid.decode(data)
+    cached = (time.perf_counter() - start) / (10 * len(recent))
+    LOGGER.info(f"EDID decode {decoded * 1e6:.1f} us, memoized {cached * 1e6:.2f} us")
+    assert cached < decoded
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+from brightness_controller_linux.util import fader
+from brightness_controller_linux.util.fader import Fader
+
+
+def test_step_count():
+    # one write per unit of change at most
+    assert fader.step_count(40, 45, 1.0, 0.0) == 5
+    # a display taking 50 ms per write gets 5 writes in 250 ms
+    assert fader.step_count(0, 100, 0.25, 0.05) == 5
+    # without a measured latency steps stay at display refresh rate
+    assert fader.step_count(0, 100, 0.25, 0.0) == 15
+    assert fader.step_count(10, 10, 0.25, 0.0) == 1
+
+
+def test_fade_reaches_target():
+    LOGGER = logging.getLogger(__name__)
+    written = []
+
+    def step(key, value):
+        time.sleep(0.02)
+        written.append((time.monotonic(), value))
+
+    fades = Fader(step)
+    start = time.monotonic()
+    fades.fade(0, 20, 80, 0.2, latency=0.02)
+    assert fades.wait(0, 5)
+    elapsed = time.monotonic() - start
+
+    values = [value for at, value in written]
+    LOGGER.info(f"fade 20 -> 80 over 200 ms: {len(values)} writes in {elapsed * 1000:.0f}ms")
+    assert values[-1] == 80
+    assert values == sorted(values)
+    assert len(values) <= fader.step_count(20, 80, 0.2, 0.02)
+    assert 0.15 < elapsed < 0.5
+    assert fades.latency(0) > 0.015
+
+
+def test_slow_display_skips_steps_instead_of_queueing():
+    written = []
+
+    def step(key, value):
+        # much slower than the latency the fade was planned with
+        time.sleep(0.05)
+        written.append(value)
+
+    fades = Fader(step)
+    start = time.monotonic()
+    fades.fade(0, 0, 100, 0.2, latency=0.0)
+    assert fades.wait(0, 5)
+    # never lags more than one write behind the schedule
+    assert time.monotonic() - start < 0.2 + 0.15
+    assert written[-1] == 100
+    assert len(written) < fader.step_count(0, 100, 0.2, 0.0)
+
+
+def test_new_target_cancels_running_fade():
+    first_step = threading.Event()
+    written = []
+
+    def step(key, value):
+        written.append(value)
+        first_step.set()
+
+    fades = Fader(step)
+    fades.fade(0, 0, 100, 1.0, latency=0.0)
+    assert first_step.wait(5)
+    fades.fade(0, written[-1], 10, 0.0)
+    assert fades.wait(0, 5)
+    time.sleep(0.05)
+    assert written[-1] == 10
+    assert len(written) < 10
+
+
+def test_failed_step_ends_fade():
+    calls = []
+
+    def step(key, value):
+        calls.append(value)
+        raise OSError("bus error")
+
+    fades = Fader(step)
+    fades.fade(0, 0, 50, 0.1)
+    assert fades.wait(0, 5)
+    assert calls == [calls[0]]
@@ -0,0 +1,71 @@
+import logging
+import time
+
+import pytest
+
+from brightness_controller_linux.util import gamma_ramps as gr
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    gr.cache_clear()
+    yield
+    gr.cache_clear()
+
+
+def test_levels():
+    assert len(gr.LEVELS) == 100
+    assert gr.LEVELS[0] == 0.01
+    assert gr.LEVELS[49] == 0.5
+    assert gr.LEVELS[99] == 1.0
+
+
+def test_channel_matches_xrandr():
+    assert list(gr.channel(256, 1.0, 1.0))[::255] == [0, 65535]
+    assert gr.channel(256, 0.5, 1.0)[255] == 32767
+    # gamma above one brightens the midtones, as with xrandr --gamma
+    assert gr.channel(3, 1.0, 2.0)[1] > gr.channel(3, 1.0, 1.0)[1]
+    assert max(gr.channel(16, 2.0, 1.0)) == 65535
+
+
+def test_ramps_share_channels():
+    red, green, blue = gr.ramps(1024, 0.8, 1.0, 0.9, 1.0)
+    assert red is blue
+    assert green is not red
+    assert gr.ramps(1024, 0.8, 1.0, 0.9, 1.0)[0] is red
+
+
+def test_ramp_generation_benchmark():
+    LOGGER = logging.getLogger(__name__)
+    timings = {}
+    for size in (256, 1024, 4096):
+        start = time.perf_counter()
+        for i in range(20):
+            gr.channel.__wrapped__(size, gr.LEVELS[i + 50], gr.LEVELS[99 - i])
+        computed = (time.perf_counter() - start) / 20
+        gr.channel(size, 0.5, 1.0)
+        start = time.perf_counter()
+        for i in range(1000):
+            gr.channel(size, 0.5, 1.0)
+        cached = (time.perf_counter() - start) / 1000
+        timings[size] = (computed, cached)
+    LOGGER.info("ramp channel generation vs cache hit, ms by size = " +
+                str({size: (round(computed * 1000, 3), round(cached * 1000, 4))
+                     for size, (computed, cached) in timings.items()}))
+    assert timings[4096][1] < timings[4096][0]
+
+
+def test_slider_drag_hit_rate():
+    LOGGER = logging.getLogger(__name__)
+    # drag brightness from 99 to 20 and back three times, colours untouched
+    positions = list(range(99, 19, -1)) + list(range(20, 100))
+    for drag in range(3):
+        for position in positions:
+            gr.ramps(1024, gr.LEVELS[position], gr.LEVELS[99],
+                     gr.LEVELS[90], gr.LEVELS[80])
+    info = gr.cache_info()["ramps"]
+    hit_rate = info.hits / (info.hits + info.misses)
+    LOGGER.info(f"slider drag ramp cache: {info.hits} hits, {info.misses} "
+                f"misses, hit rate {hit_rate:.1%}")
+    # every distinct position is computed exactly once
+    assert info.misses == 80
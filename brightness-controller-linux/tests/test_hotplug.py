@@ -0,0 +1,81 @@
+import os
+import socket
+import threading
+import time
+
+from brightness_controller_linux.util import hotplug
+from tests.test_edid import make_edid
+
+
+def uevent(action="change", subsystem="drm", **fields):
+    fields = {"ACTION": action, "DEVPATH": "/devices/pci0000:00/0000:00:02.0/drm/card0",
+              "SUBSYSTEM": subsystem, **fields}
+    return (f"{action}@{fields['DEVPATH']}\0" +
+            "\0".join(f"{key}={value}" for key, value in fields.items())).encode()
+
+
+def plug(root, connector, data):
+    path = root / f"card0-{connector}"
+    path.mkdir(exist_ok=True)
+    (path / "status").write_text("connected\n" if data else "disconnected\n")
+    (path / "enabled").write_text("enabled\n" if data else "disabled\n")
+    (path / "edid").write_bytes(data)
+
+
+def watcher(tmp_path, settle=0.05):
+    plug(tmp_path, "eDP-1", make_edid(name="", serial=1))
+    plug(tmp_path, "DP-1", b"")
+    changes = []
+    return hotplug.HotplugWatcher(lambda *change: changes.append(change),
+                                  str(tmp_path), settle), changes
+
+
+def test_parse_uevent():
+    event = hotplug.parse_uevent(uevent(HOTPLUG=1, CONNECTOR=77))
+    assert event["SUBSYSTEM"] == "drm"
+    assert event["CONNECTOR"] == "77"
+    assert hotplug.is_drm_hotplug(event)
+    assert hotplug.parse_uevent(b"libudev\0\xfe\xed\xca\xfe") == {}
+    assert not hotplug.is_drm_hotplug(hotplug.parse_uevent(uevent(subsystem="usb")))
+
+
+def test_replayed_uevents_report_changes(tmp_path):
+    watch, changes = watcher(tmp_path)
+    assert set(watch.known) == {"eDP-1"}
+
+    assert watch.handle_uevent(uevent(subsystem="usb", HOTPLUG=1)) is None
+    plug(tmp_path, "DP-1", make_edid(serial=2))
+    assert watch.handle_uevent(uevent(HOTPLUG=1)) == (["DP-1"], [])
+    # nothing changed, nothing is reported
+    assert watch.handle_uevent(uevent(HOTPLUG=1)) == ([], [])
+    # a different monitor on the same connector
+    plug(tmp_path, "DP-1", make_edid(serial=3))
+    assert watch.handle_uevent(uevent(HOTPLUG=1)) == (["DP-1"], ["DP-1"])
+    plug(tmp_path, "DP-1", b"")
+    assert watch.handle_uevent(uevent(HOTPLUG=1)) == ([], ["DP-1"])
+    assert changes == [(["DP-1"], []), (["DP-1"], ["DP-1"]), ([], ["DP-1"])]
+
+
+def test_burst_of_uevents_reads_sysfs_once(tmp_path, monkeypatch):
+    watch, changes = watcher(tmp_path)
+    reads = []
+    connected = hotplug.connected
+    monkeypatch.setattr(hotplug, "connected",
+                        lambda root=None: reads.append(root) or connected(root))
+    receiver, sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    watch.socket = receiver
+    watch.wakeup = os.pipe()
+    watch.thread = threading.Thread(target=watch._run, daemon=True)
+    watch.thread.start()
+
+    plug(tmp_path, "DP-1", make_edid(serial=2))
+    for i in range(5):
+        sender.send(uevent(HOTPLUG=1))
+        time.sleep(0.01)
+    deadline = time.monotonic() + 5
+    while not changes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    watch.stop()
+    sender.close()
+    assert changes == [(["DP-1"], [])]
+    assert len(reads) == 1
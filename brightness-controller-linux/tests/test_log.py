@@ -0,0 +1,189 @@
+import logging
+import time
+from datetime import datetime
+
+from brightness_controller_linux.util import log
+
+
+def test_lines_and_nested_lists(tmp_path):
+    path = tmp_path / "log.txt"
+    writer = log.LogWriter(str(path))
+    writer.put("started", "info")
+    writer.put(["a", ["b", ["c"]], "d"], "warning")
+    assert writer.flush()
+    lines = path.read_text().splitlines()
+    assert [line.split("] ", 2)[2] for line in lines] == ["started", "a", "b", "c", "d"]
+    assert lines[1].split("] ")[1] == "[warning"
+    writer.close()
+
+
+def test_flushes_after_flush_seconds(tmp_path):
+    path = tmp_path / "log.txt"
+    writer = log.LogWriter(str(path), flush_seconds=0.05)
+    writer.put("first", "info")
+    writer.put("second", "info")
+    deadline = time.monotonic() + 5
+    while "second" not in (path.read_text() if path.exists() else "") and \
+            time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert path.read_text().count("\n") == 2
+    writer.close()
+
+
+def test_rotates_by_size_and_count(tmp_path):
+    path = tmp_path / "log.txt"
+    writer = log.LogWriter(str(path), max_bytes=2000, backup_count=2)
+    for i in range(300):
+        writer.put(f"line {i:04d} " + "x" * 40, "info")
+    writer.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["log.txt", "log.txt.1", "log.txt.2"]
+    for name in ("log.txt", "log.txt.1", "log.txt.2"):
+        assert (tmp_path / name).stat().st_size <= 2000
+    # the newest lines are in log.txt, older ones in the backups
+    assert "line 0299" in path.read_text()
+    assert "line 0000" not in "".join(p.read_text() for p in tmp_path.iterdir())
+
+
+def test_unwritable_log_does_not_raise(tmp_path):
+    writer = log.LogWriter(str(tmp_path / "missing" / "log.txt"))
+    writer.put("lost", "info")
+    assert writer.flush()
+    writer.close()
+
+
+def test_full_queue_drops_and_reports(tmp_path):
+    path = tmp_path / "log.txt"
+    writer = log.LogWriter(str(path), queue_size=1)
+    for i in range(2000):
+        writer.put(f"line {i}", "info")
+    assert writer.dropped > 0
+    writer.put("after", "info")
+    writer.flush()
+    writer.put("last", "info")
+    writer.close()
+    text = path.read_text()
+    assert "log lines dropped" in text
+    assert text.count("\n") < 2000
+
+
+def legacy_write(logPath, logString, level):
+    """the open, append and close per call log.write did before"""
+    currentTime = datetime.now()
+    with open(logPath, 'a') as file:
+        if type(logString) is list:
+            for line in logString:
+                if type(line) is list:
+                    legacy_write(logPath, line, level)
+                else:
+                    file.write(f"[{currentTime}] [{level}] {line}\n")
+        else:
+            file.write(f"[{currentTime}] [{level}] {logString}\n")
+
+
+def test_log_throughput_benchmark(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    lines = 20000
+    start = time.perf_counter()
+    for i in range(lines):
+        legacy_write(str(tmp_path / "legacy.txt"), f"display {i} brightness 50", "info")
+    legacy = lines / (time.perf_counter() - start)
+
+    writer = log.LogWriter(str(tmp_path / "log.txt"), max_bytes=1 << 30, queue_size=lines)
+    start = time.perf_counter()
+    for i in range(lines):
+        writer.put(f"display {i} brightness 50", "info")
+    queued = lines / (time.perf_counter() - start)
+    writer.flush(30)
+    written = lines / (time.perf_counter() - start)
+    writer.close()
+    assert (tmp_path / "log.txt").read_text().count("\n") == lines
+    LOGGER.info(f"log lines per second: open/append/close {legacy:.0f}, "
+                f"queued {queued:.0f}, queued and written {written:.0f}")
+    assert written > legacy
+
+
+class Writer:
+    def __init__(self):
+        self.records = []
+
+    def put(self, logString, level, args=()):
+        self.records.append((logString, level, args))
+
+
+def test_levels_gate_calls(monkeypatch):
+    writer = Writer()
+    monkeypatch.setattr(log, "_writer", writer)
+    monkeypatch.setattr(log, "level", log.INFO)
+    log.debug("hidden %d", 1)
+    log.info("shown %d", 2)
+    log.error("error")
+    assert writer.records == [("shown %d", "info", (2,)), ("error", "ERROR", ())]
+    log.set_level(log.WARNING)
+    log.info("hidden")
+    assert not log.enabled(log.INFO) and log.enabled(log.FATAL)
+    assert len(writer.records) == 2
+
+
+def test_parse_level():
+    assert log.parse_level("debug") == log.DEBUG
+    assert log.parse_level("Warning") == log.WARNING
+    assert log.parse_level("35") == 35
+    assert log.parse_level("loud") is None
+    assert log.parse_level(None) is None
+
+
+def test_environment_level(monkeypatch):
+    monkeypatch.setenv(log.LEVEL_ENVIRONMENT, "0")
+    assert log.environment_level() == 0
+    monkeypatch.setenv(log.LEVEL_ENVIRONMENT, "loud")
+    assert log.environment_level() == log.INFO
+    monkeypatch.delenv(log.LEVEL_ENVIRONMENT)
+    assert log.environment_level() == log.INFO
+
+
+def test_arguments_formatted_when_queued(tmp_path):
+    path = tmp_path / "log.txt"
+    writer = log.LogWriter(str(path))
+    values = [50, 1]
+    writer.put("display %d %s at %d", "info", (1, "VG279", 50))
+    writer.put("broken %d", "info", ("x",))
+    writer.put("current display values %s", "info", (values,))
+    # other threads change what was logged before the writer gets to it
+    values[0] = 77
+    writer.close()
+    lines = path.read_text().splitlines()
+    assert lines[0].endswith("display 1 VG279 at 50")
+    assert "formatting failed" in lines[1]
+    assert lines[2].endswith("current display values [50, 1]")
+
+
+class Display:
+    """stands in for a value whose str() is costly"""
+    def __str__(self):
+        return "display " + ",".join(str(i) for i in range(50))
+
+
+def test_disabled_call_overhead(monkeypatch):
+    LOGGER = logging.getLogger(__name__)
+    writer = Writer()
+    monkeypatch.setattr(log, "_writer", writer)
+    monkeypatch.setattr(log, "level", log.INFO)
+    display = Display()
+    calls = 20000
+
+    def eager(message):
+        if log.DEBUG >= log.level:
+            log.write(message, "debug")
+
+    start = time.perf_counter()
+    for i in range(calls):
+        eager(f"Updating brightness for display {i} {display} with value {i}")
+    formatted = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for i in range(calls):
+        log.debug("Updating brightness for display %d %s with value %d", i, display, i)
+    deferred = (time.perf_counter() - start) / calls
+    assert writer.records == []
+    LOGGER.info(f"disabled debug call: f-string built {formatted * 1e9:.0f} ns, "
+                f"deferred arguments {deferred * 1e9:.0f} ns")
+    assert deferred < formatted
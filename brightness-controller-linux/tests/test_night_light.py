@@ -0,0 +1,85 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from brightness_controller_linux.util import night_light as nl
+from brightness_controller_linux.util import read_config, write_config
+from brightness_controller_linux.util import settings as Settings
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_sun_events_london_midsummer():
+    (sunrise, rising), (sunset, setting) = nl.sun_events(date(2024, 6, 21), 51.5074, -0.1278)
+    assert (rising, setting) == (nl.DAY, nl.NIGHT)
+    # NOAA: 03:43 and 20:21 UTC
+    assert abs(sunrise - utc(2024, 6, 21, 3, 43)) < timedelta(minutes=3)
+    assert abs(sunset - utc(2024, 6, 21, 20, 21)) < timedelta(minutes=3)
+
+
+def test_sun_events_polar():
+    assert nl.sun_events(date(2024, 12, 21), 69.65, 18.96)[0][1] == nl.NIGHT
+    assert nl.sun_events(date(2024, 6, 21), 69.65, 18.96)[0][1] == nl.DAY
+    assert len(nl.sun_events(date(2024, 6, 21), 69.65, 18.96)) == 1
+
+
+def fixed_schedule():
+    return nl.Schedule(day_kelvin=6500, night_kelvin=3250, day_brightness=100,
+                       night_brightness=60, transition=3600,
+                       sunrise=time(7, 0), sunset=time(20, 0))
+
+
+def local(hour, minute=0):
+    return datetime.combine(date(2024, 3, 10), time(hour, minute)).astimezone()
+
+
+def test_fixed_schedule_states():
+    schedule = fixed_schedule()
+    assert schedule.state(local(12)) == (6500, 100, False)
+    assert schedule.state(local(23)) == (3250, 60, False)
+    assert schedule.state(local(3)) == (3250, 60, False)
+    # half way in mired between 6500 K and 3250 K is 4333 K
+    kelvin, brightness, transitioning = schedule.state(local(20, 30))
+    assert transitioning
+    assert abs(kelvin - 4333) <= 1
+    assert brightness == 80
+    assert schedule.state(local(7, 15))[2]
+
+
+def test_next_transition():
+    schedule = fixed_schedule()
+    assert schedule.next_transition(local(12)) == local(20)
+    assert schedule.next_transition(local(21)) == \
+        local(7) + timedelta(days=1)
+
+
+def test_step_interval():
+    schedule = fixed_schedule()
+    # 154 mired apart, so about one step every 23 seconds
+    assert 20 < schedule.step_interval(0.01) < 25
+    # never faster than the outputs can be written
+    assert schedule.step_interval(60) == 60
+
+
+def test_schedule_survives_saving_settings(tmp_path):
+    settings = tmp_path / "settings"
+    settings.write_text("[schedule]\nlatitude = 51.5\nlongitude = -0.12\n"
+                        "night_temperature = 3000\ntransition_minutes = 45\n")
+    saved = Settings.Settings()
+    saved.set("connector:HDMI-1", Settings.DisplaySettings(80, 99, 90, 70, "HDMI-1"))
+    write_config.write_settings(saved, str(settings))
+    options = read_config.read_schedule(str(settings))
+    assert read_config.read_settings(str(settings)).lookup("connector:HDMI-1") == \
+        saved.lookup("connector:HDMI-1")
+
+    schedule = nl.Schedule.from_settings(options, 6000, 90)
+    assert schedule.values == {nl.DAY: (6000, 90), nl.NIGHT: (3000, 80)}
+    assert schedule.transition == 45 * 60
+    assert (schedule.latitude, schedule.longitude) == (51.5, -0.12)
+
+
+def test_disabled_schedule(tmp_path):
+    settings = tmp_path / "settings"
+    settings.write_text("[schedule]\nenabled = false\n")
+    assert read_config.read_schedule(str(settings)) is None
+    assert read_config.read_schedule(str(tmp_path / "missing")) is None
@@ -0,0 +1,99 @@
+from brightness_controller_linux.util import read_config, write_config
+from brightness_controller_linux.util import settings as Settings
+
+LEGACY_TWO = """[primary]
+has_secondary = True
+brightness = 80
+red = 99
+green = 90
+blue = 70
+source = HDMI-1
+temperature = 5400K High Noon
+
+[secondary]
+brightness = 60
+red = 98
+green = 97
+blue = 96
+source = DP-1
+temperature = 5400K High Noon
+"""
+
+LEGACY_ONE = """[primary]
+has_secondary = False
+brightness = 50
+red = 99
+green = 99
+blue = 99
+source = eDP-1
+temperature = Default
+"""
+
+
+def desk(count):
+    settings = Settings.Settings("4500K", primary="edid-3", secondary="edid-7")
+    for i in range(count):
+        settings.set(f"edid-{i}", Settings.DisplaySettings(
+            i, 99 - i, 50 + i, 20 + i, f"DP-{i}", f"Monitor {i}"))
+    return settings
+
+
+def test_twelve_display_roundtrip(tmp_path):
+    path = str(tmp_path / "settings")
+    write_config.write_settings(desk(12), path)
+    loaded = read_config.read_settings(path)
+    assert len(loaded) == 12
+    assert (loaded.temperature, loaded.primary, loaded.secondary) == \
+        ("4500K", "edid-3", "edid-7")
+    assert not loaded.migrated
+    for i in range(12):
+        assert loaded.lookup(f"edid-{i}") == desk(12).lookup(f"edid-{i}")
+    assert loaded.lookup("edid-11").levels() == (11, 88, 61, 31)
+
+
+def test_lookup_falls_back_to_connector():
+    settings = desk(3)
+    # another monitor of no known EDID plugged into DP-1
+    assert settings.lookup("connector:DP-1", "DP-1").name == "Monitor 1"
+    assert settings.key_of("connector:DP-1", "DP-1") == "edid-1"
+    assert settings.lookup("edid-9", "HDMI-1") is None
+    # re-saving a display on another connector moves the connector lookup
+    settings.set("edid-1", Settings.DisplaySettings(1, 1, 1, 1, "DP-9"))
+    assert settings.lookup("unknown", "DP-1") is None
+    assert settings.lookup("unknown", "DP-9").levels() == (1, 1, 1, 1)
+
+
+def test_migrate_two_display_file(tmp_path):
+    path = tmp_path / "settings"
+    path.write_text(LEGACY_TWO)
+    settings = read_config.read_settings(str(path))
+    assert settings.migrated
+    assert settings.temperature == "5400K High Noon"
+    assert settings.lookup("edid-x", "HDMI-1").levels() == (80, 99, 90, 70)
+    assert settings.lookup("edid-y", "DP-1").levels() == (60, 98, 97, 96)
+    assert (settings.primary, settings.secondary) == ("connector:HDMI-1", "connector:DP-1")
+
+    # saving writes the new format and drops the old sections
+    write_config.write_settings(settings, str(path))
+    text = path.read_text()
+    assert "[primary]" not in text and "[display:connector:HDMI-1]" in text
+    assert read_config.read_settings(str(path)).lookup("connector:DP-1") == \
+        settings.lookup("connector:DP-1")
+
+
+def test_migrate_one_display_file(tmp_path):
+    path = tmp_path / "settings"
+    path.write_text(LEGACY_ONE)
+    settings = read_config.read_settings(str(path))
+    assert settings.migrated
+    assert settings.primary == "connector:eDP-1"
+    assert settings.lookup("edid", "eDP-1").brightness == 50
+
+
+def test_other_sections_survive(tmp_path):
+    path = tmp_path / "settings"
+    path.write_text(LEGACY_ONE + "\n[schedule]\nlatitude = 10\n")
+    write_config.write_settings(desk(2), str(path))
+    assert read_config.read_schedule(str(path)) == {"latitude": "10"}
+    write_config.write_settings(desk(1), str(path))
+    assert len(read_config.read_settings(str(path))) == 1
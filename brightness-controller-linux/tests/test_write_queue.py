@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+from brightness_controller_linux.util.write_queue import CoalescingWriteQueue
+
+
+def test_latest_value_wins():
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def write(key, value):
+        started.set()
+        release.wait()
+        written.append((key, value))
+
+    writes = CoalescingWriteQueue(write)
+    writes.submit(1, 0)
+    assert started.wait(5)
+    for value in range(1, 50):
+        writes.submit(1, value)
+    release.set()
+    assert writes.flush(5)
+
+    # the first value was already being written, everything in between
+    # was replaced by the final one
+    assert written == [(1, 0), (1, 49)]
+    counters = writes.counters()
+    assert counters["submitted"] == 50
+    assert counters["coalesced"] == 48
+    assert counters["written"] == 2
+
+
+def test_displays_do_not_wait_on_each_other():
+    slow = threading.Event()
+    written = []
+
+    def write(key, value):
+        if key == "slow":
+            slow.wait()
+        written.append(key)
+
+    writes = CoalescingWriteQueue(write)
+    writes.submit("slow", 1)
+    writes.submit("fast", 1)
+    deadline = time.time() + 5
+    while "fast" not in written and time.time() < deadline:
+        time.sleep(0.01)
+    assert written == ["fast"]
+    slow.set()
+    assert writes.flush(5)
+
+
+def test_failed_write_is_counted():
+    def write(key, value):
+        raise OSError("bus error")
+
+    writes = CoalescingWriteQueue(write)
+    writes.submit(1, 10)
+    assert writes.flush(5)
+    assert writes.counters()["failed"] == 1
+    assert writes.counters()["written"] == 0
+
+
+def test_min_interval_caps_write_rate():
+    LOGGER = logging.getLogger(__name__)
+    written = []
+
+    def write(key, value):
+        written.append((time.monotonic(), key, value))
+
+    writes = CoalescingWriteQueue(write, min_interval=1 / 20)
+    start = time.monotonic()
+    # a slider dragged for 300 ms, one event per millisecond on two outputs
+    for value in range(300):
+        writes.submit("HDMI-1", value)
+        writes.submit("DP-1", value)
+        time.sleep(0.001)
+    assert writes.flush(5)
+    elapsed = time.monotonic() - start
+
+    counters = writes.counters()
+    LOGGER.info(f"gamma updates over {elapsed * 1000:.0f}ms at 20 Hz: "
+                f"{counters['submitted']} requested, {counters['written']} applied")
+    for key in ("HDMI-1", "DP-1"):
+        times = [at for at, written_key, value in written if written_key == key]
+        values = [value for at, written_key, value in written if written_key == key]
+        # always ends on the final value
+        assert values[-1] == 299
+        assert len(values) <= elapsed * 20 + 2
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert min(gaps) >= 1 / 20 - 0.005
+    assert counters["submitted"] == 600
+    assert counters["written"] + counters["coalesced"] == 600
+
+
+def test_merge_combines_pending_values():
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def write(key, value):
+        started.set()
+        release.wait()
+        written.append(value)
+
+    writes = CoalescingWriteQueue(write, merge=lambda pending, value: {**pending, **value})
+    writes.submit("gamma", {"HDMI-1": 1})
+    assert started.wait(5)
+    writes.submit("gamma", {"HDMI-1": 2})
+    writes.submit("gamma", {"DP-1": 3})
+    writes.submit("gamma", {"HDMI-1": 4})
+    release.set()
+    assert writes.flush(5)
+    assert written == [{"HDMI-1": 1}, {"HDMI-1": 4, "DP-1": 3}]
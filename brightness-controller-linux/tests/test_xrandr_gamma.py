@@ -0,0 +1,150 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from brightness_controller_linux.util import executor
+from brightness_controller_linux.util import xrandr_gamma as xg
+
+UPDATES = 50
+
+
+def fake_xrandr(tmp_path):
+    """an xrandr that records its arguments and does nothing else"""
+    script = tmp_path / "xrandr"
+    script.write_text('#!/bin/sh\necho "$@" >> "$0.log"\n')
+    script.chmod(0o755)
+    return script
+
+
+def test_command_backend(tmp_path):
+    script = fake_xrandr(tmp_path)
+    xg.XRandRCommand(str(script)).set_gamma("HDMI-1", 0.5, 1.0, 0.9, 0.8)
+    assert (tmp_path / "xrandr.log").read_text() == \
+        "--output HDMI-1 --brightness 0.5 --gamma 1.0:0.9:0.8\n"
+
+
+def test_command_backend_batch(tmp_path):
+    script = fake_xrandr(tmp_path)
+    xg.XRandRCommand(str(script)).set_gammas({
+        "HDMI-1": (0.5, 1.0, 0.9, 0.8),
+        "DP-1": (1.0, 1.0, 0.6, 0.4)})
+    # one process for every output of the batch
+    assert (tmp_path / "xrandr.log").read_text() == \
+        "--output HDMI-1 --brightness 0.5 --gamma 1.0:0.9:0.8 " \
+        "--output DP-1 --brightness 1.0 --gamma 1.0:0.6:0.4\n"
+
+
+def test_command_backend_error(tmp_path):
+    script = tmp_path / "xrandr"
+    script.write_text('#!/bin/sh\necho "warning: output HDMI-9 not found" >&2\nexit 1\n')
+    script.chmod(0o755)
+    with pytest.raises(xg.GammaError, match="HDMI-9"):
+        xg.XRandRCommand(str(script)).set_gamma("HDMI-9", 1.0, 1.0, 1.0, 1.0)
+
+
+def test_x_errors_are_recorded_per_display(monkeypatch):
+    monkeypatch.setattr(xg, "_x_errors", {1234: []})
+    foreign = []
+    monkeypatch.setattr(xg, "_previous_handler",
+                        lambda display, event: foreign.append(display) or 0)
+    # BadRRCrtc from SetCrtcGamma, as sent after a CRTC went away
+    event = xg._ErrorEvent(error_code=147, request_code=140, minor_code=24,
+                           resourceid=0x42)
+    assert xg._x_error(1234, ctypes.pointer(event)) == 0
+    assert xg._x_error(5678, ctypes.pointer(event)) == 0
+    assert xg._take_errors(1234) == [(147, 140, 24, 0x42)]
+    assert xg._take_errors(1234) == []
+    assert foreign == [5678]
+
+
+def test_spawn_benchmark(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    script = fake_xrandr(tmp_path)
+
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        executor.execute_command(f"{script} --output HDMI-1 --brightness 1.0 "
+                                 f"--gamma {i / UPDATES}:1.0:1.0")
+    shell = UPDATES / (time.perf_counter() - start)
+
+    backend = xg.XRandRCommand(str(script))
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        backend.set_gamma("HDMI-1", 1.0, i / UPDATES, 1.0, 1.0)
+    command = UPDATES / (time.perf_counter() - start)
+
+    LOGGER.info(f"gamma updates per second: shell string {shell:.0f}, "
+                f"xrandr without shell {command:.0f}")
+    assert len((tmp_path / "xrandr.log").read_text().splitlines()) == 2 * UPDATES
+
+
+def test_preset_batch_benchmark(tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    backend = xg.XRandRCommand(str(fake_xrandr(tmp_path)))
+    preset = {"HDMI-1": (1.0, 1.0, 0.58, 0.16), "DP-1": (1.0, 1.0, 0.58, 0.16)}
+
+    start = time.perf_counter()
+    # what a preset did before: three slider updates per output
+    for output, (brightness, red, green, blue) in preset.items():
+        backend.set_gamma(output, brightness, red, 1.0, 1.0)
+        backend.set_gamma(output, brightness, red, green, 1.0)
+        backend.set_gamma(output, brightness, red, green, blue)
+    per_slider = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.set_gammas(preset)
+    batched = time.perf_counter() - start
+
+    LOGGER.info(f"applying a preset to two outputs: {per_slider * 1000:.1f}ms "
+                f"per slider, {batched * 1000:.1f}ms as one batch")
+    assert batched < per_slider
+
+
+@pytest.fixture
+def xvfb():
+    if not shutil.which("Xvfb") or not ctypes.util.find_library("Xrandr"):
+        pytest.skip("needs Xvfb and libXrandr")
+    display = ":97"
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1024x768x24",
+                               "+extension", "RANDR"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 5
+    while not os.path.exists("/tmp/.X11-unix/X97") and time.time() < deadline:
+        time.sleep(0.05)
+    yield display
+    server.terminate()
+    server.wait()
+
+
+def test_native_gamma_benchmark(xvfb, tmp_path):
+    LOGGER = logging.getLogger(__name__)
+    backend = xg.XRandRGamma(xvfb)
+    outputs = backend.outputs()
+    if not outputs:
+        pytest.skip("Xvfb exposes no RandR output with a gamma ramp")
+    output = outputs[0]
+
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        backend.set_gamma(output, 1.0, 0.5 + i / UPDATES, 1.0, 1.0)
+    backend.sync()
+    native = UPDATES / (time.perf_counter() - start)
+    backend.close()
+
+    environment = dict(os.environ, DISPLAY=xvfb)
+    start = time.perf_counter()
+    for i in range(10):
+        subprocess.run(f"xrandr --output {output} --brightness 1.0 "
+                       f"--gamma {0.5 + i / 10}:1.0:1.0", shell=True,
+                       env=environment, stderr=subprocess.DEVNULL)
+    shell = 10 / (time.perf_counter() - start)
+
+    LOGGER.info(f"gamma updates per second on {output}: native {native:.0f}, "
+                f"xrandr through a shell {shell:.0f}")
+    assert native > shell